@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+
+'''
+bench_accuracy.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+accuracy profile benchmarks; time pass_estimation_wrapper under each accuracy profile against the
+frozen data/test TLEs and measure how far its passes stray from a reference run refined far past
+any profile, separately for each orbit class
+
+    python -m benchmarks.bench_accuracy --birds 20 --observers 2 --days 5 --output accuracy.json
+    python -m benchmarks.bench_accuracy --orbit-class HEO GEO --days 2
+'''
+
+import argparse
+import datetime
+import itertools
+import json
+import sys
+
+from timeit import default_timer
+
+import numpy as np
+
+from birdplans.accuracy import PROFILES, Accuracy
+from birdplans.satellitepasspredictor import orbit_class, pass_estimation_wrapper
+from birdplans.testdata import WINDOW_START, load_satellites, pick
+from benchmarks.bench_predictor import pick_observers, revision
+
+REFERENCE = Accuracy('reference', 24, 1e-4, 1e-5, 'skyfield')
+
+# passes whose TCAs are further apart than this, seconds, are different passes
+MATCH_SECONDS = 120.0
+
+def window_passes(satellites, observers, days, accuracy):
+    '''Passes of every satellite over every observer under one profile.
+
+    :return: (seconds spent, list of arrays of (AOS, TCA, LOS) TAI seconds, one per case)
+    '''
+    window_stop = WINDOW_START + datetime.timedelta(days=days)
+    cases = []
+    t0 = default_timer()
+    for latlng, satellite in itertools.product(observers, satellites):
+        result = pass_estimation_wrapper(
+            satellite, latlng, WINDOW_START, window_stop, 0, lighting=False, accuracy=accuracy
+        )
+        cases.append(np.array(
+            [[_.AOS.tai, _.TCA.tai, _.LOS.tai] for _ in result.passes]
+        ).reshape(-1, 3) * 86400.0)
+    return default_timer() - t0, cases
+
+def errors(cases, reference):
+    '''Match each reference pass to the nearest pass of a profile by TCA.
+
+    :return: (missed passes, extra passes, array of (AOS, TCA, LOS) absolute errors, seconds)
+    '''
+    missed = extra = 0
+    found = []
+    for passes, expected in zip(cases, reference):
+        matched = set()
+        for row in expected:
+            if not len(passes):
+                missed += 1
+                continue
+            nearest = int(np.argmin(np.abs(passes[:, 1] - row[1])))
+            if abs(passes[nearest, 1] - row[1]) > MATCH_SECONDS:
+                missed += 1
+                continue
+            matched.add(nearest)
+            found.append(np.abs(passes[nearest] - row))
+        extra += len(passes) - len(matched)
+    return missed, extra, np.array(found).reshape(-1, 3)
+
+def run(args):
+    '''Time each profile and compare it with the reference, one orbit class at a time.
+    '''
+    everything = load_satellites()
+    observers = pick_observers(args.observers)
+
+    results = []
+    for klass in args.orbit_class:
+        satellites = pick([_ for _ in everything if orbit_class(_) == klass], args.birds)
+        results.extend(run_class(args, klass, satellites, observers))
+
+    return {
+        'meta': {
+            'revision': revision(),
+            'when': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'birds': args.birds,
+            'observers': len(observers),
+            'days': args.days,
+            'orbit_class': args.orbit_class,
+            'window_start': WINDOW_START.isoformat(),
+            'repeats': args.repeats,
+        },
+        'results': results,
+    }
+
+def run_class(args, klass, satellites, observers):
+    '''Time each profile over the satellites of one orbit class.
+
+    :return: list of result dicts, one per profile
+    '''
+    _, reference = window_passes(satellites, observers, args.days, REFERENCE)
+
+    # a run of each profile untimed first, so none is charged for what the first run warms up;
+    # then the profiles take turns within each repeat, so drift in the machine's speed falls on all
+    # of them alike
+    for name in args.profile:
+        window_passes(satellites, observers, args.days, name)
+    timings = {_: [] for _ in args.profile}
+    # the passes are the same every repeat; the last run's stand for them all
+    passes = {}
+    for _ in range(args.repeats):
+        for name in args.profile:
+            elapsed, passes[name] = window_passes(satellites, observers, args.days, name)
+            timings[name].append(elapsed * 1000.0 / len(passes[name]) / args.days)
+
+    results = []
+    for name in args.profile:
+        cases = passes[name]
+        missed, extra, found = errors(cases, reference)
+        result = {
+            'orbit_class': klass,
+            'profile': name,
+            'cases': len(cases),
+            'passes': sum(len(_) for _ in cases),
+            'repeats': args.repeats,
+            'ms_per_bird_day': float(np.median(timings[name])),
+            'ms_per_bird_day_min': float(np.min(timings[name])),
+            'ms_per_bird_day_max': float(np.max(timings[name])),
+            'missed': missed,
+            'extra': extra,
+        }
+        for column, label in enumerate(['aos', 'tca', 'los']):
+            result[label + '_p95'] = float(np.percentile(found[:, column], 95)) if len(found) else 0.0
+            result[label + '_max'] = float(found[:, column].max()) if len(found) else 0.0
+        results.append(result)
+        print(format_result(result), flush=True)
+
+    return results
+
+def format_result(result):
+    '''One-line human readable profile result.
+    '''
+    return '{} {:>9}: {:7.2f} ms/bird-day ({:.2f}-{:.2f} over {}) {:5d} passes {:3d} missed ' \
+        '{:3d} extra  AOS p95 {:.4f}s max {:.4f}s  TCA p95 {:.4f}s max {:.4f}s  ' \
+        'LOS p95 {:.4f}s max {:.4f}s'.format(
+            result['orbit_class'], result['profile'], result['ms_per_bird_day']
+            , result['ms_per_bird_day_min'], result['ms_per_bird_day_max'], result['repeats']
+            , result['passes'], result['missed'], result['extra'], result['aos_p95']
+            , result['aos_max'], result['tca_p95'], result['tca_max'], result['los_p95']
+            , result['los_max']
+        )
+
+def main():
+    '''Command line entry point.
+    '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--profile', nargs='+', default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument('--days', type=float, default=5)
+    parser.add_argument('--birds', type=int, default=20)
+    parser.add_argument('--observers', type=int, default=2)
+    parser.add_argument(
+        '--repeats', type=int, default=5
+        , help='timed runs of each profile; the median is reported, with the fastest and slowest'
+    )
+    parser.add_argument(
+        '--orbit-class', nargs='+', default=['LEO', 'MEO', 'GEO', 'HEO']
+        , choices=['LEO', 'MEO', 'GEO', 'HEO']
+    )
+    parser.add_argument('--output', help='write machine readable results to this JSON file')
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, 'w') as fout:
+            json.dump(results, fout, indent=2)
+    else:
+        json.dump(results['meta'], sys.stdout, indent=2)
+        print()
+
+if __name__ == '__main__':
+    main()
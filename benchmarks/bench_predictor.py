@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+
+'''
+bench_predictor.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+prediction engine benchmarks; time estimate_window_passes, pass_estimation_wrapper and the batched
+catalog.find_passes against the frozen data/test TLEs while scaling window length, bird count,
+observer count and orbit class
+
+    python -m benchmarks.bench_predictor --days 1 5 30 --birds 1 10 all --observers 1 4 \\
+        --orbit-class LEO HEO --output bench.json
+    python -m benchmarks.bench_predictor --compare base.json bench.json
+'''
+
+import argparse
+import datetime
+import itertools
+import json
+import platform
+import subprocess
+import sys
+
+from timeit import default_timer
+
+import numpy as np
+import scipy
+import skyfield
+
+from skyfield.api import Topos
+
+from birdplans.catalog import find_passes
+from birdplans.instrumentation import StageTimer
+from birdplans.satellitepasspredictor import (
+    TIMESCALE, estimate_window_passes, orbit_class, pass_estimation_wrapper
+)
+from birdplans.testdata import TLEDB, WINDOW_START, load_satellites, pick
+
+OBSERVERS = [
+    (35.0, -98.0), # EM15
+    (47.6, -122.3), # CN87
+    (41.7, -72.7), # FN31
+    (51.5, -0.1), # IO91
+    (-33.9, 151.2), # QF56
+    (64.8, -147.7), # BP64
+    (-1.3, 36.8), # KI88
+    (35.7, 139.7), # PM95
+]
+
+def pick_observers(count):
+    '''The first count observers, extended with a deterministic latitude/longitude sweep.
+    '''
+    extra = [
+        (float(lat), float(lng))
+        for lat, lng in zip(np.linspace(-60.0, 70.0, 37), np.linspace(-177.0, 177.0, 37))
+    ]
+    return (OBSERVERS + extra)[:count]
+
+def run_case(function, satellites, observers, days):
+    '''Time one benchmark case.
+
+    :param function: 'estimate' for estimate_window_passes, 'wrapper' for pass_estimation_wrapper
+        or 'catalog' for the batched catalog.find_passes
+    :param satellites: list of EarthSatellite
+    :param observers: list of (lat, lng)
+    :param days: window length in days
+    :return: dict of the case measurements
+    '''
+    timer = StageTimer()
+    window_stop = WINDOW_START + datetime.timedelta(days=days)
+    time_start = TIMESCALE.utc(WINDOW_START)
+    time_stop = TIMESCALE.utc(window_stop)
+
+    calls = passes = errors = 0
+    t0 = default_timer()
+    if function == 'catalog':
+        for latlng in observers:
+            with timer.stage('catalog'):
+                result = find_passes(
+                    {_.model.satnum: _ for _ in satellites}, latlng, time_start, time_stop
+                )
+            calls += len(satellites)
+            passes += len(result.bird)
+        satellites = []
+
+    for latlng, satellite in itertools.product(observers, satellites):
+        calls += 1
+        try:
+            if function == 'estimate':
+                result = estimate_window_passes(
+                    satellite, Topos(*latlng), time_start, time_stop, timer
+                )
+            else:
+                result = pass_estimation_wrapper(
+                    satellite, latlng, WINDOW_START, window_stop, 0, timer
+                )
+            passes += len(result.passes)
+        except (ValueError, ZeroDivisionError):
+            # bracketing failures of the refinement for orbits it cannot handle yet
+            errors += 1
+    elapsed = default_timer() - t0
+
+    return {
+        'calls': calls,
+        'passes': passes,
+        'errors': errors,
+        'elapsed': elapsed,
+        'calls_per_second': calls / elapsed,
+        'bird_days_per_second': calls * days / elapsed,
+        'stages': dict(timer.stages),
+    }
+
+def revision():
+    '''Current git revision, marked dirty when the tree has changes.
+    '''
+    try:
+        tip = subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True).strip()
+        dirty = subprocess.call(['git', 'diff', '--quiet'])
+    except (OSError, subprocess.CalledProcessError):
+        return 'none'
+    return tip + ('.1' if dirty else '.0')
+
+def run(args):
+    '''Run every combination of the requested axes.
+    '''
+    satellites = load_satellites()
+    by_class = {}
+    for satellite in satellites:
+        by_class.setdefault(orbit_class(satellite), []).append(satellite)
+    by_class['any'] = satellites
+
+    results = []
+    for function, klass, days, birds, observers in itertools.product(
+            args.function, args.orbit_class, args.days, args.birds, args.observers):
+        case = {
+            'function': function,
+            'orbit_class': klass,
+            'days': days,
+            'birds': len(pick(by_class.get(klass, []), birds)),
+            'observers': observers,
+        }
+        case.update(run_case(
+            function, pick(by_class.get(klass, []), birds), pick_observers(observers), days
+        ))
+        results.append(case)
+        print(format_case(case), flush=True)
+
+    return {
+        'meta': {
+            'revision': revision(),
+            'when': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'numpy': np.__version__,
+            'scipy': scipy.__version__,
+            'skyfield': skyfield.__version__,
+            'tledb': TLEDB,
+            'window_start': WINDOW_START.isoformat(),
+        },
+        'results': results,
+    }
+
+def case_key(case):
+    '''Identify a case across result files.
+    '''
+    return tuple(case[_] for _ in ('function', 'orbit_class', 'days', 'birds', 'observers'))
+
+def format_case(case):
+    '''One-line human readable case result.
+    '''
+    return '{:>8} {:>4} {:>3}d {:>5} birds {:>3} obs: {:8.3f}s {:10.1f} bird-days/s ' \
+        '{:6d} passes {:4d} errors  {}'.format(
+            case['function'], case['orbit_class'], case['days'], case['birds'], case['observers']
+            , case['elapsed'], case['bird_days_per_second'], case['passes'], case['errors']
+            , ' '.join('{}={:.3f}'.format(k, v) for k, v in case['stages'].items())
+        )
+
+def compare(base_file, new_file):
+    '''Print the throughput ratio of matching cases between two result files.
+    '''
+    with open(base_file, 'r') as fin:
+        base = {case_key(_): _ for _ in json.load(fin)['results']}
+    with open(new_file, 'r') as fin:
+        new = json.load(fin)['results']
+
+    for case in new:
+        old = base.get(case_key(case))
+        if old is None:
+            continue
+        print('{:>8} {:>4} {:>3}d {:>5} birds {:>3} obs: {:10.1f} -> {:10.1f} bird-days/s '
+              '({:+.1%})'.format(
+                  *case_key(case), old['bird_days_per_second'], case['bird_days_per_second']
+                  , case['bird_days_per_second'] / old['bird_days_per_second'] - 1.0
+              ))
+
+def count_or_all(value):
+    '''argparse type for bird counts.'''
+    return None if value == 'all' else int(value)
+
+def main():
+    '''Command line entry point.
+    '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument(
+        '--function', nargs='+', default=['wrapper'], choices=['estimate', 'wrapper', 'catalog']
+    )
+    parser.add_argument('--days', nargs='+', type=float, default=[1, 5, 30])
+    parser.add_argument('--birds', nargs='+', type=count_or_all, default=[1, 10])
+    parser.add_argument('--observers', nargs='+', type=int, default=[1])
+    parser.add_argument('--orbit-class', nargs='+', default=['LEO', 'HEO'])
+    parser.add_argument('--output', help='write machine readable results to this JSON file')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='compare result files')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = run(args)
+    if args.output:
+        with open(args.output, 'w') as fout:
+            json.dump(results, fout, indent=2)
+    else:
+        json.dump(results['meta'], sys.stdout, indent=2)
+        print()
+
+if __name__ == '__main__':
+    main()
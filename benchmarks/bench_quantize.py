@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+'''
+bench_quantize.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+observer quantization benchmarks; predict passes over observers scattered about the benchmark
+observers and over the centres of their cells at each resolution, against the frozen data/test
+TLEs, and measure how far moving the observer moves AOS and LOS, separately for each orbit class
+
+    python -m benchmarks.bench_quantize --birds 10 --observers 8 --days 2 --output quantize.json
+    python -m benchmarks.bench_quantize --resolution grid6 5km --orbit-class LEO
+'''
+
+import argparse
+import datetime
+import itertools
+import json
+import sys
+
+import numpy as np
+
+from birdplans.quantize import Quantizer, arc_km
+from birdplans.satellitepasspredictor import orbit_class, pass_estimation_wrapper
+from benchmarks.bench_accuracy import errors
+from birdplans.testdata import WINDOW_START, load_satellites, pick
+from benchmarks.bench_predictor import pick_observers, revision
+
+# refined well past the shifts measured, so they are the observer's and not the search's
+ACCURACY = 'precise'
+
+def scatter(observers, count, seed=0):
+    '''count observers scattered up to half a degree about each of observers, deterministically.
+    '''
+    rng = np.random.default_rng(seed)
+    return [
+        (lat + float(dlat), lng + float(dlng))
+        for lat, lng in observers
+        for dlat, dlng in rng.uniform(-0.5, 0.5, (count, 2))
+    ]
+
+def case_passes(satellite, latlng, days, minimum_altitude):
+    '''AOS, TCA and LOS TAI seconds of satellite's passes over latlng.
+    '''
+    result = pass_estimation_wrapper(
+        satellite, latlng, WINDOW_START, WINDOW_START + datetime.timedelta(days=days)
+        , minimum_altitude, lighting=False, accuracy=ACCURACY
+    )
+    return np.array([[_.AOS.tai, _.TCA.tai, _.LOS.tai] for _ in result.passes]).reshape(-1, 3) \
+        * 86400.0
+
+def run(args):
+    '''Compare the passes over each observer with those over its cell centre, one orbit class and
+    resolution at a time.
+    '''
+    everything = load_satellites()
+    observers = scatter(pick_observers(args.observers), args.scatter)
+
+    results = []
+    for klass in args.orbit_class:
+        satellites = pick([_ for _ in everything if orbit_class(_) == klass], args.birds)
+        exact = {
+            (i, j): case_passes(satellite, latlng, args.days, args.alt)
+            for (i, latlng), (j, satellite)
+            in itertools.product(enumerate(observers), enumerate(satellites))
+        }
+        for resolution in args.resolution:
+            result = run_resolution(args, klass, satellites, observers, exact, resolution)
+            results.append(result)
+            print(format_result(result), flush=True)
+
+    return {
+        'meta': {
+            'revision': revision(),
+            'when': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'birds': args.birds,
+            'observers': len(observers),
+            'days': args.days,
+            'alt': args.alt,
+            'orbit_class': args.orbit_class,
+            'window_start': WINDOW_START.isoformat(),
+        },
+        'results': results,
+    }
+
+def run_resolution(args, klass, satellites, observers, exact, resolution):
+    '''Passes over the cell centres of observers at resolution against those over observers.
+
+    :param exact: {(observer index, satellite index): passes over the observer}
+    :return: result dict
+    '''
+    quantizer = Quantizer(resolution)
+    locations = [quantizer(*_) for _ in observers]
+    offsets = [
+        arc_km(*observer, *location[:2]) for observer, location in zip(observers, locations)
+    ]
+
+    missed = extra = 0
+    shifts, per_km = [], []
+    for (i, j), expected in exact.items():
+        moved = case_passes(satellites[j], locations[i][:2], args.days, args.alt)
+        case_missed, case_extra, found = errors([moved], [expected])
+        missed += case_missed
+        extra += case_extra
+        edges = found[:, [0, 2]].ravel()
+        shifts.extend(edges.tolist())
+        if offsets[i] > 0.0:
+            per_km.extend((edges / offsets[i]).tolist())
+
+    shifts = np.array(shifts)
+    per_km = np.array(per_km)
+    return {
+        'orbit_class': klass,
+        'resolution': resolution,
+        'cases': len(exact),
+        'passes': int(sum(len(_) for _ in exact.values())),
+        'offset_max': max(offsets),
+        'missed': missed,
+        'extra': extra,
+        'edge_p95': float(np.percentile(shifts, 95)) if len(shifts) else 0.0,
+        'edge_max': float(shifts.max()) if len(shifts) else 0.0,
+        'seconds_per_km_max': float(per_km.max()) if len(per_km) else 0.0,
+    }
+
+def format_result(result):
+    '''One-line human readable resolution result.
+    '''
+    return '{} {:>6}: offset max {:6.2f} km {:5d} passes {:3d} missed {:3d} extra  ' \
+        'AOS/LOS p95 {:.3f}s max {:.3f}s  max {:.3f} s/km'.format(
+            result['orbit_class'], result['resolution'], result['offset_max'], result['passes']
+            , result['missed'], result['extra'], result['edge_p95'], result['edge_max']
+            , result['seconds_per_km_max']
+        )
+
+def main():
+    '''Command line entry point.
+    '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--resolution', nargs='+', default=['grid6', 'grid8', '1km', '5km'])
+    parser.add_argument('--days', type=float, default=2)
+    parser.add_argument('--birds', type=int, default=10)
+    parser.add_argument('--observers', type=int, default=8)
+    parser.add_argument('--scatter', type=int, default=4, help='observers about each one')
+    parser.add_argument('--alt', type=float, default=12.0, help='minimum peak altitude')
+    parser.add_argument(
+        '--orbit-class', nargs='+', default=['LEO', 'MEO', 'GEO', 'HEO']
+        , choices=['LEO', 'MEO', 'GEO', 'HEO']
+    )
+    parser.add_argument('--output', help='write machine readable results to this JSON file')
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, 'w') as fout:
+            json.dump(results, fout, indent=2)
+    else:
+        json.dump(results['meta'], sys.stdout, indent=2)
+        print()
+
+if __name__ == '__main__':
+    main()
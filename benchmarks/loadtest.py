@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+'''
+loadtest.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+local load test; drive a running birdplans server (launch_uwsgi.sh, launch_asgi.sh) with a mix of
+cheap and prediction requests and report throughput and latency percentiles
+
+    ./launch_uwsgi.sh & ./launch_asgi.sh &
+    python -m benchmarks.loadtest --target uwsgi=http://localhost:9090 \\
+        --target asgi=http://localhost:9091 --concurrency 32 --requests 2000
+'''
+
+import argparse
+import json
+import random
+import threading
+import time
+
+from collections import namedtuple
+from http import client
+from timeit import default_timer
+from urllib import parse
+
+import numpy as np
+
+LoadResult = namedtuple(
+    'LoadResult', ['name', 'requests', 'errors', 'elapsed', 'throughput', 'p50', 'p90', 'p99']
+)
+
+# cheap routes answered inline, and a handful of distinct prediction queries
+DEFAULT_MIX = [
+    (0.4, '/birds'),
+    (0.2, '/tz'),
+    (0.3, '/one?lat=35&lng=-98&tz=America/Chicago&window_start=2018-12-03T00:00'
+          '&bird=AO-91&bird=SO-50&alt=12'),
+    (0.1, '/one?lat=47.6&lng=-122.3&tz=America/Los_Angeles&window_start=2018-12-03T00:00'
+          '&bird=AO-92&bird=FO-29&bird=AO-7&alt=20'),
+]
+
+def summarize(name, latencies, errors, elapsed):
+    '''Reduce a list of request latencies (seconds) to a LoadResult.
+    '''
+    latencies = np.array(latencies) if latencies else np.zeros(1)
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    return LoadResult(
+        name, len(latencies), errors, elapsed, len(latencies) / elapsed, p50, p90, p99
+    )
+
+def format_result(result):
+    '''One-line human readable LoadResult.
+    '''
+    return '{:>8}: {} requests ({} errors) in {:.2f}s, {:.1f} req/s, ' \
+        'p50 {:.1f}ms p90 {:.1f}ms p99 {:.1f}ms'.format(
+            result.name, result.requests, result.errors, result.elapsed, result.throughput
+            , result.p50 * 1000, result.p90 * 1000, result.p99 * 1000
+        )
+
+def pick_paths(mix, count, seed):
+    '''Draw count request paths from a weighted mix, reproducibly.
+    '''
+    rng = random.Random(seed)
+    weights, paths = zip(*mix)
+    return rng.choices(paths, weights=weights, k=count)
+
+class HttpSender:
+    '''Send paths to a server over one keep-alive connection, reconnecting after a failure.
+    '''
+
+    def __init__(self, url):
+        '''Initialize.
+
+        :param url: server base url
+        '''
+        self.target = parse.urlsplit(url)
+        self.connection = self.connect()
+
+    def connect(self):
+        '''A new connection to the server.'''
+        return client.HTTPConnection(self.target.hostname, self.target.port, timeout=120)
+
+    def __call__(self, path):
+        '''Request path, returning whether it succeeded.
+        '''
+        try:
+            self.connection.request('GET', self.target.path.rstrip('/') + path)
+            response = self.connection.getresponse()
+            response.read()
+            return response.status == 200
+        except (OSError, client.HTTPException):
+            self.connection.close()
+            self.connection = self.connect()
+            return False
+
+    def close(self):
+        '''Close the connection.'''
+        self.connection.close()
+
+def drive(paths, concurrency, make_sender, offsets=None):
+    '''Issue paths from concurrency threads, each sending through its own sender.
+
+    :param paths: request paths with their query strings, in order
+    :param concurrency: threads
+    :param make_sender: called once per thread for a callable sending one path and returning
+        whether it succeeded, with a close method
+    :param offsets: seconds from the start before which each path is not sent, default send
+        them as fast as the threads allow
+    :return: (list of (path, seconds) of the successful requests, errors, elapsed seconds)
+    '''
+    timings = []
+    errors = [0]
+    lock = threading.Lock()
+    queue = iter(enumerate(paths))
+
+    def worker():
+        '''Pull paths until the shared queue is exhausted.
+        '''
+        sender = make_sender()
+        while True:
+            with lock:
+                i, path = next(queue, (None, None))
+            if path is None:
+                break
+
+            if offsets is not None:
+                time.sleep(max(0.0, offsets[i] - (default_timer() - start)))
+            t0 = default_timer()
+            ok = sender(path)
+            t1 = default_timer()
+
+            with lock:
+                if ok:
+                    timings.append((path, t1 - t0))
+                else:
+                    errors[0] += 1
+        sender.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = default_timer()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return timings, errors[0], default_timer() - start
+
+def run_target(name, url, paths, concurrency):
+    '''Issue paths against url from concurrency threads, one keep-alive connection each.
+    '''
+    timings, errors, elapsed = drive(paths, concurrency, lambda: HttpSender(url))
+    return summarize(name, [seconds for _, seconds in timings], errors, elapsed)
+
+def main():
+    '''Command line entry point.
+    '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument(
+        '--target', action='append', required=True, help='name=url of a running server'
+    )
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write results to this file')
+    args = parser.parse_args()
+
+    paths = pick_paths(DEFAULT_MIX, args.requests, args.seed)
+
+    results = []
+    for target in args.target:
+        name, url = target.split('=', 1)
+        results.append(run_target(name, url, paths, args.concurrency))
+        print(format_result(results[-1]))
+
+    if args.json:
+        with open(args.json, 'w') as fout:
+            json.dump([_._asdict() for _ in results], fout, indent=2)
+
+if __name__ == '__main__':
+    main()
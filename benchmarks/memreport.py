@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+'''
+memreport.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+per-worker memory report; unique (private) and proportional set size of every uwsgi worker, or of
+workers forked here from a master that did or did not preload and freeze the application state
+
+    python -m benchmarks.memreport --pidfile pidfile.txt
+    python -m benchmarks.memreport --simulate 8 --full-catalog
+'''
+
+import argparse
+import gc
+import os
+import signal
+import sys
+
+from collections import namedtuple
+
+WorkerMemory = namedtuple('WorkerMemory', ['pid', 'rss', 'pss', 'uss'])
+
+# requests each simulated worker serves before being measured
+WORKLOAD = [
+    ('/birds', ''),
+    ('/one', 'lat=35&lng=-98&tz=America/Chicago&window_start=2018-12-03T00:00'
+             '&bird=AO-91&bird=SO-50&bird=AO-7&alt=12'),
+    ('/overhead', 'lat=35&lng=-98&t=1543825968034'),
+]
+
+def smaps_rollup(pid):
+    '''Memory of a process in kB from /proc/<pid>/smaps_rollup.
+    '''
+    fields = {}
+    with open('/proc/{}/smaps_rollup'.format(pid), 'r') as fin:
+        for line in fin:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+
+    return WorkerMemory(
+        pid
+        , fields.get('Rss', 0)
+        , fields.get('Pss', 0)
+        , fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    )
+
+def children(pid):
+    '''Direct child pids of pid.
+    '''
+    found = []
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open('/proc/{}/stat'.format(entry), 'r') as fin:
+                    if int(fin.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        found.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    return sorted(found)
+
+def report(title, workers):
+    '''Print one table of worker memory.
+    '''
+    print(title)
+    print('{:>8} {:>10} {:>10} {:>10}'.format('pid', 'rss kB', 'pss kB', 'unique kB'))
+    for worker in workers:
+        print('{:>8} {:>10} {:>10} {:>10}'.format(*worker))
+    if workers:
+        print('{:>8} {:>10.0f} {:>10.0f} {:>10.0f}'.format(
+            'mean', *[sum(_) / len(workers) for _ in list(zip(*workers))[1:]]
+        ))
+
+def simulate(count, preloaded, full_catalog):
+    '''Fork count workers, as uwsgi would, run the workload in each and measure them.
+
+    :param count: number of workers
+    :param preloaded: preload and freeze the application state before forking
+    :param full_catalog: serve the full TLE catalog
+    '''
+    # pylint: disable=import-outside-toplevel
+    from birdplans.preload import freeze, preload
+    from birdplans.uwsgi import BirdplansUwsgi
+
+    app = BirdplansUwsgi(full_catalog=full_catalog)
+    if preloaded:
+        preload(app, catalog=True)
+        freeze()
+
+    pids = []
+    for _ in range(count):
+        ready_r, ready_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            for path, query in WORKLOAD:
+                b''.join(app.uwsgi_application(
+                    {'PATH_INFO': path, 'QUERY_STRING': query}, lambda status, headers: None
+                ))
+            gc.collect()
+            os.write(ready_w, b'.')
+            signal.pause()
+            os._exit(0) # pylint: disable=protected-access
+        os.close(ready_w)
+        os.read(ready_r, 1)
+        os.close(ready_r)
+        pids.append(pid)
+
+    workers = [smaps_rollup(_) for _ in pids]
+    for pid in pids:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+
+    return workers
+
+def main():
+    '''Command line entry point.
+    '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--pidfile', help='uwsgi master pidfile; report its workers')
+    parser.add_argument('--simulate', type=int, help='fork this many workers before and after')
+    parser.add_argument('--full-catalog', action='store_true')
+    args = parser.parse_args()
+
+    if args.pidfile:
+        with open(args.pidfile, 'r') as fin:
+            master = int(fin.read().strip())
+        report('uwsgi workers of {}'.format(master), [smaps_rollup(_) for _ in children(master)])
+    elif args.simulate:
+        # each measurement runs in a fresh interpreter so the two do not share state
+        for preloaded in (False, True):
+            pid = os.fork()
+            if pid == 0:
+                report(
+                    'preload and freeze: {}'.format('on' if preloaded else 'off')
+                    , simulate(args.simulate, preloaded, args.full_catalog)
+                )
+                sys.stdout.flush()
+                os._exit(0) # pylint: disable=protected-access
+            os.waitpid(pid, 0)
+    else:
+        parser.error('one of --pidfile or --simulate is required')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+'''
+replay.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+replay a request log (BIRDPLANS_REQUEST_LOG) against the application in this process or against a
+running server, as fast as the threads allow or at the logged pace, and report throughput and
+latency percentiles overall and per route next to those the log recorded
+
+    python -m benchmarks.replay request_log.jsonl --concurrency 4
+    python -m benchmarks.replay request_log.jsonl --target uwsgi=http://localhost:9090 --speed 2
+'''
+
+import argparse
+import json
+
+from collections import namedtuple
+
+from benchmarks.loadtest import HttpSender, drive, format_result, summarize
+
+# t: unix time the request arrived
+# path, query: as requested
+# status: response status
+# seconds: time the server took
+LogEntry = namedtuple('LogEntry', ['t', 'path', 'query', 'status', 'seconds'])
+
+def load_log(path, routes=None, limit=None):
+    '''The requests of a request log, in arrival order; lines that do not parse are skipped.
+
+    :param path: request log file
+    :param routes: route names to keep, e.g. ['one'], default all
+    :param limit: requests to keep, default all
+    :return: list of LogEntry
+    '''
+    entries = []
+    with open(path, 'r') as fin:
+        for line in fin:
+            try:
+                record = json.loads(line)
+                entry = LogEntry(*(record[_] for _ in LogEntry._fields))
+            except (ValueError, KeyError, TypeError):
+                continue
+            if routes is None or route(entry.path) in routes:
+                entries.append(entry)
+    entries.sort(key=lambda entry: entry.t)
+    return entries[:limit]
+
+def route(path):
+    '''Route name of a request path, as BirdplansUwsgi routes it.'''
+    return path.partition('?')[0].split('/')[1]
+
+def request_path(entry):
+    '''Path and query string of a LogEntry.'''
+    return entry.path + ('?' + entry.query if entry.query else '')
+
+def arrival_offsets(entries, speed):
+    '''Seconds from the first request each is replayed at, the log's pace times speed.'''
+    return [(_.t - entries[0].t) / speed for _ in entries]
+
+class WsgiSender:
+    '''Send paths to a BirdplansUwsgi in this process.
+    '''
+
+    def __init__(self, app):
+        '''Initialize.
+
+        :param app: BirdplansUwsgi instance
+        '''
+        self.app = app
+
+    def __call__(self, path):
+        '''Request path, returning whether it succeeded.
+        '''
+        response = {}
+
+        def start_response(status, headers): # pylint: disable=unused-argument
+            response['status'] = status
+
+        path, _, query = path.partition('?')
+        try:
+            for _ in self.app.uwsgi_application(
+                    {'PATH_INFO': path, 'QUERY_STRING': query}, start_response):
+                pass
+        except Exception: # pylint: disable=broad-except
+            return False
+        return response.get('status', '').startswith('200')
+
+    def close(self):
+        '''Nothing to close.'''
+
+def route_results(name, timings, errors, elapsed):
+    '''LoadResult overall, then one per route, named name or name/route.
+
+    :param timings: list of (path, seconds)
+    :param errors: failed requests
+    :param elapsed: wall clock seconds of the whole replay
+    '''
+    results = [summarize(name, [seconds for _, seconds in timings], errors, elapsed)]
+    routes = {}
+    for path, seconds in timings:
+        routes.setdefault(route(path), []).append(seconds)
+    for key in sorted(routes):
+        results.append(summarize('{}/{}'.format(name, key), routes[key], 0, elapsed))
+    return results
+
+def logged_results(entries):
+    '''The LoadResults the log itself recorded, as route_results; errors are non-200 statuses.
+    '''
+    elapsed = max(entries[-1].t - entries[0].t, 1e-9)
+    ok = [_ for _ in entries if _.status == 200]
+    return route_results(
+        'logged', [(request_path(_), _.seconds) for _ in ok], len(entries) - len(ok), elapsed
+    )
+
+def replay(entries, target, concurrency, speed=None):
+    '''Replay entries.
+
+    :param entries: list of LogEntry
+    :param target: BirdplansUwsgi to call in this process, or a server base url
+    :param concurrency: threads
+    :param speed: multiple of the logged pace to replay at, default as fast as possible
+    :return: (list of (path, seconds) of the successful requests, errors, elapsed seconds)
+    '''
+    if isinstance(target, str):
+        make_sender = lambda: HttpSender(target)
+    else:
+        make_sender = lambda: WsgiSender(target)
+    return drive(
+        [request_path(_) for _ in entries], concurrency, make_sender
+        , None if not speed else arrival_offsets(entries, speed)
+    )
+
+def main():
+    '''Command line entry point.
+    '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('log', help='request log file')
+    parser.add_argument(
+        '--target', action='append'
+        , help='name=url of a running server, default the application in this process'
+    )
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--speed', type=float, help='replay at this multiple of the logged pace')
+    parser.add_argument('--route', action='append', help='only replay these routes')
+    parser.add_argument('--limit', type=int, help='only replay the first this many requests')
+    parser.add_argument('--json', help='also write results to this file')
+    args = parser.parse_args()
+
+    entries = load_log(args.log, args.route, args.limit)
+    if not entries:
+        parser.error('no requests in {}'.format(args.log))
+
+    targets = [_.split('=', 1) for _ in args.target or []]
+    if not targets:
+        # imported here so replaying against a server does not load the application
+        # pylint: disable=import-outside-toplevel
+        from birdplans.preload import preload
+        from birdplans.uwsgi import BirdplansUwsgi
+        app = BirdplansUwsgi()
+        # replaying must not append to the log it reads
+        app.request_log = None
+        # as the uwsgi master does; the threads would otherwise race to finish the lazy imports
+        preload(app, catalog=app.tle.full_catalog)
+        targets = [('inprocess', app)]
+
+    results = logged_results(entries)
+    for name, target in targets:
+        results.extend(route_results(name, *replay(entries, target, args.concurrency, args.speed)))
+    for result in results:
+        print(format_result(result))
+
+    if args.json:
+        with open(args.json, 'w') as fout:
+            json.dump([_._asdict() for _ in results], fout, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+'''
+startup.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+startup benchmark: how long a fresh interpreter takes to import birdplans.uwsgi, build the app and
+answer its first cheap and first pass prediction requests, checked against BUDGET; what a uwsgi
+worker pays when it is respawned with lazy-apps, or the master on reload before preloading
+
+    python -m benchmarks.startup --repeat 5
+'''
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from timeit import default_timer
+
+# seconds; an order of magnitude above what a laptop measures, so only a regression trips them
+BUDGET = {
+    'import': 0.25,
+    'app': 0.25,
+    'first_cheap': 0.1,
+    'first_pass': 5.0,
+}
+
+CHEAP_ROUTE = ('/tz', '')
+PASS_ROUTE = (
+    '/one', 'lat=35&lng=-98&tz=America/Chicago&window_start=2018-11-24T00:00&bird=AO-91&alt=30'
+)
+
+# modules the cheap routes must not load
+HEAVY_MODULES = ('numpy._core.multiarray', 'scipy.optimize._optimize', 'skyfield.timelib')
+
+def call(app, path, query_string):
+    '''Call the WSGI application in-process, returning the status.'''
+    response = {}
+
+    def start_response(status, headers): # pylint: disable=unused-argument
+        response['status'] = status
+
+    b''.join(app.uwsgi_application(
+        {'PATH_INFO': path, 'QUERY_STRING': query_string}, start_response
+    ))
+    return response['status']
+
+def child():
+    '''Measure this interpreter's startup and print it as JSON; run in a fresh process.
+    '''
+    t0 = default_timer()
+    from birdplans.uwsgi import BirdplansUwsgi # pylint: disable=import-outside-toplevel
+    t1 = default_timer()
+    app = BirdplansUwsgi()
+    t2 = default_timer()
+    statuses = [call(app, *CHEAP_ROUTE)]
+    t3 = default_timer()
+    heavy = [_ for _ in HEAVY_MODULES if _ in sys.modules]
+    statuses.append(call(app, *PASS_ROUTE))
+    t4 = default_timer()
+
+    json.dump({
+        'import': t1 - t0,
+        'app': t2 - t1,
+        'first_cheap': t3 - t2,
+        'first_pass': t4 - t3,
+        'heavy_after_cheap': heavy,
+        'statuses': statuses,
+    }, sys.stdout)
+
+def measure():
+    '''Startup timings of one fresh interpreter.
+
+    :return: dict of seconds per BUDGET key, plus the heavy modules the cheap route loaded and the
+        response statuses
+    '''
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.startup', '--child']
+        , cwd=root, check=True, stdout=subprocess.PIPE, text=True
+    ).stdout
+    return json.loads(output)
+
+def over_budget(result):
+    '''Names of the BUDGET entries result exceeds.'''
+    return [_ for _ in BUDGET if result[_] > BUDGET[_]]
+
+def main():
+    '''Command line entry point.
+    '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    results = [measure() for _ in range(args.repeat)]
+    for key, budget in BUDGET.items():
+        print('{:>12}: best {:7.3f}s worst {:7.3f}s budget {:7.3f}s'.format(
+            key, min(_[key] for _ in results), max(_[key] for _ in results), budget
+        ))
+    failed = sorted(set(sum((over_budget(_) for _ in results), [])))
+    if failed:
+        print('over budget: {}'.format(', '.join(failed)))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
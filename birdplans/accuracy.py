@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+'''
+accuracy.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+named accuracy profiles for pass prediction: how densely to sample the window, how tightly to
+refine each pass and which frame model to see the satellite through; `python -m
+benchmarks.bench_accuracy` measures what each one costs and how far its times stray
+'''
+
+from collections import namedtuple
+
+# samples: coarse altitude samples per orbital revolution
+# peak_tolerance: TCA refinement tolerance, seconds
+# edge_tolerance: AOS/LOS refinement tolerance, seconds
+# frame: 'skyfield' for Skyfield's full Earth orientation model (precession, nutation, delta T),
+#     'gmst' for SGP4's TEME rotated into the Earth-fixed frame by GMST alone, as the catalog does
+Accuracy = namedtuple('Accuracy', ['name', 'samples', 'peak_tolerance', 'edge_tolerance', 'frame'])
+
+# TLEs themselves are only good to a kilometre or so, a fraction of a second along track, so
+# standard stops refining well short of that and planning, for schedules read by people, at a
+# second or two
+PROFILES = {
+    'planning': Accuracy('planning', 6, 5.0, 1.0, 'gmst'),
+    'standard': Accuracy('standard', 6, 1.0, 0.1, 'skyfield'),
+    'precise': Accuracy('precise', 12, 0.01, 0.001, 'skyfield'),
+}
+
+DEFAULT_PROFILE = 'standard'
+
+def accuracy_profile(profile=None):
+    '''Look up an accuracy profile.
+
+    :param profile: Accuracy, profile name or None for DEFAULT_PROFILE
+    :raises ValueError: on an unknown profile name
+    '''
+    if isinstance(profile, Accuracy):
+        return profile
+    name = DEFAULT_PROFILE if profile is None else profile
+    if name not in PROFILES:
+        raise ValueError('unknown accuracy profile {!r}, expected one of {}'.format(
+            name, ', '.join(PROFILES)
+        ))
+    return PROFILES[name]
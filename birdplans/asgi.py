@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+
+'''
+asgi.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+asgi application wrapper; serves the BirdplansUwsgi handlers from an event loop, answering a few
+cheap routes inline and offloading everything else to a process pool. Streamed routes come back
+from the pool a chunk at a time, through a queue shared with the pool workers
+'''
+
+import asyncio
+import itertools
+import multiprocessing
+import os
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from timeit import default_timer
+
+from birdplans import requestlog
+from birdplans.instrumentation import METRICS
+from birdplans.uwsgi import BirdplansUwsgi, flight_key
+from birdplans.warmup import warmup, warmup_enabled
+
+# routes cheap enough for the event loop, streamed as their handlers yield; everything else
+# propagates or refines passes somewhere and goes to the pool
+INLINE_ROUTES = frozenset(['', 'env', 'birds', 'tz', 'ready', 'metrics'])
+
+# offloaded routes whose clients read along as the handler writes: exports of any length, doppler
+# and tracking feeds; each chunk is sent on as soon as the pool worker yields it
+STREAMED_ROUTES = frozenset(['csv', 'ics', 'doppler', 'track'])
+
+# offloaded routes whose responses depend on the query alone, so identical requests share a pool
+# call and repeats are answered from the result cache
+CACHED_ROUTES = frozenset(['one'])
+
+# the per-process application used by the prediction pool workers
+WORKER_APP = None
+
+# in the pool workers, the queue streamed responses go back to the event loop on
+CHUNKS = None
+
+def init_worker(processes=1, chunks=None):
+    '''Process pool initializer; build the application state once per pool worker.
+
+    :param processes: pool size, the workers sharing the cpus with this one
+    :param chunks: multiprocessing queue for streamed responses
+    '''
+    global WORKER_APP, CHUNKS # pylint: disable=global-statement
+    CHUNKS = chunks
+    # a forked worker starts with the parent's metrics, which the parent already counts
+    METRICS.drain()
+    WORKER_APP = BirdplansUwsgi(workers=processes)
+    if warmup_enabled():
+        warmup(WORKER_APP)
+
+def worker_warmup():
+    '''Process pool entry point, the warm-up report of the worker it lands on, or None.
+    '''
+    if WORKER_APP is None:
+        init_worker()
+    return WORKER_APP.warmup
+
+def call_handler(app, env):
+    '''Run a WSGI-style handler to completion, buffering its body to send it back from the pool.
+
+    :param app: BirdplansUwsgi instance to route the request with
+    :param env: WSGI environment dict
+    :return: (status code, [(header, value)], body bytes) tuple
+    '''
+    response = {}
+
+    def start_response(status, headers):
+        '''Capture the status line and headers.
+        '''
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = headers
+
+    body = b''.join(app.uwsgi_application(env, start_response))
+
+    return response['status'], response['headers'], body
+
+def offloaded_handler(env):
+    '''Process pool entry point, routes env through this worker's application.
+
+    :return: (response, metrics drained from this worker) tuple, so /metrics on the event loop
+        covers the pool
+    '''
+    if WORKER_APP is None:
+        init_worker()
+    response = call_handler(WORKER_APP, env)
+    return response, METRICS.drain()
+
+def streamed_handler(env, stream):
+    '''Process pool entry point for streamed routes: routes env through this worker's application,
+    putting (stream, kind, value) messages on CHUNKS as it goes: 'start' with (status code,
+    headers), 'body' with each chunk, then 'end' with the metrics drained from this worker, or
+    'error' if the handler raised.
+
+    :param stream: id the event loop tells this response's messages apart by
+    '''
+    if WORKER_APP is None:
+        init_worker()
+
+    def start_response(status, headers):
+        '''Send the status line and headers on ahead of the body.
+        '''
+        CHUNKS.put((stream, 'start', (int(status.split(' ', 1)[0]), headers)))
+
+    try:
+        for chunk in WORKER_APP.uwsgi_application(env, start_response):
+            if chunk:
+                CHUNKS.put((stream, 'body', chunk))
+    except Exception as error:
+        CHUNKS.put((stream, 'error', repr(error)))
+        raise
+    CHUNKS.put((stream, 'end', METRICS.drain()))
+
+def make_environ(scope):
+    '''Build the subset of a WSGI environment our handlers use from an ASGI http scope. The result
+    must stay picklable so it can be shipped to the process pool.
+
+    :param scope: ASGI connection scope
+    '''
+    env = {
+        'REQUEST_METHOD': scope.get('method', 'GET'),
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+    }
+
+    if scope.get('server'):
+        env['SERVER_NAME'], env['SERVER_PORT'] = scope['server'][0], str(scope['server'][1])
+    if scope.get('client'):
+        env['REMOTE_ADDR'] = scope['client'][0]
+
+    for name, value in scope.get('headers', []):
+        key = name.decode('latin-1').upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = 'HTTP_' + key
+        env[key] = value.decode('latin-1')
+
+    return env
+
+def response_start(status, headers):
+    '''ASGI response start message.
+
+    :param status: status code
+    :param headers: [(header, value)] as given to start_response
+    '''
+    return {
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (bytes(name.lower(), 'latin-1'), bytes(value, 'latin-1')) for name, value in headers
+        ],
+    }
+
+class ResultCache:
+    '''Small LRU of completed prediction responses so repeated queries skip the process pool.
+    '''
+
+    def __init__(self, size=256, ttl=300.0):
+        '''Initialize.
+
+        :param size: maximum number of responses to keep
+        :param ttl: seconds a cached response stays valid
+        '''
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        '''Return the cached response for key, or None.
+        '''
+        try:
+            created, response = self.entries[key]
+        except KeyError:
+            return None
+
+        if default_timer() - created > self.ttl:
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+        return response
+
+    def set(self, key, response):
+        '''Cache response under key, evicting the least recently used entries.
+        '''
+        self.entries[key] = (default_timer(), response)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+class BirdplansAsgi:
+    '''Birdplans asgi application
+    '''
+
+    def __init__(self, app=None, processes=None, inline_routes=None, cache=None):
+        '''Set application defaults; the wrapped application and the pool are built lazily so
+        importing this module stays cheap.
+
+        :param app: BirdplansUwsgi instance serving the inline routes
+        :param processes: prediction pool size, default BIRDPLANS_PROCESSES or the cpu count
+        :param inline_routes: set of route names answered on the event loop, the rest go to the
+            pool
+        :param cache: ResultCache for offloaded responses
+        '''
+        self.app = app
+        self.processes = processes
+        self.inline_routes = INLINE_ROUTES if inline_routes is None else inline_routes
+        self.cache = ResultCache() if cache is None else cache
+        self.executor = None
+        # pool futures of the offloaded requests under way, by cache key
+        self.inflight = {}
+        # streamed responses under way: the queue the pool workers put their chunks on, the thread
+        # handing them to each response's (event loop, asyncio queue) by stream id
+        self.chunks = None
+        self.reader = None
+        self.streams = {}
+        self.stream_ids = itertools.count()
+
+    def get_app(self):
+        '''Return the inline application, building it on first use.
+        '''
+        if self.app is None:
+            self.app = BirdplansUwsgi()
+        return self.app
+
+    def get_executor(self):
+        '''Return the prediction process pool, starting it on first use.
+        '''
+        if self.executor is None:
+            processes = self.processes
+            if processes is None:
+                processes = int(os.environ.get('BIRDPLANS_PROCESSES', os.cpu_count() or 1))
+            self.processes = processes
+            # made before the workers, so they inherit it
+            self.chunks = multiprocessing.Queue()
+            self.reader = threading.Thread(target=self.read_chunks, daemon=True)
+            self.reader.start()
+            self.executor = ProcessPoolExecutor(
+                processes, initializer=init_worker, initargs=(processes, self.chunks)
+            )
+        return self.executor
+
+    def shutdown(self):
+        '''Stop the prediction pool.
+        '''
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        if self.reader is not None:
+            self.chunks.put(None)
+            self.reader.join()
+            self.chunks.close()
+            self.chunks = self.reader = None
+
+    def read_chunks(self):
+        '''Thread handing the messages of streamed responses from the pool to the event loop
+        serving each, until shutdown sends None. Messages of responses no longer being sent are
+        dropped.
+        '''
+        while True:
+            message = self.chunks.get()
+            if message is None:
+                return
+            stream, kind, value = message
+            target = self.streams.get(stream)
+            if target is None:
+                continue
+            loop, queue = target
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, (kind, value))
+            except RuntimeError:
+                # its loop is closed
+                pass
+
+    async def __call__(self, scope, receive, send):
+        '''ASGI entry point.
+        '''
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, send)
+
+    async def warm_pool(self):
+        '''Start every pool worker and wait for its warm-up, marking the inline application ready
+        once all are done; /ready reports the slowest worker.
+        '''
+        app = self.get_app()
+        app.ready = False
+        executor = self.get_executor()
+        loop = asyncio.get_running_loop()
+        # one call per process: concurrent submissions make the pool start all of its workers
+        reports = await asyncio.gather(*[
+            loop.run_in_executor(executor, worker_warmup) for _ in range(self.processes)
+        ])
+        reports = [_ for _ in reports if _ is not None]
+        if reports:
+            app.warmup = max(reports, key=lambda report: report.seconds)
+        app.ready = True
+
+    async def lifespan(self, receive, send):
+        '''Build the application state and warm the pool at startup, stop the pool at shutdown.
+        '''
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self.warm_pool()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, send):
+        '''Route an http request inline or to the prediction pool.
+        '''
+        env = make_environ(scope)
+        route_to = env['PATH_INFO'].split('/')[1]
+
+        if route_to in self.inline_routes:
+            await self.send_inline(env, send)
+            return
+
+        if route_to in STREAMED_ROUTES:
+            await self.send_streamed(env, send)
+            return
+
+        if route_to in CACHED_ROUTES:
+            response = await self.cached_response(env, route_to)
+        else:
+            response = await self.offload(env)
+
+        status, headers, body = response
+        await send(response_start(status, headers))
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def send_inline(self, env, send):
+        '''Answer a cheap route from the inline application, sending each chunk as its handler
+        yields it.
+        '''
+        response = {}
+
+        def start_response(status, headers):
+            '''Capture the status line and headers.
+            '''
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = headers
+
+        chunks = iter(self.get_app().uwsgi_application(env, start_response))
+        # the handler calls start_response before its first chunk
+        body = next(chunks, b'')
+        await send(response_start(response['status'], response['headers']))
+        for chunk in chunks:
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+            body = chunk
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def send_streamed(self, env, send):
+        '''Answer a streamed route in the prediction pool, sending each chunk on as the pool worker
+        yields it.
+        '''
+        executor = self.get_executor()
+        loop = asyncio.get_running_loop()
+        stream = next(self.stream_ids)
+        queue = asyncio.Queue()
+        self.streams[stream] = (loop, queue)
+        try:
+            future = loop.run_in_executor(executor, streamed_handler, env, stream)
+
+            def failed(done):
+                '''A pool worker dying sends nothing more; stop waiting on it.'''
+                if done.cancelled() or done.exception() is not None:
+                    queue.put_nowait(('error', None))
+
+            future.add_done_callback(failed)
+            started = False
+            while True:
+                kind, value = await queue.get()
+                if kind == 'start':
+                    started = True
+                    await send(response_start(*value))
+                elif kind == 'body':
+                    await send({'type': 'http.response.body', 'body': value, 'more_body': True})
+                else:
+                    break
+
+            if kind == 'end':
+                METRICS.merge(value)
+            if started:
+                await send({'type': 'http.response.body', 'body': b''})
+            # raises what the handler did, as for the other routes
+            await future
+        finally:
+            del self.streams[stream]
+
+    async def offload(self, env):
+        '''Answer a request in the prediction pool, adding the metrics the pool worker recorded
+        to this process's.
+
+        :return: (status code, [(header, value)], body bytes) tuple
+        '''
+        response, metrics = await asyncio.get_running_loop().run_in_executor(
+            self.get_executor(), offloaded_handler, env
+        )
+        METRICS.merge(metrics)
+        return response
+
+    async def cached_response(self, env, route_to):
+        '''Response to a query-determined route from the result cache, or from a pool call shared
+        with identical requests under way.
+
+        :return: (status code, [(header, value)], body bytes) tuple
+        '''
+        t0 = default_timer()
+        # the same parameters, however written, and observers in the same cell share a key
+        key = (
+            env['PATH_INFO']
+            , flight_key(env['QUERY_STRING'], None, self.get_app().quantizer)
+        )
+        response = self.cache.get(key)
+        if response is not None:
+            if self.get_app().request_log is not None:
+                # answered here, so the pool workers never see it to log it
+                record = requestlog.request_record(env)
+                record.update(
+                    status=response[0], seconds=round(default_timer() - t0, 6)
+                    , bytes=len(response[2]), cache={'result_hits': 1}
+                )
+                self.get_app().request_log.write(record)
+            return response
+
+        # identical requests under way share one pool call
+        pending = self.inflight.get(key)
+        if pending is None:
+            pending = self.inflight[key] = asyncio.ensure_future(self.offload(env))
+            pending.add_done_callback(lambda _: self.inflight.pop(key, None))
+        else:
+            METRICS.increment('coalesced_requests', route=route_to, scope='loop')
+        # one request going away must not cancel the call the others wait on
+        response = await asyncio.shield(pending)
+        # a response cut short by its deadline may be whole next time
+        if response[0] == 200 and 'Partial' not in dict(response[1]):
+            self.cache.set(key, response)
+        return response
+
+application = BirdplansAsgi()
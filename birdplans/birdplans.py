@@ -13,16 +13,16 @@ import html
 import sys
 
 from datetime import datetime, timezone
-from collections import namedtuple
+from collections import ChainMap, namedtuple
 
 import numpy as np
 
 from skyfield.api import Loader, Topos
-from skyfield.functions import BytesIO
-from skyfield.iokit import parse_tle
 from tzwhere import tzwhere
 from scipy import optimize
 
+from birdplans.preload import freeze, preloading
+from birdplans.satellitepasspredictor import time_grid
 from birdplans.tlemanager import TleManager
 
 load = Loader('data/skyfield')
@@ -37,11 +37,8 @@ class BirdPlan:
         '''Initialize persistent state.
         '''
         self.tlemanager = tlemanager
-        self.tle = {}
-        for names, sat in parse_tle(BytesIO(bytes(tlemanager.tlestring, 'ascii'))):
-            self.tle[sat.model.satnum] = sat
-            for name in names:
-                self.tle[name] = sat
+        # share the tlemanager's lazily parsed satellites, local aliases layered on top
+        self.tle = ChainMap({}, tlemanager.bird)
         self.timescale = load.timescale()
 
     def add_satellite_alias(self, satellite, alias):
@@ -88,10 +85,7 @@ class SatellitePassPredictor:
         self.sample_points = int(math.ceil(self.window_revolutions * 6.0))
         self.sample_step = self.window_duration / self.sample_points
 
-        sample_time_range = TIMESCALE.tai_jd([
-            window_start.tai + (_ * self.sample_step)
-            for _ in range(self.sample_points)
-        ])
+        sample_time_range = time_grid(window_start, self.sample_step, self.sample_points, TIMESCALE)
 
         alt_f = lambda t: self.diff.altaz(t)[0].degrees
 
@@ -169,10 +163,9 @@ class PassQuery:
         self.window_revolutions = self.window_width / (self.orbit_period_per_minute / 24.0 / 60.0)
         self.sample_points = int(math.ceil(self.window_revolutions * 6.0))
         self.sample_step = self.window_width / self.sample_points
-        self.sample_time_range = self.birdplan.timescale.tai_jd([
-            window_start.tai + (_ * self.sample_step)
-            for _ in range(self.sample_points)
-        ])
+        self.sample_time_range = time_grid(
+            window_start, self.sample_step, self.sample_points, self.birdplan.timescale
+        )
         self.sample_altitudes = alt_f(self.sample_time_range)
 
         left_diff = np.ediff1d(self.sample_altitudes, to_begin=0.0)
@@ -555,6 +548,9 @@ try:
     TZWHERE = tzwhere.tzwhere()
     BIRDPLAN = BirdPlan(TleManager())
     TIMESCALE = load.timescale()
+    if preloading(uwsgi):
+        # tzwhere's polygon tables are the bulk of this state; keep the workers from copying them
+        freeze()
 except ModuleNotFoundError:
     pass
     #tzwhere = tzwhere.tzwhere()
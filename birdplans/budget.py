@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+
+'''
+budget.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+compute budgeting for pass predictions: what a request will cost is estimated from its birds' mean
+motion, its window and the track points along the passes before anything is computed. Requests
+estimated over the budget are refused, expensive ones wait for one of a few slots, and a deadline
+cuts a request short with what it has so far
+
+    BIRDPLANS_BUDGET=20        estimated seconds over which a request is refused, 0 for no limit
+    BIRDPLANS_HEAVY=2          estimated seconds over which a request waits for a slot, 0 never
+    BIRDPLANS_HEAVY_SLOTS=2    expensive requests computed at once, shared by the workers through
+                               BIRDPLANS_FLIGHT_DIR, else per worker
+'''
+
+import fcntl
+import os
+import threading
+import time
+
+from collections import namedtuple
+from contextlib import contextmanager
+from timeit import default_timer
+
+from birdplans.accuracy import accuracy_profile
+from birdplans.instrumentation import METRICS
+from birdplans.satellitepasspredictor import TRACK_POINTS, sky_period
+
+# cost model, fitted to pass_estimation_wrapper over the data/test birds of every orbit class for
+# 1 and 5 day windows; estimates fall within a factor of 3 of the time taken, most a little over.
+# Each trip of a bird round the sky is sampled and its culmination refined, at a price set by the
+# profile's tolerances; every pass found is then tracked and lit at TRACK_POINTS
+BIRD_SECONDS = 0.003
+ORBIT_SECONDS = {'planning': 0.0001, 'standard': 0.0006, 'precise': 0.001}
+POINT_SECONDS = 0.0007
+
+# passes above the horizon per trip round the sky, across orbit classes and observers
+PASSES_PER_ORBIT = 0.3
+
+BUDGET_SECONDS = 20.0
+HEAVY_SECONDS = 2.0
+HEAVY_SLOTS = 2
+
+# seconds an expensive request waits for a slot before it is turned away
+QUEUE_TIMEOUT = 30.0
+
+# seconds between polls of the slot lock files
+QUEUE_POLL = 0.05
+
+# birds: bird and observer pairs predicted
+# orbits: trips round the sky sampled, over every bird and observer
+# points: track points expected along the passes found
+# seconds: estimated computation
+Cost = namedtuple('Cost', ['birds', 'orbits', 'points', 'seconds'])
+
+class OverBudget(Exception):
+    '''A request estimated to cost more than the budget.'''
+
+    def __init__(self, cost, budget):
+        '''Initialize.
+
+        :param cost: Cost of the request
+        :param budget: seconds allowed
+        '''
+        super().__init__(
+            'estimated {:.1f}s of computation is over the budget of {:.1f}s; ask for fewer birds'
+            ' or days'.format(cost.seconds, budget)
+        )
+        self.cost = cost
+        self.budget = budget
+
+class Busy(Exception):
+    '''An expensive request that found no slot free in time.'''
+
+    def __init__(self, timeout):
+        '''Initialize.
+
+        :param timeout: seconds waited
+        '''
+        super().__init__('no slot for an expensive request came free in {:.0f}s'.format(timeout))
+        self.timeout = timeout
+
+def estimate_cost(satellites, window_start, window_stop, accuracy=None, observers=1
+                  , track_points=TRACK_POINTS):
+    '''Estimate what predicting the passes of satellites will cost, from their mean motion and
+    eccentricity alone.
+
+    :param satellites: list of Skyfield EarthSatellite
+    :param window_start: tz-aware Python datetime
+    :param window_stop: tz-aware Python datetime
+    :param accuracy: Accuracy or profile name, default DEFAULT_PROFILE
+    :param observers: observers each satellite is predicted for
+    :param track_points: points tracked and lit along each pass
+    :return: Cost
+    '''
+    accuracy = accuracy_profile(accuracy)
+    days = max((window_stop - window_start).total_seconds(), 0.0) / 86400.0
+    birds = len(satellites) * observers
+    orbits = sum(days / sky_period(_) for _ in satellites) * observers
+    points = orbits * PASSES_PER_ORBIT * track_points
+    return Cost(
+        birds, orbits, points
+        , birds * BIRD_SECONDS + orbits * ORBIT_SECONDS[accuracy.name] + points * POINT_SECONDS
+    )
+
+class Deadline:
+    '''Point in time a request should stop computing and answer with what it has.
+    '''
+
+    def __init__(self, seconds):
+        '''Initialize.
+
+        :param seconds: from now
+        :raises ValueError: unless seconds is positive
+        '''
+        if not seconds > 0.0:
+            raise ValueError('deadline must be more than 0 seconds')
+        self.seconds = seconds
+        self.stop = default_timer() + seconds
+
+    def expired(self):
+        '''Whether the deadline has passed.'''
+        return default_timer() >= self.stop
+
+class Admission:
+    '''Admission control by estimated cost: refuse what is over the budget, and let only a few
+    expensive requests compute at once so they cannot take every worker from the interactive
+    ones.
+    '''
+
+    def __init__(self, budget=BUDGET_SECONDS, heavy=HEAVY_SECONDS, slots=HEAVY_SLOTS
+                 , directory=None, timeout=QUEUE_TIMEOUT):
+        '''Initialize.
+
+        :param budget: estimated seconds over which a request is refused, 0 for no limit
+        :param heavy: estimated seconds over which a request waits for a slot, 0 never
+        :param slots: expensive requests computed at once
+        :param directory: directory shared by the workers for the slot lock files, default
+            slots per process
+        :param timeout: seconds an expensive request waits for a slot
+        '''
+        self.budget = budget
+        self.heavy = heavy
+        self.slots = slots
+        self.directory = directory
+        self.timeout = timeout
+        self.semaphore = threading.BoundedSemaphore(slots)
+        if directory is not None:
+            # apart from the flight files; the sweep passes over subdirectories
+            self.directory = os.path.join(directory, 'heavy')
+            os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def from_environment(cls):
+        '''Admission from BIRDPLANS_BUDGET, BIRDPLANS_HEAVY and BIRDPLANS_HEAVY_SLOTS, with slots
+        shared through BIRDPLANS_FLIGHT_DIR.
+        '''
+        return cls(
+            float(os.environ.get('BIRDPLANS_BUDGET', BUDGET_SECONDS))
+            , float(os.environ.get('BIRDPLANS_HEAVY', HEAVY_SECONDS))
+            , int(os.environ.get('BIRDPLANS_HEAVY_SLOTS', HEAVY_SLOTS))
+            , os.environ.get('BIRDPLANS_FLIGHT_DIR') or None
+        )
+
+    @contextmanager
+    def admit(self, cost, route=''):
+        '''Run the body of a with statement if cost is admitted, in a slot if it is expensive.
+
+        :param cost: Cost of the request
+        :param route: metrics label
+        :raises OverBudget: if cost is over the budget
+        :raises Busy: if no slot came free in time
+        '''
+        if self.budget and cost.seconds > self.budget:
+            METRICS.increment('admissions', route=route, outcome='refused')
+            raise OverBudget(cost, self.budget)
+
+        if not self.heavy or cost.seconds <= self.heavy:
+            METRICS.increment('admissions', route=route, outcome='admitted')
+            yield
+            return
+
+        t0 = default_timer()
+        release = self.acquire()
+        if release is None:
+            METRICS.increment('admissions', route=route, outcome='busy')
+            raise Busy(self.timeout)
+        METRICS.increment('admissions', route=route, outcome='queued')
+        METRICS.observe('admission_wait_seconds', default_timer() - t0, route=route)
+        try:
+            yield
+        finally:
+            release()
+
+    def acquire(self):
+        '''Wait up to the timeout for a slot.
+
+        :return: callable releasing the slot, or None if none came free
+        '''
+        if self.directory is None:
+            if self.semaphore.acquire(timeout=self.timeout):
+                return self.semaphore.release
+            return None
+
+        t0 = default_timer()
+        while True:
+            for slot in range(self.slots):
+                fd = os.open(
+                    os.path.join(self.directory, '{}.lock'.format(slot))
+                    , os.O_RDWR | os.O_CREAT, 0o644
+                )
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    os.close(fd)
+                    continue
+                # closing the file releases the lock, and so does the process exiting
+                return lambda fd=fd: os.close(fd)
+            if default_timer() - t0 > self.timeout:
+                return None
+            time.sleep(QUEUE_POLL)
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+
+'''
+catalog.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+batched propagation of many satellites at once; the scalable path behind overhead and pass queries
+across the full TLE catalog
+'''
+
+from collections import namedtuple
+
+import numpy as np
+
+from sgp4.api import SatrecArray
+from skyfield.sgp4lib import theta_GMST1982
+
+from birdplans.satellitepasspredictor import TIMESCALE, leap_seconds
+
+WGS84_RADIUS_KM = 6378.137
+WGS84_FLATTENING = 1.0 / 298.257223563
+EARTH_ROTATION_RAD_S = 7.292115e-5
+
+# passes peaking lower than this are not worth sampling finely enough to find
+MINIMUM_DETECTABLE_ELEVATION = 1.0
+
+# shortest and longest coarse sampling steps, seconds
+MINIMUM_STEP = 15.0
+MAXIMUM_STEP = 1920.0
+
+# samples per propagation chunk, bounds the memory of the coarse search
+CHUNK_SAMPLES = 512
+
+# interior points evaluated per bracket in each refinement round
+REFINE_POINTS = 8
+
+Overhead = namedtuple('Overhead', ['bird', 'alt', 'az', 'distance'])
+CatalogPasses = namedtuple('CatalogPasses', ['bird', 'aos', 'tca', 'los', 'alt'])
+
+def sgp4_dates(t):
+    '''Split Skyfield times into the (whole, fraction) UTC Julian dates SGP4 expects.
+    '''
+    return t.whole, t.tai_fraction - leap_seconds(t.tai) / 86400.0
+
+def observer_itrf(latlng, elevation_m=0.0):
+    '''WGS84 position of an Earth-based observer.
+
+    :param latlng: (latitude, longitude) degrees
+    :param elevation_m: height above the ellipsoid, meters
+    :return: (ITRF position in km, 3x3 matrix whose rows are the local east, north, up vectors)
+    '''
+    lat, lng = np.radians(latlng)
+    e2 = WGS84_FLATTENING * (2.0 - WGS84_FLATTENING)
+    n = WGS84_RADIUS_KM / np.sqrt(1.0 - e2 * np.sin(lat) ** 2)
+    height = elevation_m / 1000.0
+
+    position = np.array([
+        (n + height) * np.cos(lat) * np.cos(lng)
+        , (n + height) * np.cos(lat) * np.sin(lng)
+        , (n * (1.0 - e2) + height) * np.sin(lat)
+    ])
+    enu = np.array([
+        [-np.sin(lng), np.cos(lng), 0.0]
+        , [-np.sin(lat) * np.cos(lng), -np.sin(lat) * np.sin(lng), np.cos(lat)]
+        , [np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)]
+    ])
+
+    return position, enu
+
+def teme_to_pef(r, whole, ut1_fraction):
+    '''Rotate TEME positions into the Earth-fixed frame by GMST, ignoring polar motion.
+
+    :param r: positions, km, shape (..., 3) with the time axis broadcastable against whole
+    :param whole: whole part of the UT1 Julian dates
+    :param ut1_fraction: fractional part of the UT1 Julian dates
+    '''
+    theta, _ = theta_GMST1982(whole, ut1_fraction)
+    cos, sin = np.cos(theta), np.sin(theta)
+
+    return np.stack([
+        cos * r[..., 0] + sin * r[..., 1]
+        , -sin * r[..., 0] + cos * r[..., 1]
+        , r[..., 2]
+    ], axis=-1)
+
+def topocentric(r, latlng):
+    '''Altitude and azimuth degrees and distance km of Earth-fixed positions seen from latlng.
+    '''
+    position, enu = observer_itrf(latlng)
+    east, north, up = np.moveaxis((r - position) @ enu.T, -1, 0)
+    distance = np.sqrt(east ** 2 + north ** 2 + up ** 2)
+
+    return (
+        np.degrees(np.arcsin(up / distance))
+        , np.degrees(np.arctan2(east, north)) % 360.0
+        , distance
+    )
+
+def footprint_angle(height_km, elevation_deg):
+    '''Earth central angle between the sub-satellite point and the edge of the region where a
+    satellite at height_km appears at least elevation_deg above the horizon, radians.
+    '''
+    elevation = np.radians(elevation_deg)
+    ratio = WGS84_RADIUS_KM / (WGS84_RADIUS_KM + np.maximum(height_km, 0.0))
+    return np.arccos(ratio * np.cos(elevation)) - elevation
+
+def reachable(satellite, latlng, minimum_altitude=0.0):
+    '''Whether the satellite can ever climb minimum_altitude above the horizon at latlng, judged
+    from its inclination and apogee alone.
+    '''
+    model = satellite.model
+    apogee_km = model.alta * model.radiusearthkm
+    inclination = np.degrees(model.inclo)
+    max_latitude = min(inclination, 180.0 - inclination)
+
+    return abs(latlng[0]) <= max_latitude + np.degrees(footprint_angle(apogee_km, minimum_altitude))
+
+def prefilter(satellites, latlng, minimum_altitude=0.0):
+    '''Drop the satellites that can never be seen from latlng.
+
+    :param satellites: dict of {bird: EarthSatellite}
+    '''
+    return {
+        bird: satellite for bird, satellite in satellites.items()
+        if reachable(satellite, latlng, minimum_altitude)
+    }
+
+def detection_step(satellite, minimum_altitude=0.0, horizon=0.0):
+    '''Coarse sampling step, seconds, short enough to land a sample above horizon inside every
+    pass peaking at least minimum_altitude above the horizon. The shortest such passes happen at
+    perigee, so size the step from the perigee height and speed, then round down to a power of two
+    multiple of MINIMUM_STEP so satellites with similar orbits share a time grid.
+    '''
+    model = satellite.model
+    perigee_km = model.altp * model.radiusearthkm
+    radius = model.radiusearthkm + perigee_km
+    semimajor = model.a * model.radiusearthkm
+    speed = np.sqrt(model.mu * (2.0 / radius - 1.0 / semimajor))
+    rate = speed / radius + EARTH_ROTATION_RAD_S
+
+    edge = footprint_angle(perigee_km, horizon)
+    peak = footprint_angle(
+        perigee_km, max(minimum_altitude, horizon + MINIMUM_DETECTABLE_ELEVATION)
+    )
+    duration = 2.0 * np.sqrt(max(edge ** 2 - peak ** 2, 0.0)) / rate
+
+    step = float(np.clip(duration / 2.0, MINIMUM_STEP, MAXIMUM_STEP))
+    return MINIMUM_STEP * 2.0 ** np.floor(np.log2(step / MINIMUM_STEP))
+
+class SatelliteBatch:
+    '''SGP4 elements for many satellites, propagated together.
+    '''
+
+    def __init__(self, satellites):
+        '''Initialize.
+
+        :param satellites: dict of {bird: EarthSatellite}
+        '''
+        self.birds = list(satellites)
+        self.satellites = [satellites[_] for _ in self.birds]
+        self.array = SatrecArray([_.model for _ in self.satellites]) if self.birds else None
+
+    def __len__(self):
+        return len(self.birds)
+
+    def subset(self, index):
+        '''SatelliteBatch of the satellites at index, in that order.
+        '''
+        return SatelliteBatch({self.birds[_]: self.satellites[_] for _ in index})
+
+    def replaced(self, satellites):
+        '''SatelliteBatch with some satellites swapped out, the rest shared with this one.
+
+        :param satellites: dict of {bird: EarthSatellite, or None to drop the bird}
+        '''
+        merged = dict(zip(self.birds, self.satellites))
+        merged.update(satellites)
+        return SatelliteBatch({bird: _ for bird, _ in merged.items() if _ is not None})
+
+    def positions(self, t):
+        '''Earth-fixed positions, km, of every satellite at every time; NaN where SGP4 failed.
+
+        :param t: Skyfield Time array
+        :return: array of shape (satellites, times, 3)
+        '''
+        jd, fraction = sgp4_dates(t)
+        errors, r, _ = self.array.sgp4(np.atleast_1d(jd), np.atleast_1d(fraction))
+        r[errors != 0] = np.nan
+        return teme_to_pef(r, np.atleast_1d(t.whole), np.atleast_1d(t.ut1_fraction))
+
+    def positions_at(self, index, tai):
+        '''Earth-fixed positions, km, of satellite index[i] at TAI Julian date tai[i].
+
+        :param index: integer array of satellite indexes into self.birds
+        :param tai: array of TAI Julian dates, same length as index
+        :return: array of shape (len(index), 3)
+        '''
+        t = TIMESCALE.tai_jd(tai)
+        jd, fraction = sgp4_dates(t)
+        r = np.empty((len(index), 3))
+
+        order = np.argsort(index, kind='stable')
+        bounds = np.flatnonzero(np.diff(index[order])) + 1
+        for group in np.split(order, bounds):
+            if len(group):
+                errors, r[group], _ = self.satellites[index[group[0]]].model.sgp4_array(
+                    jd[group], fraction[group]
+                )
+                r[group[errors != 0]] = np.nan
+
+        return teme_to_pef(r, t.whole, t.ut1_fraction)
+
+    def altaz(self, latlng, t):
+        '''(alt, az, distance) arrays of shape (satellites, times) seen from latlng.
+        '''
+        return topocentric(self.positions(t), latlng)
+
+    def altitude_at(self, latlng, index, tai):
+        '''Altitude of satellite index[i] at TAI Julian date tai[i] seen from latlng.
+        '''
+        return topocentric(self.positions_at(index, tai), latlng)[0]
+
+def overhead(batch, latlng, t, minimum_altitude=0.0):
+    '''Every satellite in batch at least minimum_altitude above the horizon at latlng.
+
+    :param batch: SatelliteBatch
+    :param latlng: (latitude, longitude) degrees
+    :param t: Skyfield Time
+    :param minimum_altitude: altitude threshold, degrees
+    :return: list of Overhead, highest first
+    '''
+    if not len(batch):
+        return []
+
+    alt, az, distance = (_[:, 0] for _ in batch.altaz(latlng, TIMESCALE.tai_jd([t.tai])))
+    up = np.flatnonzero(alt >= minimum_altitude)
+
+    return sorted(
+        (Overhead(batch.birds[_], alt[_], az[_], distance[_]) for _ in up)
+        , key=lambda o: -o.alt
+    )
+
+def search_crossings(
+        batch, latlng, index, below, above, precision, points=REFINE_POINTS, horizon=0.0):
+    '''Refine horizon crossings of many satellites at once, splitting every bracket into
+    points + 1 pieces per round so each round costs one batched propagation.
+
+    :param index: satellite index of each crossing
+    :param below: TAI Julian dates at which each satellite is below the horizon
+    :param above: TAI Julian dates at which each satellite is above the horizon
+    :param precision: stop once a bracket is this narrow, days
+    :param horizon: altitude of the horizon, degrees
+    :return: TAI Julian dates of the crossings
+    '''
+    fractions = np.arange(1, points + 1) / (points + 1.0)
+    below, above = below.copy(), above.copy()
+    active = np.flatnonzero(np.abs(above - below) > precision)
+
+    while len(active):
+        grid = below[active, None] + (above - below)[active, None] * fractions
+        up = batch.altitude_at(
+            latlng, np.repeat(index[active], points), grid.ravel()
+        ).reshape(grid.shape) > horizon
+
+        # the first interior point above the horizon, or points if there is none
+        first = np.where(up.any(axis=1), up.argmax(axis=1), points)
+        grid = np.column_stack([below[active], grid, above[active]])
+        rows = np.arange(len(active))
+        below[active], above[active] = grid[rows, first], grid[rows, first + 1]
+
+        active = active[np.abs(above[active] - below[active]) > precision]
+
+    return (below + above) / 2.0
+
+def search_peaks(batch, latlng, index, start, stop, precision, points=REFINE_POINTS):
+    '''Grid search for the time of highest altitude of many satellites at once, narrowing every
+    interval to the two pieces around its highest point per round.
+
+    :return: (TAI Julian dates, altitudes) of the peaks
+    '''
+    fractions = np.arange(0, points + 2) / (points + 1.0)
+    start, stop = start.copy(), stop.copy()
+    active = np.flatnonzero(stop - start > precision)
+
+    while len(active):
+        grid = start[active, None] + (stop - start)[active, None] * fractions
+        alt = batch.altitude_at(
+            latlng, np.repeat(index[active], points + 2), grid.ravel()
+        ).reshape(grid.shape)
+        best = np.argmax(np.where(np.isnan(alt), -np.inf, alt), axis=1)
+        rows = np.arange(len(active))
+        start[active] = grid[rows, np.maximum(best - 1, 0)]
+        stop[active] = grid[rows, np.minimum(best + 1, points + 1)]
+
+        active = active[stop[active] - start[active] > precision]
+
+    peak = (start + stop) / 2.0
+    return peak, batch.altitude_at(latlng, index, peak) if len(index) else np.array([])
+
+def refine_passes(batch, latlng, grid, up, minimum_altitude, precision, horizon):
+    '''Turn one observer's coarse above-horizon samples into refined passes.
+
+    :param batch: SatelliteBatch that was sampled
+    :param grid: TAI Julian dates of the samples
+    :param up: boolean array of shape (satellites, samples), above the horizon
+    :return: (birds, aos, tca, los, alt) arrays
+    '''
+    # runs of samples above the horizon: index of the first sample up, first sample down
+    edges = np.diff(np.pad(up.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+    sat, first_up = np.nonzero(edges == 1)
+    _, first_down = np.nonzero(edges == -1)
+
+    # peaks first, searching from the sample before each rise to the sample after each set,
+    # so only passes high enough to keep pay for refining their crossings
+    tca, alt = search_peaks(
+        batch, latlng, sat, grid[np.maximum(first_up - 1, 0)]
+        , grid[np.minimum(first_down, len(grid) - 1)], precision
+    )
+    keep = alt >= minimum_altitude
+    sat, first_up, first_down, tca, alt = (
+        _[keep] for _ in (sat, first_up, first_down, tca, alt)
+    )
+
+    rises = first_up > 0
+    aos = np.full(len(sat), grid[0])
+    aos[rises] = search_crossings(
+        batch, latlng, sat[rises], grid[first_up[rises] - 1], grid[first_up[rises]]
+        , precision, horizon=horizon
+    )
+
+    sets = first_down < len(grid)
+    los = np.full(len(sat), grid[-1])
+    los[sets] = search_crossings(
+        batch, latlng, sat[sets], grid[first_down[sets]], grid[first_down[sets] - 1]
+        , precision, horizon=horizon
+    )
+
+    return np.array(batch.birds, dtype=object)[sat], aos, tca, los, alt
+
+def find_passes_observers(
+        satellites
+        , observers
+        , window_start
+        , window_end
+        , minimum_altitude=0.0
+        , precision=1.0
+        , horizon=0.0):
+    '''Passes of many satellites over several observers, found by sampling them all together on
+    shared time grids, propagating each sample once for every observer, and then refining every
+    crossing and peak at once.
+
+    :param satellites: dict of {bird: EarthSatellite}
+    :param observers: list of (latitude, longitude) degrees
+    :param window_start: Skyfield Time, search window start
+    :param window_end: Skyfield Time, search window end
+    :param minimum_altitude: minimum peak altitude, degrees
+    :param precision: AOS/TCA/LOS precision, seconds
+    :param horizon: altitude AOS and LOS are measured at, degrees
+    :return: list of CatalogPasses of arrays sorted by AOS, one per observer; times are TAI
+        Julian dates
+    '''
+    # pylint: disable=too-many-locals
+
+    floor = max(minimum_altitude, horizon)
+    candidates = {
+        bird: satellite for bird, satellite in satellites.items()
+        if any(reachable(satellite, latlng, floor) for latlng in observers)
+    }
+
+    groups = {}
+    for bird, satellite in candidates.items():
+        groups.setdefault(
+            detection_step(satellite, minimum_altitude, horizon), {}
+        )[bird] = satellite
+
+    found = [[] for _ in observers]
+    for step, members in sorted(groups.items()):
+        batch = SatelliteBatch(members)
+        grid = np.append(
+            np.arange(window_start.tai, window_end.tai, step / 86400.0), window_end.tai
+        )
+
+        up = [[] for _ in observers]
+        for chunk in range(0, len(grid), CHUNK_SAMPLES):
+            positions = batch.positions(TIMESCALE.tai_jd(grid[chunk:chunk + CHUNK_SAMPLES]))
+            for samples, latlng in zip(up, observers):
+                samples.append(topocentric(positions, latlng)[0] > horizon)
+
+        for passes, samples, latlng in zip(found, up, observers):
+            passes.append(refine_passes(
+                batch, latlng, grid, np.concatenate(samples, axis=1), minimum_altitude
+                , precision / 86400.0, horizon
+            ))
+
+    results = []
+    for passes in found:
+        if not passes:
+            results.append(CatalogPasses(*(np.array([]) for _ in CatalogPasses._fields)))
+            continue
+        birds, aos, tca, los, alt = (np.concatenate(_) for _ in zip(*passes))
+        order = np.argsort(aos, kind='stable')
+        results.append(
+            CatalogPasses(birds[order], aos[order], tca[order], los[order], alt[order])
+        )
+
+    return results
+
+def find_passes(
+        satellites
+        , latlng
+        , window_start
+        , window_end
+        , minimum_altitude=0.0
+        , precision=1.0
+        , horizon=0.0):
+    '''Passes of many satellites over latlng; see find_passes_observers.
+
+    :return: CatalogPasses of arrays sorted by AOS; times are TAI Julian dates
+    '''
+    return find_passes_observers(
+        satellites, [latlng], window_start, window_end, minimum_altitude, precision, horizon
+    )[0]
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+'''
+doppler.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+doppler corrected uplink and downlink frequencies along a pass, computed from the range rate over
+whole arrays of times and produced chunk by chunk for streaming to radio control
+'''
+
+from collections import namedtuple
+
+import numpy as np
+
+from birdplans.catalog import EARTH_ROTATION_RAD_S, observer_itrf, sgp4_dates, teme_to_pef
+
+SPEED_OF_LIGHT_KM_S = 299792.458
+
+# samples propagated together per chunk of the curve
+CHUNK_SAMPLES = 600
+
+# schedule frequencies in MHz: tx is what the ground station transmits (the uplink), rx what it
+# receives (the downlink)
+Frequencies = namedtuple('Frequencies', ['mode', 'tx', 'rx'])
+DopplerChunk = namedtuple('DopplerChunk', ['tai', 'range_rate', 'uplink', 'downlink'])
+
+def schedule_frequencies(bird):
+    '''Frequencies from a choice_birds.json bird entry's schedule, or None when it has none.
+    A weekly schedule's default entry stands in for the simple one.
+
+    :param bird: dict from the birds section of choice_birds.json
+    '''
+    schedule = bird.get('schedule', {})
+    simple = schedule.get('simple', schedule.get('weekly', {}).get('default'))
+    if simple is None:
+        return None
+    return Frequencies(simple.get('mode'), simple.get('tx'), simple.get('rx'))
+
+def range_rate(satellite, latlng, t):
+    '''Rate of change of the distance from observer to satellite, km/s, positive when receding.
+    Works in the Earth-fixed frame straight from SGP4's TEME state, skipping the precession and
+    nutation series a Skyfield topocentric velocity costs per time.
+
+    :param satellite: Skyfield EarthSatellite
+    :param latlng: observer (latitude, longitude) degrees
+    :param t: Skyfield Time array
+    '''
+    jd, fraction = sgp4_dates(t)
+    _, r, v = satellite.model.sgp4_array(jd, fraction)
+    r = teme_to_pef(r, t.whole, t.ut1_fraction)
+    # the frame turns with the Earth, so the satellite appears to move the other way
+    v = teme_to_pef(v, t.whole, t.ut1_fraction) + EARTH_ROTATION_RAD_S * np.stack(
+        [r[:, 1], -r[:, 0], np.zeros(len(r))], axis=-1
+    )
+
+    line_of_sight = r - observer_itrf(latlng)[0]
+    return np.einsum('ij,ij->i', line_of_sight, v) / np.linalg.norm(line_of_sight, axis=1)
+
+def correct(frequencies, rates):
+    '''Doppler corrected (uplink, downlink) Hz at each range rate; None where the schedule has no
+    such frequency.
+
+    :param frequencies: Frequencies, MHz
+    :param rates: range rate array, km/s
+    '''
+    factor = 1.0 - np.asarray(rates) / SPEED_OF_LIGHT_KM_S
+    # transmit low on the way in so the satellite hears tx; rx arrives shifted by the same factor
+    uplink = None if frequencies is None or frequencies.tx is None else \
+        frequencies.tx * 1e6 / factor
+    downlink = None if frequencies is None or frequencies.rx is None else \
+        frequencies.rx * 1e6 * factor
+    return uplink, downlink
+
+def doppler_curve(
+        ts, satellite, latlng, frequencies, tai_start, tai_end, hz=1.0, chunk=CHUNK_SAMPLES):
+    '''Yield the doppler curve from tai_start to tai_end sampled hz times per second.
+
+    :param ts: Skyfield timescale
+    :param satellite: Skyfield EarthSatellite
+    :param latlng: observer (latitude, longitude) degrees
+    :param frequencies: Frequencies, MHz, or None for range rate only
+    :param tai_start: first sample, TAI Julian date
+    :param tai_end: last sample no later than this, TAI Julian date
+    :param hz: samples per second
+    :param chunk: samples per DopplerChunk
+    '''
+    # Julian dates resolve only tens of microseconds; a millisecond of slack keeps round off from
+    # dropping the last sample
+    count = int(np.floor(((tai_end - tai_start) * 86400.0 + 1e-3) * hz)) + 1
+    step = 1.0 / hz / 86400.0
+    for first in range(0, count, chunk):
+        tai = tai_start + np.arange(first, min(first + chunk, count)) * step
+        rates = range_rate(satellite, latlng, ts.tai_jd(tai))
+        yield DopplerChunk(tai, rates, *correct(frequencies, rates))
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+
+'''
+export.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+streaming pass exports: passes for any number of observers and birds are predicted a day at a
+time and written out as CSV rows or iCalendar events as each day is done, so memory stays constant
+however long the window; with a PassStore the days are read from it when it has them
+'''
+
+import csv
+import io
+
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from birdplans.accuracy import accuracy_profile
+from birdplans.passstore import StoreKey
+from birdplans.satellitepasspredictor import (
+    TIMESCALE, pass_estimation_wrapper, sky_period, tai_to_epoch_ms
+)
+from birdplans.timeslice import element_age, long_horizon_passes
+
+# passes are predicted and written this much of the window at a time
+EXPORT_CHUNK = timedelta(days=1)
+
+# columns of the CSV export, as the client's own CSV download names them
+CSV_HEADER = [
+    'Grid', 'Latitude', 'Longitude', 'Local Timezone', 'Bird'
+    , 'UTC AOS Timestamp', 'UTC TCA Timestamp', 'UTC LOS Timestamp'
+    , 'Local AOS', 'Local TCA', 'Local LOS', 'Max Elevation', 'Pass Duration'
+    , 'UTC AOS', 'UTC TCA', 'UTC LOS', 'Azimuth AOS', 'Azimuth TCA', 'Azimuth LOS'
+]
+
+# grid: Maidenhead locator, as given or of lat, lng
+# lat, lng: degrees
+Observer = namedtuple('Observer', ['grid', 'lat', 'lng'])
+
+# observer: Observer
+# bird: bird name
+# times: (AOS, TCA, LOS) epoch milliseconds
+# az: (AOS, TCA, LOS) azimuths, degrees
+# peak: altitude at TCA, degrees
+ExportPass = namedtuple('ExportPass', ['observer', 'bird', 'times', 'az', 'peak'])
+
+def export_passes(
+        tle
+        , observers
+        , birds
+        , window_start
+        , window_stop
+        , minimum_altitude=0
+        , accuracy=None
+        , store=None):
+    '''Passes of every bird over every observer, one list per observer, bird and day of the
+    window, in time order within each. Each day's search reaches a trip round the sky into the
+    next, so a pass crossing midnight is found whole and written once, with the day it rises in.
+
+    :param tle: TleManager
+    :param observers: list of Observer
+    :param birds: list of bird names
+    :param window_start: tz-aware Python datetime
+    :param window_stop: tz-aware Python datetime
+    :param minimum_altitude: minimum peak pass altitude
+    :param accuracy: Accuracy or profile name, default DEFAULT_PROFILE
+    :param store: PassStore to read and fill, default none
+    :return: generator of lists of ExportPass
+    '''
+    accuracy = accuracy_profile(accuracy)
+    for observer in observers:
+        latlng = (observer.lat, observer.lng)
+        for bird in birds:
+            satellite = tle[bird]
+            stop = element_age(satellite, window_start, window_stop).stop
+            overlap = timedelta(days=sky_period(satellite))
+            key = StoreKey(bird, tle.fingerprint(bird), *latlng, None, accuracy.name)
+
+            start = window_start
+            while start < stop:
+                chunk_stop = min(start + EXPORT_CHUNK, stop)
+                search_stop = min(chunk_stop + overlap, stop)
+                if store is None:
+                    window_pass = pass_estimation_wrapper(
+                        satellite, latlng, start, search_stop, minimum_altitude, lighting=False
+                        , accuracy=accuracy
+                    )
+                else:
+                    window_pass = long_horizon_passes(
+                        satellite, tle.lines(bird), latlng, start, search_stop, minimum_altitude
+                        , lighting=False, accuracy=accuracy, store=store, key=key
+                    )
+
+                # passes rising earlier were written with the day before; the first day also
+                # writes the pass in progress at the window's start
+                rising = TIMESCALE.utc(chunk_stop).tai
+                risen = -np.inf if start == window_start else TIMESCALE.utc(start).tai
+                passes = [_ for _ in window_pass.passes if risen <= _.AOS.tai < rising]
+                yield chunk_passes(window_pass.diff, observer, bird, passes)
+                start = chunk_stop
+
+def chunk_passes(diff, observer, bird, passes):
+    '''ExportPass of each pass, their azimuths and peaks found in one batch.
+
+    :param diff: Skyfield satellite - observer vector function
+    :param observer: Observer
+    :param bird: bird name
+    :param passes: list of Pass
+    :return: list of ExportPass
+    '''
+    if not passes:
+        return []
+
+    tai = np.array([[_.tai for _ in pass_] for pass_ in passes])
+    alt, az, _ = diff.at(TIMESCALE.tai_jd(tai.ravel())).altaz()
+    times = tai_to_epoch_ms(tai.ravel()).reshape(tai.shape).tolist()
+    azimuths = az.degrees.reshape(tai.shape).tolist()
+    peaks = alt.degrees.reshape(tai.shape)[:, 1].tolist()
+    return [
+        ExportPass(observer, bird, *_) for _ in zip(times, azimuths, peaks)
+    ]
+
+def epoch_ms_datetime(epoch_ms, tz=timezone.utc):
+    '''Epoch milliseconds as a Python datetime in tz.'''
+    return datetime.fromtimestamp(epoch_ms / 1000.0, tz)
+
+def csv_row(export_pass, tz):
+    '''The CSV_HEADER columns of one pass.
+
+    :param export_pass: ExportPass
+    :param tz: pytz timezone for the local columns
+    '''
+    local = [epoch_ms_datetime(_, tz).strftime('%Y-%m-%d %H:%M') for _ in export_pass.times]
+    utc = [epoch_ms_datetime(_).strftime('%Y-%m-%d %H:%M') for _ in export_pass.times]
+    seconds = (export_pass.times[2] - export_pass.times[0]) // 1000
+    return [
+        export_pass.observer.grid, export_pass.observer.lat, export_pass.observer.lng, str(tz)
+        , export_pass.bird, *export_pass.times, *local, round(export_pass.peak)
+        , '{}:{:02d}'.format(seconds // 60, seconds % 60), *utc
+        , *[round(_) % 360 for _ in export_pass.az]
+    ]
+
+def csv_export(chunks, tz):
+    '''CSV text of passes, a header line then one line per pass, one string per chunk.
+
+    :param chunks: iterable of lists of ExportPass, as from export_passes
+    :param tz: pytz timezone for the local columns
+    :return: generator of str
+    '''
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    writer.writerow(CSV_HEADER)
+    for chunk in chunks:
+        writer.writerows(csv_row(_, tz) for _ in chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def ics_escape(text):
+    '''Escape an iCalendar TEXT value.'''
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+def ics_fold(line):
+    '''An iCalendar content line, folded to at most 75 octets a line and CRLF terminated.'''
+    octets = line.encode('utf-8')
+    lines = []
+    while len(octets) > 75:
+        cut = 75 if not lines else 74
+        # never split a multi-byte character
+        while octets[cut] & 0xc0 == 0x80:
+            cut -= 1
+        lines.append(octets[:cut].decode('utf-8'))
+        octets = octets[cut:]
+    lines.append(octets.decode('utf-8'))
+    return '\r\n '.join(lines) + '\r\n'
+
+def ics_time(epoch_ms):
+    '''Epoch milliseconds as an iCalendar UTC DATE-TIME.'''
+    return epoch_ms_datetime(epoch_ms).strftime('%Y%m%dT%H%M%SZ')
+
+def ics_event(export_pass, stamp):
+    '''One VEVENT, from AOS to LOS, with the TCA and the azimuths in its description.
+
+    :param export_pass: ExportPass
+    :param stamp: DTSTAMP, iCalendar UTC DATE-TIME
+    :return: str
+    '''
+    observer, bird, times, az = export_pass[:4]
+    events = zip(('AOS', 'TCA', 'LOS'), times, az)
+    description = '\n'.join(
+        '{} {} azimuth {:.0f}\u00b0'.format(name, ics_time(t), azimuth % 360.0)
+        for name, t, azimuth in events
+    )
+    return ''.join(ics_fold(_) for _ in [
+        'BEGIN:VEVENT'
+        , 'UID:{}-{}-{:.4f}-{:.4f}@birdplans'.format(
+            bird.replace(' ', '_'), times[0], observer.lat, observer.lng
+        )
+        , 'DTSTAMP:' + stamp
+        , 'DTSTART:' + ics_time(times[0])
+        , 'DTEND:' + ics_time(times[2])
+        , 'SUMMARY:' + ics_escape('{} pass, max elevation {:.0f}\u00b0'.format(
+            bird, export_pass.peak
+        ))
+        , 'DESCRIPTION:' + ics_escape(description)
+        , 'GEO:{:.6f};{:.6f}'.format(observer.lat, observer.lng)
+        , 'LOCATION:' + ics_escape(observer.grid)
+        , 'END:VEVENT'
+    ])
+
+def ics_export(chunks, now=None):
+    '''iCalendar text of passes, one VEVENT per pass, one string per chunk.
+
+    :param chunks: iterable of lists of ExportPass, as from export_passes
+    :param now: tz-aware Python datetime stamped on every event, default now
+    :return: generator of str
+    '''
+    now = datetime.now(timezone.utc) if now is None else now
+    stamp = now.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    yield ''.join(ics_fold(_) for _ in [
+        'BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//KI5BEX//birdplans//EN', 'CALSCALE:GREGORIAN'
+    ])
+    for chunk in chunks:
+        yield ''.join(ics_event(_, stamp) for _ in chunk)
+    yield ics_fold('END:VCALENDAR')
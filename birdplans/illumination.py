@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+'''
+illumination.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+whether a satellite is sunlit and whether its observer is in darkness, evaluated as array operations
+over pass track points against a Sun ephemeris computed once per window
+'''
+
+import functools
+import os
+
+from collections import namedtuple
+
+import numpy as np
+
+from skyfield.api import Loader
+from skyfield.functions import T, length_of, mxv
+
+EPHEMERIS_DIRECTORY = 'data/skyfield'
+
+# JPL ephemerides we will use if one has been put in data/skyfield; nothing is downloaded
+EPHEMERIS_FILES = ('de421.bsp', 'de440s.bsp', 'de430t.bsp')
+
+AU_KM = 149597870.7
+EARTH_RADIUS_KM = 6378.137
+
+# Sun ephemeris grid step, seconds; the Sun moves about 0.004 degrees around the Earth per step, so
+# linear interpolation between grid points is far inside the analytic model's own error
+SUN_STEP = 600.0
+
+# days Sun tables reach either side of their window: a pass crossing the window's end is tracked and
+# lit up to its LOS, hours past it for the slowest birds
+SUN_PAD = 1.0
+
+# the Sun is below this altitude at the end of civil twilight, when satellites become visible
+DARKNESS_ALTITUDE = -6.0
+
+PassLighting = namedtuple('PassLighting', ['t', 'sunlit', 'dark'])
+
+def ephemeris_path(directory=EPHEMERIS_DIRECTORY):
+    '''The first JPL ephemeris present in directory, or None.
+    '''
+    for name in EPHEMERIS_FILES:
+        if os.path.exists(os.path.join(directory, name)):
+            return name
+    return None
+
+@functools.lru_cache(maxsize=1)
+def jpl_ephemeris(name, directory=EPHEMERIS_DIRECTORY):
+    '''Open a local JPL ephemeris once per process.
+    '''
+    return Loader(directory)(name)
+
+def analytic_sun(t):
+    '''Geocentric GCRS position of the Sun, km, from the Astronomical Almanac's low precision
+    formulae (good to 0.01 degree between 1950 and 2050).
+
+    :param t: Skyfield Time array
+    :return: array of shape (3, len(t))
+    '''
+    n = t.tt - 2451545.0
+    mean_longitude = np.radians(280.460 + 0.9856474 * n)
+    anomaly = np.radians(357.528 + 0.9856003 * n)
+    longitude = mean_longitude + np.radians(
+        1.915 * np.sin(anomaly) + 0.020 * np.sin(2.0 * anomaly)
+    )
+    obliquity = np.radians(23.439 - 0.0000004 * n)
+    distance = AU_KM * (1.00014 - 0.01671 * np.cos(anomaly) - 0.00014 * np.cos(2.0 * anomaly))
+
+    # equator and equinox of date, rotated back to the GCRS
+    of_date = distance * np.array([
+        np.cos(longitude)
+        , np.cos(obliquity) * np.sin(longitude)
+        , np.sin(obliquity) * np.sin(longitude)
+    ])
+    return mxv(T(t.M), of_date)
+
+def sun_positions(t):
+    '''Geocentric GCRS position of the Sun, km, from a local JPL ephemeris when there is one and
+    the analytic model otherwise.
+    '''
+    name = ephemeris_path()
+    if name is None:
+        return analytic_sun(t)
+    planets = jpl_ephemeris(name)
+    return (planets['sun'] - planets['earth']).at(t).position.km
+
+class SunEphemeris:
+    '''The Sun tabulated on a fixed grid across a window, interpolated at arbitrary times within it
+    and computed directly outside it.
+    '''
+
+    def __init__(self, ts, tai_start, tai_end, step=SUN_STEP):
+        '''Initialize.
+
+        :param ts: Skyfield timescale
+        :param tai_start: window start TAI Julian date
+        :param tai_end: window end TAI Julian date
+        :param step: grid step, seconds
+        '''
+        count = max(int(np.ceil((tai_end - tai_start) * 86400.0 / step)), 1) + 1
+        self.ts = ts
+        self.tai = tai_start + np.arange(count) * (step / 86400.0)
+        self.positions = sun_positions(ts.tai_jd(self.tai))
+
+    def at(self, tai):
+        '''Sun GCRS positions, km, shape (3, len(tai)).
+        '''
+        tai = np.asarray(tai, dtype=float)
+        positions = np.array([np.interp(tai, self.tai, _) for _ in self.positions])
+        # np.interp holds the end values past the table, so compute those times outright
+        outside = (tai < self.tai[0]) | (tai > self.tai[-1])
+        if outside.any():
+            positions[:, outside] = sun_positions(self.ts.tai_jd(tai[outside]))
+        return positions
+
+@functools.lru_cache(maxsize=16)
+def _window_ephemeris(ts, grid_start, grid_end):
+    '''Memoized SunEphemeris over whole grid steps.'''
+    step = SUN_STEP / 86400.0
+    return SunEphemeris(ts, grid_start * step, grid_end * step)
+
+def window_ephemeris(ts, tai_start, tai_end):
+    '''The shared SunEphemeris covering a window and SUN_PAD either side. Windows are widened to
+    whole grid steps so every bird and observer querying the same window reuses one table.
+    '''
+    step = SUN_STEP / 86400.0
+    return _window_ephemeris(
+        ts, int(np.floor((tai_start - SUN_PAD) / step)), int(np.ceil((tai_end + SUN_PAD) / step))
+    )
+
+def sunlit(satellite_gcrs, sun_gcrs):
+    '''Whether the centre of the Sun is above the Earth's limb as seen from each satellite position;
+    half way through the penumbra.
+
+    :param satellite_gcrs: geocentric satellite positions, km, shape (3, N)
+    :param sun_gcrs: geocentric Sun positions, km, shape (3, N)
+    '''
+    to_sun = sun_gcrs - satellite_gcrs
+    distance = length_of(satellite_gcrs)
+    earth_radius = np.arcsin(np.minimum(EARTH_RADIUS_KM / distance, 1.0))
+    separation = np.arccos(np.clip(
+        -np.einsum('ij,ij->j', satellite_gcrs, to_sun) / (distance * length_of(to_sun)), -1.0, 1.0
+    ))
+    return separation > earth_radius
+
+def sun_altitude(location, t, sun_gcrs):
+    '''Altitude of the Sun, degrees, seen from a Skyfield Topos at each time.
+    '''
+    local = mxv(location.rotation_at(t), sun_gcrs - location.at(t).position.km)
+    return np.degrees(np.arcsin(local[2] / length_of(local)))
+
+def pass_lighting(satellite, location, passes, ephemeris, points, darkness_altitude=None):
+    '''Lighting along each pass, sampled at points evenly spaced times from AOS to LOS. Every
+    pass is evaluated in one batch.
+
+    :param satellite: Skyfield EarthSatellite
+    :param location: Skyfield Topos of the observer
+    :param passes: list of Pass
+    :param ephemeris: SunEphemeris covering the passes
+    :param points: samples per pass
+    :param darkness_altitude: Sun altitude below which the observer is in darkness, degrees
+    :return: list of PassLighting with TAI Julian date and boolean arrays of length points
+    '''
+    darkness_altitude = DARKNESS_ALTITUDE if darkness_altitude is None else darkness_altitude
+    if not passes:
+        return []
+
+    tai = np.linspace(
+        [_.AOS.tai for _ in passes], [_.LOS.tai for _ in passes], points, axis=-1
+    ).ravel()
+    t = passes[0].AOS.ts.tai_jd(tai)
+    sun = ephemeris.at(tai)
+
+    lit = sunlit(satellite.at(t).position.km, sun).reshape(len(passes), points)
+    dark = (sun_altitude(location, t, sun) < darkness_altitude).reshape(len(passes), points)
+
+    return [
+        PassLighting(times, lit_, dark_)
+        for times, lit_, dark_ in zip(tai.reshape(len(passes), points), lit, dark)
+    ]
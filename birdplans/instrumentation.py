@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+'''
+instrumentation.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+per-request stage timing and per-worker metrics in the prometheus text exposition format
+'''
+
+import os
+import threading
+
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from timeit import default_timer
+
+class StageTimer:
+    '''Accumulate wall clock time spent in the named stages of one request.
+    '''
+
+    def __init__(self):
+        '''Initialize.'''
+        self.stages = OrderedDict()
+
+    @contextmanager
+    def stage(self, name):
+        '''Time the body of a with statement, adding it to the named stage.
+        '''
+        t0 = default_timer()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (default_timer() - t0)
+
+    def server_timing(self):
+        '''Format the stages as a Server-Timing header value, durations in milliseconds.
+        '''
+        return ', '.join(
+            '{};dur={:.3f}'.format(name, seconds * 1000.0) for name, seconds in self.stages.items()
+        )
+
+class NullTimer:
+    '''Stand-in for StageTimer when nobody is listening.
+    '''
+
+    @contextmanager
+    def stage(self, name): # pylint: disable=unused-argument,no-self-use
+        '''Do nothing around the body of a with statement.
+        '''
+        yield
+
+NULL_TIMER = NullTimer()
+
+class Histogram:
+    '''Cumulative bucket histogram, as in the prometheus client libraries.
+    '''
+
+    BUCKETS = (
+        0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+    )
+
+    def __init__(self, buckets=None):
+        '''Initialize.
+
+        :param buckets: sorted upper bounds, in seconds
+        '''
+        self.buckets = self.BUCKETS if buckets is None else tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        '''Record one observation.
+        '''
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other):
+        '''Add the observations of another histogram with the same buckets.
+        '''
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.sum += other.sum
+        self.count += other.count
+
+    def cumulative(self):
+        '''Yield (upper bound label, cumulative count) pairs ending with +Inf.
+        '''
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield ('+Inf' if bound == float('inf') else repr(bound)), total
+
+class MetricsRegistry:
+    '''This worker's histograms and counters, updated from request threads and background ones
+    such as the sky refresher.
+    '''
+
+    def __init__(self, prefix='birdplans'):
+        '''Initialize.
+
+        :param prefix: metric name prefix
+        '''
+        self.prefix = prefix
+        self.histograms = OrderedDict()
+        self.counters = OrderedDict()
+        self.lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        '''Record value in the histogram identified by name and labels.
+        '''
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    def observe_stages(self, timer, **labels):
+        '''Record every stage of a StageTimer in the stage_seconds histogram.
+        '''
+        for stage, seconds in timer.stages.items():
+            self.observe('stage_seconds', seconds, stage=stage, **labels)
+
+    def increment(self, name, amount=1, **labels):
+        '''Add amount to the counter identified by name and labels.
+        '''
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def drain(self):
+        '''Take everything recorded so far, leaving the registry empty; how a process pool
+        worker hands its metrics back with each response.
+
+        :return: (histograms, counters) to merge into another registry
+        '''
+        with self.lock:
+            drained = self.histograms, self.counters
+            self.histograms, self.counters = OrderedDict(), OrderedDict()
+        return drained
+
+    def merge(self, drained):
+        '''Add metrics drained from another registry to these.
+
+        :param drained: (histograms, counters) from drain
+        '''
+        histograms, counters = drained
+        with self.lock:
+            for key, histogram in histograms.items():
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(histogram.buckets)
+                self.histograms[key].merge(histogram)
+            for key, amount in counters.items():
+                self.counters[key] = self.counters.get(key, 0) + amount
+
+    def render(self, **constant_labels):
+        '''Format all metrics in the prometheus text exposition format.
+
+        :param constant_labels: labels added to every sample, e.g. the worker id
+        '''
+        lines = []
+        # a copy, so the text is formatted without holding up the threads recording
+        with self.lock:
+            counters = list(self.counters.items())
+            histograms = []
+            for key, histogram in self.histograms.items():
+                copy = Histogram(histogram.buckets)
+                copy.merge(histogram)
+                histograms.append((key, copy))
+
+        def labelstr(labels, **extra):
+            '''Render a label set.'''
+            pairs = list(constant_labels.items()) + list(labels) + list(extra.items())
+            if not pairs:
+                return ''
+            return '{' + ','.join('{}="{}"'.format(k, v) for k, v in pairs) + '}'
+
+        typed = set()
+        for (name, labels), value in counters:
+            metric = '{}_{}_total'.format(self.prefix, name)
+            if metric not in typed:
+                lines.append('# TYPE {} counter'.format(metric))
+                typed.add(metric)
+            lines.append('{}{} {}'.format(metric, labelstr(labels), value))
+
+        for (name, labels), histogram in histograms:
+            metric = '{}_{}'.format(self.prefix, name)
+            if metric not in typed:
+                lines.append('# TYPE {} histogram'.format(metric))
+                typed.add(metric)
+            for bound, count in histogram.cumulative():
+                lines.append('{}_bucket{} {}'.format(metric, labelstr(labels, le=bound), count))
+            lines.append('{}_sum{} {!r}'.format(metric, labelstr(labels), histogram.sum))
+            lines.append('{}_count{} {}'.format(metric, labelstr(labels), histogram.count))
+
+        return '\n'.join(lines) + '\n'
+
+# one registry per process, so per uwsgi worker
+METRICS = MetricsRegistry()
+
+def worker_label():
+    '''Identify this worker for the metrics endpoint.
+    '''
+    try:
+        import uwsgi # pylint: disable=import-outside-toplevel
+        return str(uwsgi.worker_id())
+    except ImportError:
+        return str(os.getpid())
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+'''
+lazy.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+deferred imports, so routes that never propagate a satellite (/tz, /birds, /metrics, the static
+page) do not wait on scipy, skyfield and numpy; the uwsgi master still loads everything before the
+fork, through load_all
+'''
+
+import importlib.util
+import sys
+
+# modules imported through lazy_import, in order
+LAZY_MODULES = []
+
+def lazy_import(name):
+    '''Module name, executed on its first attribute access rather than now.
+
+    Parent packages are imported now, as with any import; an already imported module is returned
+    as it is.
+
+    :param name: absolute module name
+    '''
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    LAZY_MODULES.append(name)
+    return module
+
+def load_all():
+    '''Execute every module imported through lazy_import so far.
+
+    :return: number of modules
+    '''
+    for name in LAZY_MODULES:
+        # any attribute access finishes a lazy module's import
+        getattr(sys.modules[name], '__name__')
+    return len(LAZY_MODULES)
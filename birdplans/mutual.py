@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+'''
+mutual.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+mutual visibility windows: when a bird is above the minimum altitude for several stations at once,
+from one shared propagation of every bird and a linear merge of each station's intervals
+'''
+
+import itertools
+
+from collections import namedtuple
+
+import numpy as np
+
+from birdplans.catalog import SatelliteBatch, find_passes_observers
+
+# times are TAI Julian dates, altitudes have one column per observer
+MutualWindows = namedtuple(
+    'MutualWindows', ['bird', 'start', 'end', 'start_alt', 'end_alt', 'observers']
+)
+
+def intersect(first, second):
+    '''Intersection of two lists of disjoint (start, end) intervals sorted by start, in one pass
+    over both.
+    '''
+    common = []
+    i = j = 0
+    while i < len(first) and j < len(second):
+        start = max(first[i][0], second[j][0])
+        end = min(first[i][1], second[j][1])
+        if start < end:
+            common.append((start, end))
+        # whichever interval ends first cannot overlap anything later in the other list
+        if first[i][1] < second[j][1]:
+            i += 1
+        else:
+            j += 1
+    return common
+
+def intervals_by_bird(passes):
+    '''{bird: [(aos, los), ...]} from CatalogPasses sorted by AOS.
+    '''
+    intervals = {}
+    for bird, aos, los in zip(passes.bird, passes.aos, passes.los):
+        intervals.setdefault(bird, []).append((aos, los))
+    return intervals
+
+def common_intervals(passes):
+    '''{bird: [(start, end), ...]} of the intervals in which every one of a list of CatalogPasses
+    has the bird up.
+    '''
+    common = intervals_by_bird(passes[0])
+    for other in map(intervals_by_bird, passes[1:]):
+        common = {
+            bird: intersect(intervals, other[bird])
+            for bird, intervals in common.items() if bird in other
+        }
+    return common
+
+def mutual_windows(
+        satellites
+        , observers
+        , window_start
+        , window_end
+        , minimum_altitude=0.0
+        , precision=1.0
+        , pairs=False):
+    '''Windows in which birds are at least minimum_altitude above the horizon for every observer,
+    or, with pairs, for each pair of observers.
+
+    :param satellites: dict of {bird: EarthSatellite}
+    :param observers: list of (latitude, longitude) degrees
+    :param window_start: Skyfield Time, search window start
+    :param window_end: Skyfield Time, search window end
+    :param minimum_altitude: altitude every observer must see the bird above, degrees
+    :param precision: window edge precision, seconds
+    :param pairs: windows for every pair of observers rather than for all of them together
+    :return: MutualWindows of arrays sorted by start; observers holds the indexes of the
+        observers sharing each window
+    '''
+    passes = find_passes_observers(
+        satellites, observers, window_start, window_end, minimum_altitude, precision
+        , horizon=minimum_altitude
+    )
+
+    groups = list(itertools.combinations(range(len(observers)), 2)) if pairs else \
+        [tuple(range(len(observers)))]
+
+    rows = [
+        (bird, start, end, group)
+        for group in groups
+        for bird, intervals in common_intervals([passes[_] for _ in group]).items()
+        for start, end in intervals
+    ]
+    rows.sort(key=lambda row: (row[1], row[3]))
+
+    batch = SatelliteBatch({_[0]: satellites[_[0]] for _ in rows})
+    position = {bird: i for i, bird in enumerate(batch.birds)}
+    index = np.array([position[_[0]] for _ in rows], dtype=int)
+    start = np.array([_[1] for _ in rows])
+    end = np.array([_[2] for _ in rows])
+
+    return MutualWindows(
+        np.array([_[0] for _ in rows], dtype=object)
+        , start
+        , end
+        , *(
+            np.column_stack([batch.altitude_at(latlng, index, tai) for latlng in observers])
+            if rows else np.empty((0, len(observers)))
+            for tai in (start, end)
+        )
+        , [_[3] for _ in rows]
+    )
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+'''
+passindex.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+sorted endpoint index over the passes computed for one observer and TLE version, answering which
+birds are up at t, the next pass after t and the passes overlapping [t0, t1] by binary search
+'''
+
+import numpy as np
+
+from birdplans.catalog import CatalogPasses
+
+# passes longer than this, days, are kept apart from the sorted scan; there are few of them, the
+# slow birds and those always up, clamped to the whole window
+LONG_PASS = 1.0 / 24.0
+
+class PassIndex:
+    '''Passes sorted by AOS. Every short pass still in progress at t starts no earlier than t minus
+    the longest short pass, so queries search the AOS array and scan only that short run; the few
+    long passes are checked one by one.
+    '''
+
+    def __init__(self, passes, key=None):
+        '''Initialize.
+
+        :param passes: CatalogPasses of arrays; times are TAI Julian dates
+        :param key: what the passes were computed for, e.g. (observer, window, TLE version)
+        '''
+        order = np.argsort(passes.aos, kind='stable')
+        self.passes = CatalogPasses(*(np.asarray(_)[order] for _ in passes))
+        self.key = key
+
+        # positions of the short and the long passes, each in AOS order
+        duration = self.passes.los - self.passes.aos
+        self.short = np.flatnonzero(duration <= LONG_PASS)
+        self.long = np.flatnonzero(duration > LONG_PASS)
+        self.short_aos = self.passes.aos[self.short]
+        self.longest = float(np.max(duration[self.short])) if len(self.short) else 0.0
+
+        # {bird: positions of its passes, in AOS order}
+        self.by_bird = {}
+        for position, bird in enumerate(self.passes.bird):
+            self.by_bird.setdefault(bird, []).append(position)
+        self.by_bird = {bird: np.array(_) for bird, _ in self.by_bird.items()}
+
+    @classmethod
+    def from_window_passes(cls, window_passes, key=None):
+        '''Index pass_estimation_wrapper results.
+
+        :param window_passes: dict of {bird: WindowPasses}
+        '''
+        rows = [
+            (bird, _.AOS.tai, _.TCA.tai, _.LOS.tai, result.diff.at(_.TCA).altaz()[0].degrees)
+            for bird, result in window_passes.items() for _ in result.passes
+        ]
+        return cls(CatalogPasses(
+            np.array([_[0] for _ in rows], dtype=object)
+            , *(np.array([_[i] for _ in rows], dtype=float) for i in range(1, 5))
+        ), key)
+
+    def __len__(self):
+        return len(self.passes.aos)
+
+    def select(self, positions):
+        '''CatalogPasses of the passes at positions, in AOS order.
+        '''
+        positions = np.sort(np.asarray(positions, dtype=int))
+        return CatalogPasses(*(_[positions] for _ in self.passes))
+
+    def overlapping(self, t0, t1):
+        '''Positions of the passes overlapping [t0, t1], TAI Julian dates.
+        '''
+        first = np.searchsorted(self.short_aos, t0 - self.longest, side='left')
+        last = np.searchsorted(self.short_aos, t1, side='right')
+        short = self.short[first:last]
+        short = short[self.passes.los[short] >= t0]
+        long = self.long[(self.passes.aos[self.long] <= t1) & (self.passes.los[self.long] >= t0)]
+        return np.sort(np.concatenate([short, long]))
+
+    def up(self, tai):
+        '''CatalogPasses in progress at tai.
+        '''
+        return self.select(self.overlapping(tai, tai))
+
+    def next_pass(self, tai, bird=None):
+        '''Position of the first pass, of bird if given, rising after tai; None if there is none.
+        '''
+        if bird is None:
+            position = np.searchsorted(self.passes.aos, tai, side='right')
+            return int(position) if position < len(self) else None
+
+        positions = self.by_bird.get(bird, np.array([], dtype=int))
+        found = np.searchsorted(self.passes.aos[positions], tai, side='right')
+        return int(positions[found]) if found < len(positions) else None
+
+    def between(self, t0, t1):
+        '''CatalogPasses overlapping [t0, t1].
+        '''
+        return self.select(self.overlapping(t0, t1))
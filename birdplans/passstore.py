@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+'''
+passstore.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+SQLite store of computed passes that outlives the worker, so the restart after every TLE refresh
+does not start from nothing; passes are kept per bird, element set, observer, UTC day and accuracy
+profile, and every /one request is counted by observer so `python -m birdplans.prewarm` can fill
+the store ahead of the popular ones
+
+    BIRDPLANS_PASS_STORE=passes.sqlite  store file, default none
+'''
+
+import os
+import sqlite3
+import threading
+import time
+
+from collections import namedtuple
+
+import numpy as np
+
+# seconds a stored day of passes, or an observer's request count, stays valid; a day of passes is
+# also invalidated by new elements, which change its key
+DEFAULT_TTL = 7 * 86400.0
+
+# bird: name the bird was asked for by
+# elements: fingerprint of the element set the passes were computed from
+# lat, lng: observer, degrees
+# day: proleptic Gregorian ordinal of the UTC day
+# accuracy: accuracy profile name
+StoreKey = namedtuple('StoreKey', ['bird', 'elements', 'lat', 'lng', 'day', 'accuracy'])
+
+# an observer asking about a bird, and how often it has
+Popular = namedtuple('Popular', ['lat', 'lng', 'tz', 'bird', 'accuracy', 'hits'])
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS passes (
+    bird TEXT, elements TEXT, lat REAL, lng REAL, day INTEGER, accuracy TEXT
+    , created REAL, events BLOB
+    , PRIMARY KEY (bird, elements, lat, lng, day, accuracy)
+);
+CREATE INDEX IF NOT EXISTS passes_created ON passes (created);
+CREATE TABLE IF NOT EXISTS requests (
+    lat REAL, lng REAL, tz TEXT, bird TEXT, accuracy TEXT, hits INTEGER, seen REAL
+    , PRIMARY KEY (lat, lng, bird, accuracy)
+);
+'''
+
+class PassStore:
+    '''Days of passes in SQLite, as arrays of (AOS, TCA, LOS TAI Julian dates, altitude at TCA),
+    plus a count of the requests of each observer. Connections are opened per process, so a store
+    made in the uwsgi master is safe to use in the forked workers.
+    '''
+
+    def __init__(self, path, ttl=DEFAULT_TTL):
+        '''Initialize.
+
+        :param path: SQLite database file
+        :param ttl: seconds entries stay valid
+        '''
+        self.path = path
+        self.ttl = ttl
+        self.pid = None
+        self.connection = None
+        self.lock = threading.Lock()
+        # request counts since the last flush, {(lat, lng, bird, accuracy): (tz, hits, seen)}
+        self.pending = {}
+
+    @classmethod
+    def from_environment(cls):
+        '''The store named by BIRDPLANS_PASS_STORE, or None.
+        '''
+        path = os.environ.get('BIRDPLANS_PASS_STORE', '')
+        return cls(path) if path else None
+
+    def connect(self):
+        '''This process's connection, opened and the schema created on first use.
+        '''
+        if self.pid != os.getpid():
+            self.connection = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False)
+            # readers in every worker carry on while the prewarm job writes
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.executescript(SCHEMA)
+            self.pid = os.getpid()
+        return self.connection
+
+    def get(self, key):
+        '''The stored day of passes under key, or None if missing or expired.
+
+        :param key: StoreKey
+        :return: array of shape (passes, 4)
+        '''
+        with self.lock:
+            row = self.connect().execute(
+                'SELECT events FROM passes WHERE bird = ? AND elements = ? AND lat = ? AND lng = ?'
+                ' AND day = ? AND accuracy = ? AND created > ?'
+                , (*key, time.time() - self.ttl)
+            ).fetchone()
+        return None if row is None else np.frombuffer(row[0]).reshape(-1, 4)
+
+    def put(self, key, events):
+        '''Store a day of passes under key.
+
+        :param key: StoreKey
+        :param events: array of shape (passes, 4)
+        '''
+        with self.lock, self.connect() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO passes VALUES (?, ?, ?, ?, ?, ?, ?, ?)'
+                , (*key, time.time(), np.ascontiguousarray(events, dtype=float).tobytes())
+            )
+
+    def record(self, latlng, tz, birds, accuracy):
+        '''Count one request of an observer for birds, in memory until the next flush.
+
+        :param latlng: (latitude, longitude) degrees
+        :param tz: timezone name the observer asked in
+        :param birds: list of bird names
+        :param accuracy: accuracy profile name
+        '''
+        now = time.time()
+        with self.lock:
+            for bird in birds:
+                key = (*latlng, bird, accuracy)
+                hits = self.pending[key][1] if key in self.pending else 0
+                self.pending[key] = (tz, hits + 1, now)
+
+    def flush(self):
+        '''Write the request counts recorded since the last flush, in one transaction.
+
+        :return: number of observer and bird pairs written
+        '''
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            if pending:
+                with self.connect() as connection:
+                    connection.executemany(
+                        'INSERT INTO requests VALUES (?, ?, ?, ?, ?, ?, ?)'
+                        ' ON CONFLICT (lat, lng, bird, accuracy)'
+                        ' DO UPDATE SET hits = hits + excluded.hits, seen = excluded.seen'
+                        ', tz = excluded.tz'
+                        , [
+                            (lat, lng, tz, bird, accuracy, hits, seen)
+                            for (lat, lng, bird, accuracy), (tz, hits, seen) in pending.items()
+                        ]
+                    )
+        return len(pending)
+
+    def popular(self, limit=100):
+        '''The most requested observer and bird pairs seen within the TTL, this process's
+        unflushed counts included.
+
+        :param limit: pairs to return
+        :return: list of Popular, most requested first
+        '''
+        self.flush()
+        with self.lock:
+            rows = self.connect().execute(
+                'SELECT lat, lng, tz, bird, accuracy, hits FROM requests WHERE seen > ?'
+                ' ORDER BY hits DESC, seen DESC LIMIT ?'
+                , (time.time() - self.ttl, limit)
+            ).fetchall()
+        return [Popular(*_) for _ in rows]
+
+    def purge(self):
+        '''Delete expired passes and request counts.
+
+        :return: number of rows deleted
+        '''
+        self.flush()
+        cutoff = time.time() - self.ttl
+        with self.lock, self.connect() as connection:
+            deleted = connection.execute('DELETE FROM passes WHERE created <= ?', (cutoff,))
+            forgotten = connection.execute('DELETE FROM requests WHERE seen <= ?', (cutoff,))
+        return deleted.rowcount + forgotten.rowcount
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+'''
+preload.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+build application state once in the uwsgi master and freeze it, so the forked workers share it
+copy-on-write instead of each building their own
+'''
+
+import gc
+import os
+
+from timeit import default_timer
+
+import pytz
+
+from birdplans.lazy import lazy_import, load_all
+
+predictor = lazy_import('birdplans.satellitepasspredictor')
+
+def preloading(uwsgi):
+    '''Whether this module is being loaded in the uwsgi master ahead of the fork, and
+    BIRDPLANS_PRELOAD has not turned preloading off: only then is there state to build and freeze
+    for the workers to share.
+
+    :param uwsgi: the uwsgi module, or None outside uwsgi
+    '''
+    return (
+        uwsgi is not None
+        and os.environ.get('BIRDPLANS_PRELOAD', '1') != '0'
+        and not uwsgi.opt.get('lazy-apps')
+    )
+
+def preload(app, birds=None, catalog=False):
+    '''Build the state a BirdplansUwsgi would otherwise build lazily in every worker.
+
+    :param app: BirdplansUwsgi instance
+    :param birds: birds to parse, default every loaded bird
+    :param catalog: also build the batched propagation arrays for the whole catalog
+    :return: seconds spent
+    '''
+    t0 = default_timer()
+
+    # every deferred import
+    load_all()
+
+    # timescale tables and the leap second lookup
+    predictor.TIMESCALE.tai_jd([predictor.TIMESCALE.now().tai])
+
+    # the lazily parsed satellites
+    for bird in app.tle.tle if birds is None else birds:
+        app.tle[bird] # pylint: disable=pointless-statement
+
+    if catalog:
+        app.catalog_batch()
+
+    # pytz builds its zone list and tz objects lazily
+    for zone in pytz.common_timezones:
+        pytz.timezone(zone)
+
+    return default_timer() - t0
+
+def freeze():
+    '''Collect garbage, then move every surviving object into the permanent generation so the
+    collector never writes to (and so never copies) the pages holding the preloaded state. For the
+    uwsgi master only: see preloading.
+    '''
+    gc.collect()
+    gc.freeze()
+    return gc.get_freeze_count()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+'''
+prewarm.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+fill the pass store ahead of the most popular observers after a TLE refresh, so their next /one
+after the reload is read from the store rather than computed; expired entries are purged first
+
+    python -m birdplans.prewarm --limit 100 --days 5
+'''
+
+import argparse
+
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from timeit import default_timer
+
+from birdplans.instrumentation import METRICS
+from birdplans.passstore import PassStore, StoreKey
+from birdplans.timeslice import long_horizon_passes, slice_executor
+from birdplans.tlemanager import TleManager
+
+# days from now to fill, the length of a default /one window
+PREWARM_DAYS = 5
+
+# most requested observer and bird pairs to fill
+PREWARM_LIMIT = 100
+
+PrewarmReport = namedtuple('PrewarmReport', ['seconds', 'purged', 'pairs', 'passes', 'errors'])
+
+def prewarm(store, tle, limit=PREWARM_LIMIT, days=PREWARM_DAYS, now=None, executor=None):
+    '''Purge the store, then fill the next days of passes for its most popular pairs.
+
+    :param store: PassStore
+    :param tle: TleManager with the elements the workers will load
+    :param limit: pairs to fill
+    :param days: days from now to fill
+    :param now: tz-aware Python datetime, default now
+    :param executor: concurrent.futures executor for the slices, default none
+    :return: PrewarmReport
+    '''
+    t0 = default_timer()
+    now = datetime.now(timezone.utc) if now is None else now
+    purged = store.purge()
+
+    pairs = passes = errors = 0
+    for popular in store.popular(limit):
+        if popular.bird not in tle.tle:
+            # dropped from the sources since it was asked for
+            continue
+        pairs += 1
+        try:
+            passes += len(long_horizon_passes(
+                tle[popular.bird]
+                , tle.lines(popular.bird)
+                , (popular.lat, popular.lng)
+                , now
+                , now + timedelta(days=days)
+                , lighting=False
+                , accuracy=popular.accuracy
+                , executor=executor
+                , store=store
+                , key=StoreKey(
+                    popular.bird, tle.fingerprint(popular.bird), popular.lat, popular.lng, None
+                    , popular.accuracy
+                )
+            ).passes)
+        except (ValueError, ZeroDivisionError):
+            # as in the warm-up, one bird that cannot be predicted does not stop the rest
+            errors += 1
+
+    report = PrewarmReport(default_timer() - t0, purged, pairs, passes, errors)
+    METRICS.observe('prewarm_seconds', report.seconds)
+    return report
+
+def main():
+    '''Command line entry point.
+    '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--store', help='store file, default BIRDPLANS_PASS_STORE')
+    parser.add_argument('--limit', type=int, default=PREWARM_LIMIT)
+    parser.add_argument('--days', type=int, default=PREWARM_DAYS)
+    args = parser.parse_args()
+
+    store = PassStore(args.store) if args.store else PassStore.from_environment()
+    if store is None:
+        parser.error('no store: pass --store or set BIRDPLANS_PASS_STORE')
+
+    report = prewarm(store, TleManager(), args.limit, args.days, executor=slice_executor())
+    print('purged {} rows, filled {} pairs with {} passes in {:.1f}s, {} errors'.format(
+        report.purged, report.pairs, report.passes, report.seconds, report.errors
+    ))
+
+if __name__ == '__main__':
+    main()
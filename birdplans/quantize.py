@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+'''
+quantize.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+observer position quantization: requested coordinates are moved to the centre of the cell they
+fall in, a Maidenhead square or a fixed arc distance across, so every observer in a cell gets the
+same answer and shares pass indexes, stored passes, coalesced computations and cached responses;
+`python -m benchmarks.bench_quantize` measures how far that moves the passes
+
+    BIRDPLANS_QUANTIZE=grid8  grid6 or grid8 for Maidenhead subsquares or extended squares, or an
+                              arc distance such as 2km; default the coordinates as given
+'''
+
+import math
+import os
+import re
+
+from collections import namedtuple
+
+import maidenhead as mh
+
+EARTH_RADIUS_KM = 6371.0
+
+# Maidenhead cell size, degrees of (latitude, longitude), by locator length
+GRID_CELLS = {
+    2: (10.0, 20.0),
+    4: (1.0, 2.0),
+    6: (1.0 / 24.0, 1.0 / 12.0),
+    8: (1.0 / 240.0, 1.0 / 120.0),
+}
+
+# worst AOS/LOS shift per kilometre the observer moves, seconds, by orbit class: the largest
+# `python -m benchmarks.bench_quantize` found over the data/test birds, passes peaking at least 12
+# degrees up. Slow birds rise and set slowly, so a small step moves them most
+SECONDS_PER_KM = {'LEO': 0.27, 'MEO': 4.0, 'GEO': 71.0, 'HEO': 27.0}
+
+# lat, lng: effective coordinates, the centre of the cell, degrees
+# grid: Maidenhead locator of the centre, at the resolution's length or 8 characters otherwise
+# radius: kilometres from the centre to the cell's furthest corner, the furthest any observer
+#     answered for it can be
+Location = namedtuple('Location', ['lat', 'lng', 'grid', 'radius'])
+
+# south, west edges and height, width, degrees
+Cell = namedtuple('Cell', ['south', 'west', 'height', 'width'])
+
+def arc_km(lat1, lng1, lat2, lng2):
+    '''Great circle distance, kilometres, between two points given in degrees.
+    '''
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    return 2.0 * EARTH_RADIUS_KM * math.asin(math.sqrt(
+        math.sin((lat2 - lat1) / 2.0) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2.0) ** 2
+    ))
+
+def grid_cell(grid):
+    '''Cell of a Maidenhead locator.
+    '''
+    return Cell(*mh.to_location(grid), *GRID_CELLS[len(grid)])
+
+def arc_cell(lat, lng, km):
+    '''Cell about km across containing lat, lng: rows km apart in latitude, each cut into as many
+    cells as fit km wide along its middle.
+    '''
+    step = math.degrees(km / EARTH_RADIUS_KM)
+    row = min(math.floor((lat + 90.0) / step), math.ceil(180.0 / step) - 1)
+    south = -90.0 + row * step
+    height = min(step, 90.0 - south)
+    cells = max(int(360.0 * math.cos(math.radians(south + height / 2.0)) / step), 1)
+    width = 360.0 / cells
+    column = math.floor(((lng + 180.0) % 360.0) / width) % cells
+    return Cell(south, -180.0 + column * width, height, width)
+
+def cell_location(cell, length):
+    '''Location of a cell's centre.
+
+    :param length: Maidenhead locator length to name it by
+    '''
+    lat, lng = cell.south + cell.height / 2.0, cell.west + cell.width / 2.0
+    return Location(lat, lng, mh.to_maiden(lat, lng, length // 2), max(
+        arc_km(lat, lng, cell.south + dlat, cell.west + dlng)
+        for dlat in (0.0, cell.height) for dlng in (0.0, cell.width)
+    ))
+
+class Quantizer:
+    '''Move observers to the centre of their cell at a resolution.
+    '''
+
+    def __init__(self, resolution=None):
+        '''Initialize.
+
+        :param resolution: 'grid6', 'grid8' or an arc distance such as '2km', '' or None to
+            leave coordinates as they are
+        :raises ValueError: on any other resolution
+        '''
+        self.resolution = resolution or None
+        self.length = self.km = None
+        if self.resolution is None:
+            return
+        match = re.fullmatch(r'grid([2468])|(\d+(?:\.\d*)?)km', self.resolution)
+        if match is None or (match.group(2) and not float(match.group(2)) > 0.0):
+            raise ValueError(
+                'unknown resolution {!r}, expected grid6, grid8 or a distance such as 2km'.format(
+                    resolution
+                )
+            )
+        if match.group(1):
+            self.length = int(match.group(1))
+        else:
+            self.km = float(match.group(2))
+
+    @classmethod
+    def from_environment(cls):
+        '''Quantizer at BIRDPLANS_QUANTIZE.
+        '''
+        return cls(os.environ.get('BIRDPLANS_QUANTIZE'))
+
+    def __call__(self, lat, lng):
+        '''Effective location of an observer at lat, lng degrees.
+
+        :return: Location
+        '''
+        if self.length is not None:
+            return cell_location(grid_cell(mh.to_maiden(lat, lng, self.length // 2)), self.length)
+        if self.km is not None:
+            return cell_location(arc_cell(lat, lng, self.km), 8)
+        return Location(lat, lng, mh.to_maiden(lat, lng, 4), 0.0)
+
+def timing_error(orbit_class, radius):
+    '''Worst AOS/LOS shift, seconds, moving an observer radius kilometres can cause for a bird of
+    orbit_class, from the SECONDS_PER_KM measured by the benchmark.
+    '''
+    return radius * SECONDS_PER_KM[orbit_class]
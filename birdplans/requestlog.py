@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+'''
+requestlog.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+request log: one JSON line per request served, with its path, query, status, timing and what the
+caches made of it, for `python -m benchmarks.replay` to drive the application with real traffic
+later. Every worker appends to the same file
+
+    BIRDPLANS_REQUEST_LOG=request_log.jsonl  log file, default none
+'''
+
+import contextvars
+import json
+import os
+import threading
+import time
+
+from timeit import default_timer
+
+from birdplans.instrumentation import worker_label
+
+# cache outcomes noted while the current request is handled, or None outside a logged request
+CACHE_NOTES = contextvars.ContextVar('birdplans_cache_notes', default=None)
+
+def note_cache(name, amount=1):
+    '''Count a cache outcome, e.g. 'store_hits', against the request being logged, if any.
+
+    :param name: outcome name
+    :param amount: how many
+    '''
+    notes = CACHE_NOTES.get()
+    if notes is not None and amount:
+        notes[name] = notes.get(name, 0) + amount
+
+def request_record(env):
+    '''The log record of a request, filled in as it is served.
+
+    :param env: WSGI environment dict
+    '''
+    return {
+        't': round(time.time(), 3),
+        'method': env.get('REQUEST_METHOD', 'GET'),
+        'path': env['PATH_INFO'],
+        'query': env.get('QUERY_STRING', ''),
+        'status': None,
+        'seconds': None,
+        'bytes': 0,
+        'cache': {},
+        'worker': worker_label(),
+    }
+
+class RequestLog:
+    '''Append-only JSON lines log of the requests served. The file is opened per process with
+    O_APPEND and each line written with one call, so the workers' lines do not interleave.
+    '''
+
+    def __init__(self, path):
+        '''Initialize.
+
+        :param path: log file
+        '''
+        self.path = path
+        self.pid = None
+        self.fd = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls):
+        '''The log named by BIRDPLANS_REQUEST_LOG, or None.
+        '''
+        path = os.environ.get('BIRDPLANS_REQUEST_LOG', '')
+        return cls(path) if path else None
+
+    def write(self, record):
+        '''Append one record as a JSON line.
+
+        :param record: JSON serializable dict
+        '''
+        line = bytes(json.dumps(record, separators=(',', ':')) + '\n', 'utf-8')
+        with self.lock:
+            if self.pid != os.getpid():
+                self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                self.pid = os.getpid()
+            os.write(self.fd, line)
+
+    def logged(self, handler, env, start_response):
+        '''Run a WSGI-style handler, logging the request once its body has been sent or it failed.
+
+        :param handler: handler_ method
+        :param env: WSGI environment dict
+        :param start_response: WSGI start_response
+        '''
+        record = request_record(env)
+
+        def logging_start_response(status, headers, *args):
+            '''Note the status on its way out.'''
+            record['status'] = int(status.split(' ', 1)[0])
+            return start_response(status, headers, *args)
+
+        t0 = default_timer()
+        token = CACHE_NOTES.set(record['cache'])
+        try:
+            for chunk in handler(env, logging_start_response):
+                record['bytes'] += len(chunk)
+                yield chunk
+        except Exception:
+            # the server reports the failure; the log still records the request
+            record['status'] = 500
+            raise
+        finally:
+            CACHE_NOTES.reset(token)
+            record['seconds'] = round(default_timer() - t0, 6)
+            self.write(record)
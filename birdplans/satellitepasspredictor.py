@@ -16,14 +16,159 @@ from collections import namedtuple
 import numpy as np
 
 from skyfield.api import Topos, Loader
-from scipy import optimize
+
+from birdplans.accuracy import accuracy_profile
+from birdplans.illumination import pass_lighting, window_ephemeris
+from birdplans.instrumentation import NULL_TIMER
+from birdplans.lazy import lazy_import
+
+optimize = lazy_import('scipy.optimize')
 
 Pass = namedtuple('Pass', ['AOS', 'TCA', 'LOS'])
-WindowPasses = namedtuple('WindowPasses', ['ts', 'diff', 'passes'])
+WindowPasses = namedtuple('WindowPasses', ['ts', 'diff', 'passes', 'lighting'], defaults=[None])
+
+# points sampled along each pass for its track and lighting
+TRACK_POINTS = 13
+
+# coarse samples per window however short, enough to see a maximum between two others
+MINIMUM_SAMPLES = 3
+
+EARTH_ROTATION_RAD_MIN = 7.292115e-5 * 60.0
+
+class DeferredTimescale:
+    '''Stand-in for a Skyfield Timescale that loads it on first use.
+    '''
+
+    def __init__(self, directory):
+        '''Initialize.
+
+        :param directory: Skyfield Loader data directory
+        '''
+        self.directory = directory
+        self.timescale = None
+
+    def __getattr__(self, name):
+        if self.timescale is None:
+            self.timescale = Loader(self.directory).timescale()
+        return getattr(self.timescale, name)
+
+TIMESCALE = DeferredTimescale('data/skyfield')
+
+def leap_seconds(tai):
+    '''TAI - UTC in seconds at each of an array of TAI Julian dates.
+
+    :param tai: TAI Julian date or array of them
+    '''
+    leap_tai = TIMESCALE.leap_dates + TIMESCALE.leap_offsets / 86400.0
+    index = np.searchsorted(leap_tai, tai, side='right') - 1
+    return TIMESCALE.leap_offsets[np.maximum(index, 0)]
+
+def tai_to_epoch_ms(tai):
+    '''Unix epoch milliseconds at each of an array of TAI Julian dates.
+    '''
+    return np.round(
+        (np.asarray(tai) - 2440587.5) * 86400000.0 - leap_seconds(tai) * 1000.0
+    ).astype(np.int64)
+
+def time_grid(start, step, count, ts=None):
+    '''Skyfield Time array of count samples step days apart from start, built as one array
+    operation on start's whole and fractional TAI Julian date.
+
+    :param start: Skyfield Time of the first sample
+    :param step: days between samples
+    :param count: number of samples
+    :param ts: timescale, default start's
+    '''
+    ts = start.ts if ts is None else ts
+    return ts.tai_jd(start.whole, start.tai_fraction + np.arange(count) * step)
+
+def altitude_function(satellite, location, frame='skyfield'):
+    '''Function of Skyfield Time giving the satellite's altitude above location's horizon,
+    degrees, through an accuracy profile's frame model.
+
+    :param satellite: Skyfield EarthSatellite
+    :param location: Skyfield Topos
+    :param frame: Accuracy.frame
+    '''
+    if frame == 'skyfield':
+        diff = satellite - location
+        return lambda t: diff.at(t).altaz()[0].degrees
 
-TIMESCALE = Loader('data/skyfield').timescale()
+    # catalog builds on this module's TIMESCALE, so it can only be imported once this is loaded
+    # pylint: disable=import-outside-toplevel
+    from birdplans.catalog import sgp4_dates, teme_to_pef, topocentric
+    latlng = (location.latitude.degrees, location.longitude.degrees)
 
-def estimate_window_passes(satellite, location, window_start, window_end):
+    def altitude(t):
+        jd, fraction = sgp4_dates(t)
+        _, r, _ = satellite.model.sgp4_array(np.atleast_1d(jd), np.atleast_1d(fraction))
+        alt = topocentric(
+            teme_to_pef(r, np.atleast_1d(t.whole), np.atleast_1d(t.ut1_fraction)), latlng
+        )[0]
+        return alt if np.ndim(t.tai) else alt[0]
+
+    return altitude
+
+def orbit_class(satellite):
+    '''Coarse orbit class from the mean motion and eccentricity of a satellite's elements: LEO,
+    MEO, GEO or HEO.
+    '''
+    period_minutes = (2.0 * np.pi) / satellite.model.no
+    if satellite.model.ecco > 0.25:
+        return 'HEO'
+    if period_minutes < 225.0:
+        return 'LEO'
+    if 1300.0 < period_minutes < 1600.0:
+        return 'GEO'
+    return 'MEO'
+
+def sky_period(satellite):
+    '''Shortest time, days, the satellite can take to cross the observer's sky and come round
+    again: its orbit at the pace it sweeps perigee, (1 + e)^2 / (1 - e^2)^1.5 times its mean
+    motion, plus Earth's rotation beneath it. That is about the orbital period for LEO, a fraction
+    of it for eccentric HEO and half a day for GEO, which only turns through the sky as fast as
+    the observer turns under it.
+
+    :param satellite: Skyfield EarthSatellite
+    '''
+    eccentricity = satellite.model.ecco
+    perigee_rate = satellite.model.no * (1.0 + eccentricity) ** 2 \
+        / (1.0 - eccentricity ** 2) ** 1.5
+    return 2.0 * np.pi / (perigee_rate + EARTH_ROTATION_RAD_MIN) / 24.0 / 60.0
+
+def horizon_edge(alt_f, times, altitudes, peak, edge, step, limit, tolerance):
+    '''TAI Julian date of the rise or set of the pass culminating at peak.
+
+    The crossing is bracketed by the nearest sample below the horizon and its neighbour towards
+    the peak, which is above it, so the root search always has a sign change to work with. With no
+    sample below the horizon inside the window, up to limit days beyond its edge are sampled too;
+    a pass still up past those is clamped to the edge.
+
+    :param alt_f: altitude_function
+    :param times: TAI Julian dates of the coarse samples between peak and edge, nearest first
+    :param altitudes: altitude at each of times
+    :param peak: TAI Julian date of the culmination
+    :param edge: TAI Julian date of the window's start, for the rise, or end, for the set
+    :param step: days between samples, negative for the rise
+    :param limit: days to search beyond the window
+    :param tolerance: root tolerance, days
+    '''
+    below = np.nonzero(altitudes <= 0.0)[0]
+    if len(below):
+        down = times[below[0]]
+        up = times[below[0] - 1] if below[0] else peak
+    else:
+        outside = edge + step * np.arange(1, int(math.ceil(limit / abs(step))) + 1)
+        below = np.nonzero(alt_f(TIMESCALE.tai_jd(outside)) <= 0.0)[0]
+        if not len(below):
+            return edge
+        down = outside[below[0]]
+        up = outside[below[0] - 1] if below[0] else (times[-1] if len(times) else peak)
+
+    return optimize.brentq(lambda t: alt_f(TIMESCALE.tai_jd(t)), down, up, xtol=tolerance)
+
+def estimate_window_passes(
+        satellite, location, window_start, window_end, timer=None, accuracy=None):
     '''
     Implement the satellite pass prediction approach from
     <https://github.com/skyfielders/astronomy-notebooks/blob/master/Solvers/Earth-Satellite-Passes.ipynb>
@@ -33,55 +178,90 @@ def estimate_window_passes(satellite, location, window_start, window_end):
     :param location: a Skyfield Topos object representing our Earth-based reference point
     :param window_start: Skyfield Time object representing search window start
     :param window_end: Skyfield Time object representing search window end
+    :param timer: StageTimer collecting the sampling and refinement stage timings
+    :param accuracy: Accuracy or profile name, default DEFAULT_PROFILE
     '''
 
     # pylint: disable=too-many-locals
     # Complex scientific algorithm more clearly expressed with many locals.
 
+    timer = NULL_TIMER if timer is None else timer
+    accuracy = accuracy_profile(accuracy)
+
     diff = satellite - location
     window_duration = window_end - window_start
 
-    orbit_period_per_day = ((2.0 * np.pi) / satellite.model.no) / 24.0 / 60.0
-    window_revolutions = window_duration / orbit_period_per_day
-    sample_points = int(math.ceil(window_revolutions * 6.0))
+    # sample densely enough for the fastest the satellite can cross the sky, which for eccentric
+    # orbits is at perigee, and for slow ones is set by the Earth turning under them
+    sample_points = max(
+        int(math.ceil(window_duration / sky_period(satellite) * accuracy.samples)), MINIMUM_SAMPLES
+    )
     sample_step = window_duration / sample_points
 
-    sample_time_range = TIMESCALE.tai_jd([
-        window_start.tai + (_ * sample_step)
-        for _ in range(sample_points)
-    ])
+    alt_f = altitude_function(satellite, location, accuracy.frame)
 
-    alt_f = lambda t: diff.at(t).altaz()[0].degrees
+    with timer.stage('sampling'):
+        # both window edges are sampled so passes up at either can be told apart from ones that
+        # rise and set inside
+        sample_time_range = time_grid(window_start, sample_step, sample_points + 1, TIMESCALE)
+        grid = sample_time_range.tai
 
-    sample_altitudes = alt_f(sample_time_range)
+        sample_altitudes = alt_f(sample_time_range)
 
-    left_diff = np.ediff1d(sample_altitudes, to_begin=0.0)
-    right_diff = np.ediff1d(sample_altitudes, to_end=0.0)
-    maxima = (left_diff > 0.0) & (right_diff < 0.0)
+        # an edge sample higher than its neighbour is a maximum too: a pass may have culminated
+        # just before the window opened or still be climbing when it closes
+        left_diff = np.ediff1d(sample_altitudes, to_begin=np.inf)
+        right_diff = np.ediff1d(sample_altitudes, to_end=-np.inf)
+        maxima = (left_diff > 0.0) & (right_diff < 0.0)
 
-    minus_alt_f_wrapper = lambda t: -alt_f(TIMESCALE.tai_jd(t))
-    find_peaks = lambda t: optimize.minimize_scalar(
-        minus_alt_f_wrapper
-        , bracket=[t.tai + sample_step, t.tai - sample_step]
-        , tol=(1.0 / 24.0 / 60.0 / 60.0) / t.tai
-    ).x
+    # each peak lies between the samples either side of its highest sample, or the window's edge;
+    # search that interval in seconds from the sample, where the tolerance means the same whatever
+    # the date
+    step_seconds = sample_step * 86400.0
+    find_peak = lambda t: t + optimize.minimize_scalar(
+        lambda x: -alt_f(TIMESCALE.tai_jd(t + x / 86400.0))
+        , bounds=(
+            -step_seconds if t > grid[0] else 0.0, step_seconds if t < grid[-1] else 0.0
+        )
+        , method='bounded'
+        , options={'xatol': accuracy.peak_tolerance}
+    ).x / 86400.0
 
-    t_peaks = TIMESCALE.tai_jd([
-        find_peaks(ti) for ti in sample_time_range[maxima]
-    ])
+    with timer.stage('refinement'):
+        peaks = np.array([find_peak(_) for _ in grid[maxima]])
+        peak_altitudes = alt_f(TIMESCALE.tai_jd(peaks)) if len(peaks) else peaks
 
-    rising_setting_wrapper = lambda t: -minus_alt_f_wrapper(t)
-    find_rising = lambda t: optimize.brentq(
-        rising_setting_wrapper, t.tai - (2.0 * sample_step), t.tai
-    )
-    find_setting = lambda t: optimize.brentq(
-        rising_setting_wrapper, t.tai + (2.0 * sample_step), t.tai
-    )
+        # one pass per stretch above the horizon, at its highest point: a slow bird may wobble
+        # through several maxima without setting
+        stretches = {}
+        below = np.nonzero(sample_altitudes <= 0.0)[0]
+        for peak, altitude in zip(peaks, peak_altitudes):
+            if altitude <= 0.0:
+                continue
+            index = int(np.searchsorted(grid, peak))
+            stretch = int(np.searchsorted(below, index))
+            if stretch not in stretches or altitude > stretches[stretch][1]:
+                stretches[stretch] = (peak, altitude, index)
 
-    pass_times = [
-        Pass(*TIMESCALE.tai_jd([find_rising(_), _.tai, find_setting(_)]))
-        for _ in t_peaks if alt_f(_) > 0
-    ]
+    # rise and set are searched beyond the window for up to one revolution, or a day for the slow
+    period = min(((2.0 * np.pi) / satellite.model.no) / 24.0 / 60.0, 1.0)
+    edge_tolerance = accuracy.edge_tolerance / 24.0 / 60.0 / 60.0
+
+    with timer.stage('refinement'):
+        pass_times = [
+            Pass(*TIMESCALE.tai_jd([
+                horizon_edge(
+                    alt_f, grid[:index][::-1], sample_altitudes[:index][::-1], peak, grid[0]
+                    , -sample_step, period, edge_tolerance
+                )
+                , peak
+                , horizon_edge(
+                    alt_f, grid[index:], sample_altitudes[index:], peak, grid[-1]
+                    , sample_step, period, edge_tolerance
+                )
+            ]))
+            for peak, _, index in sorted(stretches.values())
+        ]
 
     return WindowPasses(TIMESCALE, diff, pass_times)
 
@@ -90,7 +270,11 @@ def pass_estimation_wrapper(
         , latlng
         , window_start
         , window_stop
-        , minimum_altitude=None):
+        , minimum_altitude=None
+        , timer=None
+        , lighting=True
+        , darkness_altitude=None
+        , accuracy=None):
     '''Call estimate_window_passes with skyfield API objects.
 
     :param satellite: SkyField satellite object to compute passes for
@@ -98,8 +282,16 @@ def pass_estimation_wrapper(
     :param window_start: pass estimation window start time as tz-aware Python datetime
     :param window_stop: pass estimation window end time as tz-aware Python datetime
     :param minimum_altitude: minimum peak altitude pass filter, default 0
+    :param timer: StageTimer collecting the sampling and refinement stage timings
+    :param lighting: also work out, at TRACK_POINTS along each pass, whether the satellite is
+        sunlit and the observer in darkness
+    :param darkness_altitude: Sun altitude below which the observer is in darkness, default the
+        end of civil twilight
+    :param accuracy: Accuracy or profile name, default DEFAULT_PROFILE
     '''
 
+    timer = NULL_TIMER if timer is None else timer
+    accuracy = accuracy_profile(accuracy)
     minimum_altitude = 0 if minimum_altitude is None else minimum_altitude
 
     if window_start > window_stop:
@@ -108,18 +300,35 @@ def pass_estimation_wrapper(
     time_start = TIMESCALE.utc(window_start)
     time_end = TIMESCALE.utc(window_stop)
 
+    location = Topos(*latlng)
     all_passes = estimate_window_passes(
         satellite
-        , Topos(*latlng)
+        , location
         , time_start
         , time_end
+        , timer
+        , accuracy
     )
 
-    return WindowPasses(
-        all_passes.ts
-        , all_passes.diff
-        , [
-            _pass for _pass in all_passes.passes
-            if all_passes.diff.at(_pass.TCA).altaz()[0].degrees >= minimum_altitude
-        ]
-    )
+    with timer.stage('refinement'):
+        passes = all_passes.passes
+        if passes:
+            peaks = altitude_function(satellite, location, accuracy.frame)(
+                TIMESCALE.tai_jd([_pass.TCA.tai for _pass in passes])
+            )
+            passes = [_pass for _pass, peak in zip(passes, peaks) if peak >= minimum_altitude]
+
+    if not lighting:
+        return WindowPasses(all_passes.ts, all_passes.diff, passes)
+
+    with timer.stage('lighting'):
+        # the Sun table is shared by every bird and observer asking about this window
+        ephemeris = window_ephemeris(TIMESCALE, time_start.tai, time_end.tai)
+        return WindowPasses(
+            all_passes.ts
+            , all_passes.diff
+            , passes
+            , pass_lighting(
+                satellite, location, passes, ephemeris, TRACK_POINTS, darkness_altitude
+            )
+        )
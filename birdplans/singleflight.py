@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+
+'''
+singleflight.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+request coalescing: concurrent requests for the same thing wait on one computation and share its
+result. Threads of one worker wait on an event; with a flight directory shared by the workers,
+workers wait on a lock file per key, marking it as they do, and read the result the first one
+left next to it when it saw the mark
+
+    BIRDPLANS_FLIGHT_DIR=flights  directory shared by the workers, default coalesce per worker only
+'''
+
+import fcntl
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+from collections import namedtuple
+
+from birdplans.instrumentation import METRICS
+
+# seconds a worker waits on another's computation before doing it itself
+FLIGHT_TIMEOUT = 120.0
+
+# seconds between polls of a lock file held by another worker
+FLIGHT_POLL = 0.01
+
+# seconds lock and result files are kept once nobody is using them
+FLIGHT_TTL = 600.0
+
+# result: what the computation returned
+# shared: 'thread' or 'process' if another request computed it, None if this one did
+Flight = namedtuple('Flight', ['result', 'shared'])
+
+class InFlight:
+    '''One computation under way in this process.'''
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    '''Coalesce concurrent computations by key, within this process and, given a directory, across
+    processes. Results are shared only with requests that arrived while they were computed; this
+    is not a cache.
+    '''
+
+    def __init__(self, directory=None, timeout=FLIGHT_TIMEOUT, ttl=FLIGHT_TTL):
+        '''Initialize.
+
+        :param directory: flight directory shared by the processes, default this process only
+        :param timeout: seconds to wait on another process's computation
+        :param ttl: seconds result files are kept
+        '''
+        self.directory = directory
+        self.timeout = timeout
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.flights = {}
+        self.swept = time.time()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_environment(cls):
+        '''SingleFlight across the workers sharing BIRDPLANS_FLIGHT_DIR, or within this one.
+        '''
+        return cls(os.environ.get('BIRDPLANS_FLIGHT_DIR') or None)
+
+    def do(self, key, compute, route=''):
+        '''compute(), unless a computation under the same key is already under way, in which case
+        wait for it and share its result.
+
+        :param key: str identifying the computation
+        :param compute: callable returning a picklable result
+        :param route: metrics label
+        :return: Flight
+        '''
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = InFlight()
+
+        if not leader:
+            flight.done.wait()
+            METRICS.increment('coalesced_requests', route=route, scope='thread')
+            if flight.error is not None:
+                raise flight.error
+            return Flight(flight.result, 'thread')
+
+        try:
+            if self.directory is None:
+                outcome = Flight(compute(), None)
+            else:
+                outcome = self.across(key, compute, route)
+            flight.result = outcome.result
+            return outcome
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+
+    def paths(self, key):
+        '''Lock and result file of key.'''
+        digest = hashlib.sha1(bytes(key, 'utf-8')).hexdigest()
+        return (
+            os.path.join(self.directory, digest + '.lock')
+            , os.path.join(self.directory, digest + '.result')
+        )
+
+    def across(self, key, compute, route):
+        '''Coalesce with the other processes through the flight directory.
+        '''
+        lock_path, result_path = self.paths(key)
+        arrived = time.time()
+        fd, waited = self.acquire(lock_path, arrived)
+        if fd is None:
+            # stuck; compute it here rather than wait any longer
+            return Flight(compute(), None)
+        try:
+            if waited:
+                try:
+                    with open(result_path, 'rb') as fin:
+                        finished, result = pickle.load(fin)
+                    # an older result is from a computation finished before this request came
+                    if finished >= arrived:
+                        METRICS.increment('coalesced_requests', route=route, scope='process')
+                        return Flight(result, 'process')
+                except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+                    # the computation failed, or the result was swept; compute it here
+                    pass
+
+            result = compute()
+            # only written when someone marked the lock file waiting for it; they have all read it
+            # once they have had the lock in turn, so the marks are cleared with it
+            if os.fstat(fd).st_size:
+                temporary = '{}.{}'.format(result_path, os.getpid())
+                with open(temporary, 'wb') as fout:
+                    pickle.dump((time.time(), result), fout, pickle.HIGHEST_PROTOCOL)
+                os.replace(temporary, result_path)
+                os.ftruncate(fd, 0)
+            return Flight(result, None)
+        finally:
+            os.close(fd)
+            self.sweep()
+
+    def acquire(self, lock_path, arrived):
+        '''Lock the lock file at lock_path, waiting up to the timeout and marking it while it is
+        held by another process.
+
+        :return: (open locked file descriptor or None after the timeout, whether this waited)
+        '''
+        waited = False
+        while True:
+            fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if not waited:
+                        waited = True
+                        os.write(fd, b'w')
+                    if time.time() - arrived > self.timeout:
+                        os.close(fd)
+                        return None, waited
+                    time.sleep(FLIGHT_POLL)
+
+            # the sweep deletes lock files under the lock, so one locked after its deletion is no
+            # longer the one the others lock; open the file now there and lock that instead
+            try:
+                if os.path.samestat(os.fstat(fd), os.stat(lock_path)):
+                    return fd, waited
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+    def sweep(self):
+        '''Delete result and lock files unused for longer than the TTL, at most once per TTL; a
+        lock file only once it is locked here, so never one a computation holds however long it
+        runs.
+        '''
+        now = time.time()
+        if now - self.swept < self.ttl:
+            return
+        self.swept = now
+        for entry in os.scandir(self.directory):
+            try:
+                if not entry.is_file() or now - entry.stat().st_mtime <= self.ttl:
+                    continue
+                if not entry.name.endswith('.lock'):
+                    os.remove(entry.path)
+                    continue
+                fd = os.open(entry.path, os.O_RDWR)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    os.remove(entry.path)
+                except BlockingIOError:
+                    pass
+                finally:
+                    os.close(fd)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+'''
+skygrid.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+what is up right now: sub-satellite points of the whole catalog binned into latitude/longitude
+grids sized by footprint radius and refreshed in the background, so a query only looks at the
+satellites near the observer
+'''
+
+import threading
+
+from collections import namedtuple
+from timeit import default_timer
+
+import numpy as np
+
+from birdplans.catalog import WGS84_FLATTENING, WGS84_RADIUS_KM, footprint_angle, overhead
+from birdplans.instrumentation import METRICS
+from birdplans.satellitepasspredictor import TIMESCALE
+
+# grid cell, degrees of latitude and longitude
+CELL = 5.0
+
+# satellites are grouped into tiers by footprint radius rounded up to a multiple of this, degrees,
+# and each tier only searches the cells within its radius of the observer; LEO birds, with the
+# smallest footprints, then check only a few percent of the sky
+RADIUS_STEP = 5.0
+
+# seconds between background refreshes
+REFRESH_PERIOD = 5.0
+
+# seconds without a reader after which the refresher thread stops; the next reader starts it again
+IDLE_PERIOD = 300.0
+
+# fastest a sub-satellite point moves, degrees per second (a LEO bird at perigee); widens the search
+# by how far anything could have moved since the grid was built
+MAXIMUM_DRIFT = 0.075
+
+# allowance for binning geocentric sub-satellite points around geodetic observers, degrees
+LATITUDE_SLACK = 0.5
+
+# radius: footprint radius bound of the tier, degrees; points: the tier's points sorted by cell;
+# offsets: where each cell's run of points starts, with one trailing entry
+Tier = namedtuple('Tier', ['radius', 'points', 'offsets'])
+
+def unit_vectors(lat, lng):
+    '''Unit vectors of geocentric latitudes and longitudes, degrees, shape (len(lat), 3).'''
+    lat, lng = np.radians(lat), np.radians(lng)
+    return np.column_stack((np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)))
+
+class SkyGrid:
+    '''Every satellite of a SatelliteBatch binned by sub-satellite point at one time.
+    '''
+
+    rows = int(np.ceil(180.0 / CELL))
+    columns = int(np.ceil(360.0 / CELL))
+
+    def __init__(self, batch, tai):
+        '''Initialize.
+
+        :param batch: SatelliteBatch
+        :param tai: TAI Julian date of the sub-satellite points
+        '''
+        self.batch = batch
+        self.tai = tai
+        self.built = default_timer()
+
+        r = batch.positions(TIMESCALE.tai_jd([tai]))[:, 0, :]
+        distance = np.linalg.norm(r, axis=1)
+        # satellites SGP4 could not propagate are NaN and never binned
+        valid = np.flatnonzero(np.isfinite(distance))
+        self.points = r[valid] / distance[valid, np.newaxis]
+        self.index = valid
+        # measured from the polar radius, the footprint bounds the visible region at any latitude
+        self.radius = np.degrees(footprint_angle(
+            distance[valid] - WGS84_RADIUS_KM * (1.0 - WGS84_FLATTENING), 0.0
+        ))
+
+        cell = self.cell(
+            np.degrees(np.arcsin(np.clip(self.points[:, 2], -1.0, 1.0)))
+            , np.degrees(np.arctan2(self.points[:, 1], self.points[:, 0]))
+        )
+        bound = np.ceil(self.radius / RADIUS_STEP) * RADIUS_STEP
+
+        self.tiers = []
+        for radius in np.unique(bound):
+            points = np.flatnonzero(bound == radius)
+            points = points[np.argsort(cell[points], kind='stable')]
+            offsets = np.searchsorted(cell[points], np.arange(self.rows * self.columns + 1))
+            self.tiers.append(Tier(radius, points, offsets))
+
+    def cell(self, lat, lng):
+        '''Cell numbers of latitudes and longitudes, degrees.'''
+        row = np.clip(np.floor((np.asarray(lat) + 90.0) / CELL).astype(int), 0, self.rows - 1)
+        column = np.floor(np.asarray(lng) / CELL).astype(int) % self.columns
+        return row * self.columns + column
+
+    def cells(self, latlng, reach):
+        '''Numbers of the cells holding points within reach degrees of latlng.
+        '''
+        lat, lng = latlng
+        low, high = max(lat - reach, -90.0), min(lat + reach, 90.0)
+        widest = max(abs(low), abs(high))
+        if widest >= 89.0 or reach >= 90.0 \
+                or np.sin(np.radians(reach)) >= np.cos(np.radians(widest)):
+            columns = np.arange(self.columns)
+        else:
+            # a circle of angular radius reach spans this much longitude at its widest
+            span = np.degrees(np.arcsin(np.sin(np.radians(reach)) / np.cos(np.radians(widest))))
+            columns = np.unique(np.arange(
+                np.floor((lng - span) / CELL), np.floor((lng + span) / CELL) + 1
+            ).astype(int) % self.columns)
+        rows = np.arange(
+            int((low + 90.0) // CELL), min(int((high + 90.0) // CELL), self.rows - 1) + 1
+        )
+        return (rows[:, np.newaxis] * self.columns + columns).ravel()
+
+    def candidates(self, latlng, margin=0.0):
+        '''Batch indexes of the satellites whose footprint might cover latlng.
+
+        :param margin: extra search radius, degrees
+        '''
+        found = []
+        for tier in self.tiers:
+            cells = self.cells(latlng, tier.radius + margin + LATITUDE_SLACK)
+            start = tier.offsets[cells]
+            count = tier.offsets[cells + 1] - start
+            # positions of every cell's run of points, gathered without a loop over cells
+            runs = np.repeat(start - np.cumsum(count) + count, count) + np.arange(count.sum())
+            found.append(tier.points[runs])
+        points = np.concatenate(found)
+
+        # the cells are a box around the footprint; keep the points inside it
+        angle = np.degrees(np.arccos(np.clip(
+            self.points[points] @ unit_vectors([latlng[0]], [latlng[1]])[0], -1.0, 1.0
+        )))
+        return np.sort(self.index[points[angle <= self.radius[points] + margin + LATITUDE_SLACK]])
+
+    def overhead(self, latlng, tai, minimum_altitude=0.0):
+        '''Every satellite at least minimum_altitude above the horizon at latlng at tai, which
+        may be a little after the grid was built.
+
+        :return: (list of Overhead highest first, number of candidates checked)
+        '''
+        index = self.candidates(latlng, abs(tai - self.tai) * 86400.0 * MAXIMUM_DRIFT)
+        return overhead(
+            self.batch.subset(index), latlng, TIMESCALE.tai_jd(tai), minimum_altitude
+        ), len(index)
+
+class SkyRefresher:
+    '''Keep a SkyGrid of now up to date from a daemon thread. Threads do not survive a fork, so
+    the thread starts on the first request reading the grid in a worker, and stops once no request
+    has read it for idle seconds; if it cannot run, requests rebuild a stale grid themselves.
+    '''
+
+    def __init__(self, batch, period=REFRESH_PERIOD, idle=IDLE_PERIOD):
+        '''Initialize.
+
+        :param batch: SatelliteBatch to keep binned
+        :param period: seconds between refreshes
+        :param idle: seconds without a reader before the thread stops
+        '''
+        self.batch = batch
+        self.period = period
+        self.idle = idle
+        self.grid = None
+        self.read = default_timer()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+
+    def refresh(self):
+        '''Build a grid for now.
+        '''
+        grid = SkyGrid(self.batch, TIMESCALE.now().tai)
+        METRICS.increment('sky_grid_refreshes')
+        METRICS.observe('sky_grid_seconds', default_timer() - grid.built)
+        self.grid = grid
+        return grid
+
+    def run(self):
+        '''Thread body.'''
+        while not self.stop.wait(self.period):
+            with self.lock:
+                # decided under the lock, so a reader arriving now either is seen here or finds
+                # no thread and starts one
+                if default_timer() - self.read > self.idle:
+                    self.thread = None
+                    return
+            self.refresh()
+
+    def start(self):
+        '''Start the refresher thread once per process.
+        '''
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='sky-refresher', daemon=True)
+                self.thread.start()
+
+    def current(self):
+        '''The latest grid, rebuilt here if the thread has not kept it fresh.
+        '''
+        self.read = default_timer()
+        self.start()
+        grid = self.grid
+        if grid is None or default_timer() - grid.built > 2.0 * self.period:
+            with self.lock:
+                grid = self.grid
+                if grid is None or default_timer() - grid.built > 2.0 * self.period:
+                    grid = self.refresh()
+        return grid
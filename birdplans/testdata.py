@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+'''
+testdata.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+the frozen data/test satellites, shared by the unit tests and the benchmarks
+'''
+
+import datetime
+import json
+
+import numpy as np
+import pytz
+
+from skyfield.functions import BytesIO
+from skyfield.iokit import parse_tle
+
+TLEDB = 'data/test/tledbcurrent.json'
+TLESOURCE = 'celestrak/active.txt'
+
+# the frozen TLEs were fetched 2018-12-02, start just after so element age stays small
+WINDOW_START = datetime.datetime(2018, 12, 3, tzinfo=pytz.utc)
+
+def load_satellites(tledb=TLEDB, source=TLESOURCE):
+    '''Parse every satellite in a frozen tledbcurrent.json source, in NORAD number order.
+    '''
+    with open(tledb, 'r') as fin:
+        body = json.load(fin)[source]['body']
+
+    satellites = {sat.model.satnum: sat for _, sat in parse_tle(BytesIO(bytes(body, 'ascii')))}
+    return [satellites[_] for _ in sorted(satellites)]
+
+def pick(items, count):
+    '''Choose count items spread evenly through items, deterministically; None means all.
+    '''
+    if count is None or count >= len(items):
+        return list(items)
+    return [items[_] for _ in np.linspace(0, len(items) - 1, count).round().astype(int)]
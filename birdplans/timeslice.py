@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+
+'''
+timeslice.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+long-horizon pass prediction: windows of weeks are cut into slices predicted independently, in
+parallel across a process pool when one is given, and merged back into one list of passes; element
+age limits how far ahead any of it is worth predicting. With a PassStore the slices are whole UTC
+days, read from the store when it has them
+
+    BIRDPLANS_SLICE_PROCESSES=4  pool size for long windows, default the cpus each worker serving
+                                 requests gets, 1 for none
+'''
+
+import os
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time, timedelta, timezone
+
+import numpy as np
+
+from skyfield.api import Topos
+from skyfield.sgp4lib import EarthSatellite
+
+from birdplans.accuracy import accuracy_profile
+from birdplans.illumination import pass_lighting, window_ephemeris
+from birdplans.instrumentation import METRICS, NULL_TIMER
+from birdplans.requestlog import note_cache
+from birdplans.satellitepasspredictor import (
+    TIMESCALE, TRACK_POINTS, Pass, WindowPasses, altitude_function, pass_estimation_wrapper
+    , sky_period
+)
+
+# windows longer than this are sliced
+SLICE_LENGTH = timedelta(days=5)
+
+# longest window /one predicts
+MAXIMUM_WINDOW = timedelta(days=60)
+
+# SGP4 errors grow by a few kilometres a day, enough to shift a LEO pass by minutes within a couple
+# of weeks; beyond WARNING_AGE passes are flagged, beyond MAXIMUM_AGE not predicted at all
+WARNING_AGE = timedelta(days=14)
+MAXIMUM_AGE = timedelta(days=30)
+
+# epoch: the elements' epoch as tz-aware Python datetime
+# stop: prediction end, before the window's end when the elements are too old to reach it
+# warning: why the passes near the end are not to be trusted, or None
+ElementAge = namedtuple('ElementAge', ['epoch', 'stop', 'warning'])
+
+# span of a window one slice searches, tz-aware Python datetimes
+TimeSlice = namedtuple('TimeSlice', ['start', 'stop'])
+
+def element_age(satellite, window_start, window_stop):
+    '''Cut a window short where the satellite's elements are too old to predict from, and warn
+    when they are getting there.
+
+    :param satellite: Skyfield EarthSatellite
+    :param window_start: tz-aware Python datetime
+    :param window_stop: tz-aware Python datetime
+    :return: ElementAge
+    '''
+    epoch = satellite.epoch.utc_datetime()
+    stop = max(min(window_stop, epoch + MAXIMUM_AGE), window_start)
+    warning = None
+    if stop < window_stop:
+        warning = 'elements from {} are too old to predict past {}'.format(
+            epoch.isoformat(), stop.isoformat()
+        )
+    elif window_stop > epoch + WARNING_AGE:
+        warning = 'elements from {} are over {} days old by the end of the window'.format(
+            epoch.isoformat(), WARNING_AGE.days
+        )
+    elif window_start < epoch - WARNING_AGE:
+        # looking back is as inexact as looking ahead, but there may be nothing older to use
+        warning = 'elements from {} are over {} days newer than the start of the window'.format(
+            epoch.isoformat(), WARNING_AGE.days
+        )
+    return ElementAge(epoch, stop, warning)
+
+def time_slices(window_start, window_stop, overlap, length=SLICE_LENGTH):
+    '''Cut a window into slices of length, each searching overlap further into its neighbours.
+    The outer edges of the window are not widened.
+
+    :param overlap: timedelta
+    :return: list of TimeSlice
+    '''
+    slices = []
+    start = window_start
+    while start < window_stop:
+        stop = min(start + length, window_stop)
+        slices.append(TimeSlice(
+            max(start - overlap, window_start), min(stop + overlap, window_stop)
+        ))
+        start = stop
+    return slices
+
+def day_slices(window_start, window_stop, overlap):
+    '''Cut a window into whole UTC days, each searching overlap further into its neighbours;
+    the first and last reach outside the window.
+
+    :param overlap: timedelta
+    :return: list of (proleptic Gregorian ordinal of the day, TimeSlice)
+    '''
+    slices = []
+    day = window_start.astimezone(timezone.utc).date()
+    start = datetime.combine(day, time(), tzinfo=timezone.utc)
+    while start < window_stop:
+        slices.append((start.toordinal(), TimeSlice(
+            start - overlap, start + timedelta(days=1) + overlap
+        )))
+        start += timedelta(days=1)
+    return slices
+
+def slice_passes(task):
+    '''Process pool entry point: every pass of one slice, however low; the altitude filter waits
+    until the slices are merged, since a pass crossing a slice's edge may culminate in the next.
+
+    :param task: (TLE line 1, TLE line 2, latlng, TimeSlice, accuracy name)
+    :return: array of (AOS, TCA, LOS TAI Julian dates, altitude at TCA in degrees)
+    '''
+    line1, line2, latlng, time_slice, accuracy = task
+    satellite = EarthSatellite(line1, line2)
+    passes = pass_estimation_wrapper(
+        satellite, latlng, time_slice.start, time_slice.stop, lighting=False, accuracy=accuracy
+    ).passes
+    if not passes:
+        return np.zeros((0, 4))
+
+    events = np.array([[_.AOS.tai, _.TCA.tai, _.LOS.tai] for _ in passes])
+    peaks = altitude_function(satellite, Topos(*latlng), accuracy_profile(accuracy).frame)(
+        TIMESCALE.tai_jd(events[:, 1])
+    )
+    return np.column_stack([events, peaks])
+
+def merge_passes(events):
+    '''Passes of all slices in time order, one per stretch above the horizon: a pass crossing
+    from one slice into the next is reported by both, so passes overlapping in time are merged
+    into one from the first AOS to the last LOS culminating at the highest TCA.
+
+    :param events: list of arrays of (AOS, TCA, LOS, altitude at TCA)
+    '''
+    merged = []
+    for row in sorted(np.concatenate(events).tolist() if events else []):
+        if merged and row[0] <= merged[-1][2]:
+            last = merged[-1]
+            if row[3] > last[3]:
+                last[1], last[3] = row[1], row[3]
+            last[2] = max(last[2], row[2])
+        else:
+            merged.append(row)
+    return np.array(merged).reshape(-1, 4)
+
+def clamp_to_window(events, window, satellite, latlng, accuracy):
+    '''Passes of day slices, which reach past the window, as one search of the window reports
+    them: a pass culminating outside the window culminates at its edge, at the altitude there, and
+    one still up further past the edge than that search looks rises or sets at the edge.
+
+    :param events: array of (AOS, TCA, LOS, altitude at TCA) overlapping the window
+    :param window: (start, stop) TAI Julian dates
+    :param satellite: Skyfield EarthSatellite
+    :param latlng: Earth reference point expressed as a tuple of floats
+    :param accuracy: Accuracy
+    :return: array of (AOS, TCA, LOS, altitude at TCA)
+    '''
+    events = events.copy()
+    # as far as estimate_window_passes looks past the window for a rise or set
+    period = min(((2.0 * np.pi) / satellite.model.no) / 24.0 / 60.0, 1.0)
+    events[events[:, 0] < window[0] - period, 0] = window[0]
+    events[events[:, 2] > window[1] + period, 2] = window[1]
+
+    outside = (events[:, 1] < window[0]) | (events[:, 1] > window[1])
+    if outside.any():
+        events[outside, 1] = np.clip(events[outside, 1], *window)
+        events[outside, 3] = altitude_function(satellite, Topos(*latlng), accuracy.frame)(
+            TIMESCALE.tai_jd(events[outside, 1])
+        )
+    return events
+
+def long_horizon_passes(
+        satellite
+        , lines
+        , latlng
+        , window_start
+        , window_stop
+        , minimum_altitude=None
+        , timer=None
+        , lighting=True
+        , accuracy=None
+        , executor=None
+        , store=None
+        , key=None):
+    '''pass_estimation_wrapper for windows of weeks: the window is sliced and the slices predicted
+    independently, over executor when given. With a store the slices are UTC days, read from it
+    when it has them and written back when it does not, and the passes crossing the window's edges
+    are cut back to it as pass_estimation_wrapper cuts them.
+
+    :param satellite: Skyfield EarthSatellite
+    :param lines: (TLE line 1, TLE line 2) of satellite, which the pool workers parse themselves
+    :param latlng: Earth reference point expressed as a tuple of floats
+    :param window_start: tz-aware Python datetime
+    :param window_stop: tz-aware Python datetime
+    :param minimum_altitude: minimum peak altitude pass filter, default 0
+    :param timer: StageTimer; the pool's work is all counted as refinement
+    :param lighting: also work out the lighting along each pass
+    :param accuracy: Accuracy or profile name, default DEFAULT_PROFILE
+    :param executor: concurrent.futures executor, default predict the slices here one by one
+    :param store: PassStore
+    :param key: StoreKey of these passes, any day
+    :return: WindowPasses
+    '''
+    timer = NULL_TIMER if timer is None else timer
+    accuracy = accuracy_profile(accuracy)
+    minimum_altitude = 0 if minimum_altitude is None else minimum_altitude
+
+    # each slice searches a whole trip round the sky into its neighbours, so a pass crossing
+    # between them is seen whole, rise, culmination and set, by at least one
+    overlap = timedelta(days=sky_period(satellite))
+    if store is None:
+        slices = [(None, _) for _ in time_slices(window_start, window_stop, overlap)]
+        found = [None] * len(slices)
+    else:
+        slices = day_slices(window_start, window_stop, overlap)
+        with timer.stage('store'):
+            found = [store.get(key._replace(day=day)) for day, _ in slices]
+        hits = sum(_ is not None for _ in found)
+        METRICS.increment('pass_store_hits', hits)
+        METRICS.increment('pass_store_misses', len(found) - hits)
+        note_cache('store_hits', hits)
+        note_cache('store_misses', len(found) - hits)
+
+    missing = [i for i, _ in enumerate(found) if _ is None]
+    with timer.stage('refinement'):
+        computed = (executor.map if executor is not None else map)(
+            slice_passes, [(*lines, latlng, slices[i][1], accuracy.name) for i in missing]
+        )
+        for i, events in zip(missing, computed):
+            found[i] = events
+
+    if store is not None and missing:
+        with timer.stage('store'):
+            for i in missing:
+                store.put(key._replace(day=slices[i][0]), found[i])
+
+    with timer.stage('refinement'):
+        events = merge_passes(found)
+        window = TIMESCALE.utc(window_start).tai, TIMESCALE.utc(window_stop).tai
+        events = events[(events[:, 2] >= window[0]) & (events[:, 0] <= window[1])]
+        if store is not None:
+            events = clamp_to_window(events, window, satellite, latlng, accuracy)
+        events = events[events[:, 3] >= minimum_altitude, :3]
+
+    location = Topos(*latlng)
+    diff = satellite - location
+    passes = [Pass(*TIMESCALE.tai_jd(_)) for _ in events]
+    if not lighting:
+        return WindowPasses(TIMESCALE, diff, passes)
+
+    with timer.stage('lighting'):
+        ephemeris = window_ephemeris(
+            TIMESCALE, TIMESCALE.utc(window_start).tai, TIMESCALE.utc(window_stop).tai
+        )
+        return WindowPasses(TIMESCALE, diff, passes, pass_lighting(
+            satellite, location, passes, ephemeris, TRACK_POINTS
+        ))
+
+def slice_executor(processes=None, workers=1):
+    '''Process pool for long windows, or None to predict them in the calling process.
+
+    :param processes: pool size, default BIRDPLANS_SLICE_PROCESSES or the cpus each of workers gets
+    :param workers: processes serving requests on this machine, each starting a pool of its own
+    '''
+    if processes is None:
+        processes = int(os.environ.get(
+            'BIRDPLANS_SLICE_PROCESSES', max((os.cpu_count() or 1) // workers, 1)
+        ))
+    return ProcessPoolExecutor(processes) if processes > 1 else None
@@ -8,29 +8,162 @@ jonathanwesleystone+KI5BEX@gmail.com
 Load and keep updated the local TLE database.
 '''
 
+import hashlib
 import json
+import os
+import tempfile
+
+from collections import namedtuple
+from collections.abc import Mapping
+from datetime import datetime, timedelta, timezone
+
+from birdplans.lazy import lazy_import
+
+# only needed to parse a satellite or fetch new elements
+requests = lazy_import('requests')
+sgp4lib = lazy_import('skyfield.sgp4lib')
+
+# one bird whose elements differ between two loads
+# bird: alias
+# old, new: (line1, line2) before and after, None where the bird was not loaded
+# old_epoch, new_epoch: the elements' epochs as tz-aware Python datetimes, None likewise
+ElementChange = namedtuple('ElementChange', ['bird', 'old', 'new', 'old_epoch', 'new_epoch'])
+
+# everything one load of the current tle data yields, published to readers in a single assignment so
+# none of them sees the elements of one load with the version or satellites of another
+# loaded: modification time of the file it was read from, None if there was none
+# elements: dict of {bird_alias: (catalog name, line1, line2)}
+# version: identifies this set of elements, so results computed from it can be keyed by it
+# fingerprints: dict of {bird_alias: version of that bird's elements alone}
+# tle: dict of {bird_alias: 'tle\nlines'}
+# bird: LazyBirds of the elements
+TleState = namedtuple(
+    'TleState', ['loaded', 'elements', 'version', 'fingerprints', 'tle', 'bird']
+)
+
+def split_tle(body):
+    '''Split the text of a TLE source into (name, line1, line2) tuples, skipping any lines that
+    are not part of a three line element set.
+
+    :param body: TLE source text
+    '''
+    lines = [_.rstrip() for _ in body.splitlines()]
+    for i in range(len(lines) - 2):
+        if lines[i + 1].startswith('1 ') and lines[i + 2].startswith('2 ') \
+                and not lines[i].startswith(('1 ', '2 ')):
+            yield lines[i].strip(), lines[i + 1], lines[i + 2]
+
+def tle_epoch(line1):
+    '''Epoch of a TLE from its first line, without parsing the rest of it.
+
+    :param line1: TLE line 1
+    :return: tz-aware Python datetime
+    '''
+    year = int(line1[18:20])
+    year += 1900 if year >= 57 else 2000
+    return datetime(year, 1, 1, tzinfo=timezone.utc) + timedelta(days=float(line1[20:32]) - 1.0)
+
+def diff_elements(old, new):
+    '''The birds whose element lines differ between two loads, added and removed ones included.
+
+    :param old: dict of {bird_alias: (catalog name, line1, line2)}
+    :param new: dict of {bird_alias: (catalog name, line1, line2)}
+    :return: list of ElementChange, by bird
+    '''
+    changes = []
+    for bird in sorted(set(old) | set(new)):
+        before = old[bird][1:] if bird in old else None
+        after = new[bird][1:] if bird in new else None
+        if before != after:
+            changes.append(ElementChange(
+                bird, before, after
+                , None if before is None else tle_epoch(before[0])
+                , None if after is None else tle_epoch(after[0])
+            ))
+    return changes
+
+def write_json(path, data):
+    '''Write data to path as JSON all at once: into a file beside it, then renamed over it, so
+    workers reloading it never read it half written.
+    '''
+    fd, temporary = tempfile.mkstemp(
+        prefix=os.path.basename(path) + '.', dir=os.path.dirname(path) or '.'
+    )
+    try:
+        # readable as open() would have left it, not mkstemp's owner only
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, 'w') as fout:
+            json.dump(data, fout)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+class LazyBirds(Mapping):
+    '''SkyField satellites keyed by alias, catalog name and NORAD number. Each satellite is parsed
+    on its first lookup and then shared by all of its keys.
+    '''
+
+    def __init__(self, elements, full_catalog=False):
+        '''Build the key index.
+
+        :param elements: dict of {bird_alias: (catalog name, line1, line2)}
+        :param full_catalog: also index the NORAD numbers as strings
+        '''
+        self.elements = elements
+        self.index = {}
+        self.satellites = {}
+
+        for key, (name, line1, _) in elements.items():
+            try:
+                satnum = int(line1[2:7])
+            except ValueError:
+                satnum = line1[2:7]
+            for index in [satnum, key, name] + ([str(satnum)] if full_catalog else []):
+                self.index.setdefault(index, key)
+
+    def __getitem__(self, bird):
+        key = self.index[bird]
+        try:
+            return self.satellites[key]
+        except KeyError:
+            _, line1, line2 = self.elements[key]
+            satellite = self.satellites[key] = sgp4lib.EarthSatellite(line1, line2, key)
+            return satellite
+
+    def __contains__(self, bird):
+        return bird in self.index
 
-from datetime import datetime, timezone
+    def lines(self, bird):
+        '''The two TLE lines of bird, for rebuilding its satellite in another process.
+        '''
+        _, line1, line2 = self.elements[self.index[bird]]
+        return line1, line2
 
-import requests
+    def __iter__(self):
+        return iter(self.index)
 
-from skyfield.functions import BytesIO
-from skyfield.iokit import parse_tle
+    def __len__(self):
+        return len(self.index)
 
 class TleManager:
     '''Keep the TLE files updated.
     '''
 
-    def __init__(self, tlesrcfile=None, tledbcurrent=None, tledbhistory=None):
+    def __init__(self, tlesrcfile=None, tledbcurrent=None, tledbhistory=None, full_catalog=False):
         '''load up a birdlist annotated with TLE sources
 
         :param tlesrcfile: JSON file linking the birds to their TLEs
         :param tledb: JSON file containing the downloaded TLE logs and history
+        :param full_catalog: load every object in the sources, not just the aliased birds
         '''
 
         self.tlesrcfile = 'data/tle/choice_birds.json' if tlesrcfile is None else tlesrcfile
         self.tledbcurrent = 'tledbcurrent.json' if tledbcurrent is None else tledbcurrent
         self.tledbhistory = 'tledbhistory.json' if tledbhistory is None else tledbhistory
+        self.full_catalog = full_catalog
+        # called with the list of ElementChange whenever a reload changes any bird
+        self.listeners = []
 
         try:
             with open(self.tlesrcfile, 'r') as fin:
@@ -40,25 +173,57 @@ class TleManager:
                 'sources': []
             }
 
-        self.tle = self.load()
-        # this has the tle with our aliases
-        self.tlestring = '\n'.join([key + '\n' + value.replace('n', '-') for key, value in self.tle.items()])
-        self.bird = self.parse()
-
-    def parse(self):
-        '''Parse the loaded tle data using SkyField API.
+        self.state = self.load()
+
+    @property
+    def loaded(self):
+        '''Modification time of the tle data file as last loaded.'''
+        return self.state.loaded
+
+    @property
+    def elements(self):
+        '''The loaded elements, {bird_alias: (catalog name, line1, line2)}.'''
+        return self.state.elements
+
+    @property
+    def version(self):
+        '''Identifies the loaded set of elements.'''
+        return self.state.version
+
+    @property
+    def fingerprints(self):
+        '''Identifies each loaded bird's elements, by alias.'''
+        return self.state.fingerprints
+
+    @property
+    def tle(self):
+        '''The loaded tle data, {bird_alias: 'tle\nlines'}.'''
+        return self.state.tle
+
+    @property
+    def bird(self):
+        '''The loaded satellites, a LazyBirds.'''
+        return self.state.bird
+
+    def parse(self, elements):
+        '''Index elements by alias, catalog name and NORAD number; the SkyField satellites
+        themselves are only built when first looked up.
         '''
-        tle = {}
-        for names, sat in parse_tle(BytesIO(bytes(self.tlestring, 'ascii'))):
-            tle[sat.model.satnum] = sat
-            for name in names:
-                tle[name] = sat
+        return LazyBirds(elements, self.full_catalog)
 
-        return tle
+    @property
+    def tlestring(self):
+        '''The loaded tle data with our aliases as one string.
+        '''
+        return '\n'.join([key + '\n' + value.replace('n', '-') for key, value in self.tle.items()])
 
     def load(self):
-        '''load the current tle data into a dict of {bird_alias: 'tle\nlines'}
+        '''Read the current tle data, without publishing it.
+
+        :return: TleState
+        :raises ValueError: if the file is not valid JSON
         '''
+        modified = self.modified()
 
         try:
             with open(self.tledbcurrent, 'r') as fin:
@@ -68,23 +233,97 @@ class TleManager:
                 'sources': []
             }
 
-        bird_tles = {}
+        # every source body is split exactly once
+        elements = {}
+        catalog = {}
         for source in self.tlesrcs['sources']:
             if source in tledbcurrent:
-                lines = tledbcurrent[source]['body'].splitlines()
-                for birdname, bird in self.tlesrcs['birds'].items():
-                    if 'source' in bird and bird['source'] == source:
-                        lineiter = iter(lines)
-                        for line in lineiter:
-                            if bird['name'] == line.strip():
-                                bird_tles[birdname] = ((birdname + (' ' * 24))[:24]) + \
-                                    '\n' + next(lineiter) + '\n' + next(lineiter)
-                                break
-
-        return bird_tles
+                catalog[source] = {}
+                for name, line1, line2 in split_tle(tledbcurrent[source]['body']):
+                    catalog[source].setdefault(name, (name, line1, line2))
+
+        for birdname, bird in self.tlesrcs.get('birds', {}).items():
+            if bird.get('source') in catalog and bird['name'] in catalog[bird['source']]:
+                elements[birdname] = catalog[bird['source']][bird['name']]
+
+        if self.full_catalog:
+            claimed = {line1[2:7] for _, line1, _ in elements.values()}
+            for source in self.tlesrcs['sources']:
+                for name, line1, line2 in catalog.get(source, {}).values():
+                    if line1[2:7] not in claimed and name not in elements:
+                        claimed.add(line1[2:7])
+                        elements[name] = (name, line1, line2)
+
+        return TleState(
+            # read whole, so a file that was not keeps the old time and is read again next refresh
+            modified
+            , elements
+            , hashlib.sha1(bytes(''.join(
+                alias + line1 + line2 for alias, (_, line1, line2) in sorted(elements.items())
+            ), 'ascii')).hexdigest()[:16]
+            , {
+                alias: hashlib.sha1(bytes(line1 + line2, 'ascii')).hexdigest()[:16]
+                for alias, (_, line1, line2) in elements.items()
+            }
+            , {
+                birdname: ((birdname + (' ' * 24))[:24]) + '\n' + line1 + '\n' + line2
+                for birdname, (_, line1, line2) in elements.items()
+            }
+            , self.parse(elements)
+        )
+
+    def modified(self):
+        '''Modification time of the current tle data file, or None if there is none.
+        '''
+        try:
+            return os.stat(self.tledbcurrent).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def subscribe(self, listener):
+        '''Call listener with the list of ElementChange every time a reload changes any bird.
+        '''
+        self.listeners.append(listener)
+
+    def reload(self):
+        '''Load the current tle data again. The birds whose elements did not change keep their
+        parsed satellites, so anything built from those stays valid; the listeners are told which
+        birds did change. The new state is published only once it is complete.
+
+        :return: list of ElementChange
+        '''
+        old, state = self.state, self.load()
+        changes = diff_elements(old.elements, state.elements)
+
+        changed = {_.bird for _ in changes}
+        for key, satellite in old.bird.satellites.items():
+            if key not in changed:
+                state.bird.satellites[key] = satellite
+        self.state = state
+
+        if changes:
+            for listener in self.listeners:
+                listener(changes)
+        return changes
+
+    def refresh(self):
+        '''Reload if the current tle data file was rewritten since it was last loaded.
+
+        :return: list of ElementChange
+        '''
+        if self.modified() == self.loaded:
+            return []
+        try:
+            return self.reload()
+        except ValueError:
+            # caught mid-write by something other than update(); keep the elements we have and try
+            # again next time
+            return []
 
     def update(self, keep_history=True):
-        '''update the tles if needed
+        '''update the tles if needed, then reload them
+
+        :return: list of ElementChange
         '''
         try:
             with open(self.tledbcurrent, 'r') as fin:
@@ -135,18 +374,30 @@ class TleManager:
                     'last-modified': response.headers.get('last-modified')
                 })
 
-        with open(self.tledbcurrent, 'w') as fout:
-            json.dump(tledbcurrent, fout)
+        write_json(self.tledbcurrent, tledbcurrent)
 
         if keep_history:
-            with open(self.tledbhistory, 'w') as fout:
-                json.dump(tledbhistory, fout)
+            write_json(self.tledbhistory, tledbhistory)
+
+        return self.reload()
 
     def __getitem__(self, bird):
         '''Bird fetcher -- return SkyField Satellite object parsed from the TLE identified by bird.
         '''
         return self.bird[bird]
 
+    def lines(self, bird):
+        '''The two TLE lines of bird.
+        '''
+        return self.bird.lines(bird)
+
+    def fingerprint(self, bird):
+        '''Identifies bird's element set, so results computed from it can be keyed by it; like
+        version, for one bird.
+        '''
+        state = self.state
+        return state.fingerprints[state.bird.index[bird]]
+
 class TestTleManager(TleManager):
     '''Test wrapper for TleManager.
     '''
@@ -10,10 +10,11 @@ uwsgi application wrapper/api endpoint
 
 import json
 import html
+import os
 import sys
 
 from datetime import datetime, timedelta, timezone
-from collections import namedtuple
+from collections import OrderedDict, namedtuple
 from timeit import default_timer
 from urllib import parse
 from enum import Enum
@@ -21,12 +22,32 @@ from enum import Enum
 import pytz
 
 import maidenhead as mh
-import numpy as np
 
-from birdplans.satellitepasspredictor import pass_estimation_wrapper
+from birdplans.accuracy import accuracy_profile
+from birdplans.instrumentation import METRICS, StageTimer, worker_label
+from birdplans.lazy import lazy_import
+from birdplans.preload import freeze, preload, preloading
+from birdplans.quantize import Quantizer, timing_error
+from birdplans.requestlog import RequestLog, note_cache
+from birdplans.singleflight import SingleFlight
 from birdplans.tlemanager import TleManager
+from birdplans.warmup import warmup, warmup_enabled
 from birdplans import tzhelper
 
+# the propagation stack loads on the first route that needs it
+np = lazy_import('numpy')
+budget = lazy_import('birdplans.budget')
+catalog = lazy_import('birdplans.catalog')
+doppler = lazy_import('birdplans.doppler')
+export = lazy_import('birdplans.export')
+mutual = lazy_import('birdplans.mutual')
+passindex = lazy_import('birdplans.passindex')
+passstore = lazy_import('birdplans.passstore')
+predictor = lazy_import('birdplans.satellitepasspredictor')
+skygrid = lazy_import('birdplans.skygrid')
+timeslice = lazy_import('birdplans.timeslice')
+tracking = lazy_import('birdplans.tracking')
+
 class Severity(Enum):
     '''Severity for returned API messages.
     '''
@@ -142,11 +163,188 @@ class BirdplansUwsgi:
     '''Birdplans uwsgi application
     '''
 
-    def __init__(self):
+    # pass indexes kept per worker
+    PASS_INDEXES = 64
+
+    # seconds between checks for new elements written by update_tles.py
+    ELEMENT_CHECK_PERIOD = 60.0
+
+    def __init__(self, full_catalog=None, workers=None):
         '''Set application defaults.
+
+        :param full_catalog: serve every object in the TLE sources, default BIRDPLANS_FULL_CATALOG
+        :param workers: processes serving requests alongside this one, which share the cpus with
+            it, default the uwsgi worker count
         '''
+        if full_catalog is None:
+            full_catalog = os.environ.get('BIRDPLANS_FULL_CATALOG', '') not in ('', '0')
+        if workers is None:
+            workers = 1 if uwsgi is None else uwsgi.numproc
+
         self.encoding = 'utf-8'
-        self.tle = TleManager()
+        self.tle = TleManager(full_catalog=full_catalog)
+        self.index = None
+        self.batch = None
+        self.sky = None
+        self.pass_indexes = OrderedDict()
+        # cleared while warmup runs; warmup holds its WarmupReport once it has
+        self.ready = True
+        self.warmup = None
+        self.workers = workers
+        self.slice_pool = None
+        self.store = None
+        self.gate = None
+        # new elements are picked up in place, rebuilding only what depends on the changed birds
+        self.elements_checked = default_timer()
+        self.tle.subscribe(self.elements_changed)
+        self.request_log = RequestLog.from_environment()
+        self.flights = SingleFlight.from_environment()
+        self.quantizer = Quantizer.from_environment()
+
+    def catalog_batch(self):
+        '''All loaded birds ready for batched propagation, built on first use.
+        '''
+        if self.batch is None:
+            self.batch = catalog.SatelliteBatch({bird: self.tle[bird] for bird in self.tle.tle})
+        return self.batch
+
+    def slice_executor(self):
+        '''Process pool long /one windows are sliced over, started on first use and sized to this
+        worker's share of the cpus; None when that is only one.
+        '''
+        if self.slice_pool is None:
+            self.slice_pool = timeslice.slice_executor(workers=self.workers)
+        return self.slice_pool
+
+    def pass_store(self):
+        '''The PassStore named by BIRDPLANS_PASS_STORE, opened on first use, or None.
+        '''
+        if self.store is None and os.environ.get('BIRDPLANS_PASS_STORE'):
+            self.store = passstore.PassStore.from_environment()
+        return self.store
+
+    def admission(self):
+        '''The Admission of BIRDPLANS_BUDGET, BIRDPLANS_HEAVY and BIRDPLANS_HEAVY_SLOTS, built on
+        first use.
+        '''
+        if self.gate is None:
+            self.gate = budget.Admission.from_environment()
+        return self.gate
+
+    def refusal(self, error, cost):
+        '''Response turning a request away: 422 for one over the budget, 503 with a Retry-After
+        for an expensive one that found no slot free.
+
+        :param error: OverBudget or Busy
+        :param cost: Cost of the request
+        :return: (status, headers, body)
+        '''
+        headers = [('Content-Type', 'text/json; charset={}'.format(self.encoding))]
+        if isinstance(error, budget.OverBudget):
+            status = '422 Unprocessable Entity'
+        else:
+            status = '503 Service Unavailable'
+            headers.append(('Retry-After', '{:.0f}'.format(max(cost.seconds, 1.0))))
+        return status, headers, bytes(
+            json.dumps({'error': str(error), 'cost': cost._asdict()}), self.encoding
+        )
+
+    def admitted(self, route, cost, start_response, headers, chunks):
+        '''Stream chunks under headers if cost is admitted, holding a slot for as long as it takes
+        if it is expensive, else answer with the refusal.
+
+        :param route: metrics label
+        :param cost: Cost of the request
+        :param headers: response headers
+        :param chunks: iterable of response bytes, not started until admitted
+        '''
+        try:
+            with self.admission().admit(cost, route=route):
+                start_response('200 OK', headers)
+                yield from chunks
+        except (budget.OverBudget, budget.Busy) as error:
+            status, headers, body = self.refusal(error, cost)
+            start_response(status, headers)
+            yield body
+
+    def sky_refresher(self):
+        '''The SkyRefresher keeping the catalog binned by sub-satellite point, built on first use.
+        '''
+        if self.sky is None:
+            self.sky = skygrid.SkyRefresher(self.catalog_batch())
+        return self.sky
+
+    def check_elements(self):
+        '''Reload the elements if update_tles.py has rewritten them, and write the pass store's
+        request counts, at most once every ELEMENT_CHECK_PERIOD seconds.
+        '''
+        if default_timer() - self.elements_checked > self.ELEMENT_CHECK_PERIOD:
+            self.elements_checked = default_timer()
+            self.tle.refresh()
+            if self.store is not None:
+                self.store.flush()
+
+    def elements_changed(self, changes):
+        '''TleManager listener: drop or rebuild what was built from the changed birds' elements.
+        Passes in the pass store are keyed by element fingerprint and need nothing; the sun
+        ephemerides do not depend on any bird.
+
+        :param changes: list of ElementChange
+        '''
+        METRICS.increment('element_changes', len(changes))
+        changed = {_.bird for _ in changes}
+
+        for key in [_ for _ in self.pass_indexes if changed & {bird for bird, _ in _[4]}]:
+            del self.pass_indexes[key]
+
+        if self.batch is not None:
+            self.batch = self.batch.replaced({
+                _.bird: None if _.new is None else self.tle[_.bird] for _ in changes
+            })
+            if self.sky is not None:
+                self.sky.batch = self.batch
+                # rebuilt on the next request, or by the thread if sooner
+                self.sky.grid = None
+
+    def pass_index(self, latlng, window_start, window_stop, minimum_altitude, birds):
+        '''PassIndex over the passes of birds at latlng, computed once per observer, window and
+        element set of each bird and kept for the most recent PASS_INDEXES of them.
+        '''
+        key = (
+            latlng, window_start.isoformat(), window_stop.isoformat(), minimum_altitude
+            , tuple((bird, self.tle.fingerprint(bird)) for bird in sorted(birds))
+        )
+        if key in self.pass_indexes:
+            note_cache('index_hits')
+            self.pass_indexes.move_to_end(key)
+            return self.pass_indexes[key]
+        note_cache('index_misses')
+
+        index = self.pass_indexes[key] = passindex.PassIndex(catalog.find_passes(
+            {bird: self.tle[bird] for bird in birds}
+            , latlng
+            , predictor.TIMESCALE.utc(window_start)
+            , predictor.TIMESCALE.utc(window_stop)
+            , minimum_altitude
+        ), key)
+        while len(self.pass_indexes) > self.PASS_INDEXES:
+            self.pass_indexes.popitem(last=False)
+        return index
+
+    def index_cache_get(self):
+        '''Fetch the cached index page, from the uwsgi cache when running under uwsgi.
+        '''
+        if uwsgi is None:
+            return self.index
+        return uwsgi.cache_get('./static/index.html')
+
+    def index_cache_set(self, index):
+        '''Cache the index page, in the uwsgi cache when running under uwsgi.
+        '''
+        if uwsgi is None:
+            self.index = index
+        else:
+            uwsgi.cache_set('./static/index.html', index)
 
     def get_uwsgi_application(self):
         '''Return something uwsgi can call.
@@ -158,8 +356,13 @@ class BirdplansUwsgi:
         '''Route requests to the appropriate handler_ method.
         '''
 
+        self.check_elements()
         route_to = env['PATH_INFO'].split('/')[1]
-        yield from getattr(self, 'handler_' + route_to, self.default_handler)(env, start_response)
+        handler = getattr(self, 'handler_' + route_to, self.default_handler)
+        if self.request_log is None:
+            yield from handler(env, start_response)
+        else:
+            yield from self.request_log.logged(handler, env, start_response)
 
     def handler_env(self, env, start_response):
         '''Diagnostic; return the uwsgi ENV.
@@ -181,101 +384,657 @@ class BirdplansUwsgi:
         yield bytes(json.dumps(pytz.all_timezones), self.encoding)
 
     def handler_one(self, env, start_response):
-        '''Passes over a single location.
+        '''Passes over a single location; identical requests arriving together, in this worker
+        or in others sharing its flight directory, share one computation.
         '''
+        t0 = default_timer()
+        flight = self.flights.do(
+            flight_key(env['QUERY_STRING'], self.tle.version, self.quantizer)
+            , lambda: self.one_response(env), route='one'
+        )
+        status, headers, body = flight.result
+        if flight.shared is not None:
+            # the sharer's Server-Timing stays, describing the computation it waited on
+            headers = headers + [('Coalesced', flight.shared)]
+            METRICS.observe('request_seconds', default_timer() - t0, route='one')
+
+        start_response(status, headers)
+        yield body
 
+    def one_response(self, env):
+        '''Compute a /one response, unless its estimated cost is over the budget; expensive ones
+        wait for a slot, and with deadline= (seconds) birds not started by then are left out. The
+        observer is moved to the centre of its cell when BIRDPLANS_QUANTIZE asks for it.
+
+        :return: (status, headers, body)
+        '''
         t0 = default_timer()
+        timer = StageTimer()
 
-        keys = parse.parse_qs(env['QUERY_STRING'])
+        with timer.stage('parse'):
+            keys = parse.parse_qs(env['QUERY_STRING'])
 
-        lat = float(keys['lat'][0])
-        lng = float(keys['lng'][0])
-        tz = pytz.timezone(keys['tz'][0])
-        window_start = tz.localize(datetime.strptime(keys['window_start'][0], "%Y-%m-%dT%H:%M"))
-        window_stop = window_start + timedelta(days=5)
-        alt = int(keys.get('alt', [12])[0])
-        birds = keys['bird']
+            location = self.quantizer(float(keys['lat'][0]), float(keys['lng'][0]))
+            tz = pytz.timezone(keys['tz'][0])
+            window_start = tz.localize(
+                datetime.strptime(keys['window_start'][0], "%Y-%m-%dT%H:%M")
+            )
+            window = timedelta(days=float(keys.get('days', [5])[0]))
+            if not timedelta(0) < window <= timeslice.MAXIMUM_WINDOW:
+                raise ValueError('days must be more than 0 and at most {}'.format(
+                    timeslice.MAXIMUM_WINDOW.days
+                ))
+            window_stop = window_start + window
+            alt = int(keys.get('alt', [12])[0])
+            birds = keys['bird']
+            accuracy = accuracy_profile(keys.get('accuracy', [None])[0])
+            deadline = None if 'deadline' not in keys else \
+                budget.Deadline(float(keys['deadline'][0]))
+
+        with timer.stage('budget'):
+            cost = budget.estimate_cost(
+                [self.tle[bird] for bird in birds], window_start, window_stop, accuracy
+            )
 
-        start_response('200 OK', [('Content-Type', 'text/json; charset={}'.format(self.encoding))])
+        try:
+            with self.admission().admit(cost, route='one'):
+                results, skipped = self.one_results(
+                    birds, location, tz, window_start, window_stop, alt, accuracy, timer
+                    , deadline
+                )
+        except (budget.OverBudget, budget.Busy) as error:
+            return self.refusal(error, cost)
+
+        headers = [('Content-Type', 'text/json; charset={}'.format(self.encoding))]
+        partial = None
+        if skipped:
+            # under uvicorn a partial response is not kept in the result cache
+            headers.append(('Partial', 'deadline'))
+            partial = {
+                'notice': 'deadline of {:g}s reached after {} of {} birds'.format(
+                    deadline.seconds, len(birds) - len(skipped), len(birds)
+                ),
+                'skipped': skipped
+            }
+
+        with timer.stage('tz'):
+            tzinfo = {
+                'name': str(tz),
+                'changes': tzhelper.make_tzinfo(tz, window_start, window_stop)
+            }
+
+        with timer.stage('serialize'):
+            body = bytes(
+                json.dumps(
+                    {
+                        'tz': tzinfo,
+                        'accuracy': accuracy.name,
+                        'location': self.location_json(location),
+                        'time': default_timer() - t0,
+                        'estimate': cost.seconds,
+                        'partial': partial,
+                        'data': results
+                    }
+                )
+                , self.encoding
+            )
+
+        METRICS.observe_stages(timer, route='one')
+        METRICS.observe('request_seconds', default_timer() - t0, route='one')
+
+        return '200 OK', headers + [('Server-Timing', timer.server_timing())], body
+
+    def one_results(
+            self, birds, location, tz, window_start, window_stop, alt, accuracy, timer
+            , deadline=None):
+        '''Passes of each bird for a /one response.
+
+        :param location: effective Location of the observer
+        :param deadline: Deadline after which the birds not yet started are skipped
+        :return: (list of results, one per bird predicted, list of the birds skipped)
+        '''
+        latlng = (location.lat, location.lng)
+        lat, lng = latlng
+        store = self.pass_store()
+        if store is not None:
+            with timer.stage('store'):
+                store.record(latlng, str(tz), birds, accuracy.name)
 
         results = []
 
+        # every pass in the window is returned, so there is no overlap step for a PassIndex to
+        # speed up, and the indexes hold the catalog's passes, not ones refined under accuracy
         # TODO separate function for this
         # JSON optimizations:
         # reduce timestamp transmission by offsetting from the smallest-observed value
         # truncate altaz floats to two decimal places
         # send altaz curve parameters instead of points
+        for i, bird in enumerate(birds):
+            if deadline is not None and deadline.expired():
+                METRICS.increment('deadline_skips', len(birds) - i, route='one')
+                return results, birds[i:]
+
+            with timer.stage('tle'):
+                satellite = self.tle[bird]
+                age = timeslice.element_age(satellite, window_start, window_stop)
+
+            sliced = age.stop - window_start > timeslice.SLICE_LENGTH
+            if store is not None or sliced:
+                # with a store the days are read and written here; only long windows are worth
+                # sending to the pool
+                window_pass = timeslice.long_horizon_passes(
+                    satellite
+                    , self.tle.lines(bird)
+                    , (lat, lng)
+                    , window_start
+                    , age.stop
+                    , alt
+                    , timer
+                    , accuracy=accuracy
+                    , executor=self.slice_executor() if sliced else None
+                    , store=store
+                    , key=passstore.StoreKey(
+                        bird, self.tle.fingerprint(bird), lat, lng, None, accuracy.name
+                    )
+                )
+            else:
+                window_pass = predictor.pass_estimation_wrapper(
+                    satellite
+                    , (lat, lng)
+                    , window_start
+                    , age.stop
+                    , alt
+                    , timer
+                    , accuracy=accuracy
+                )
+
+            with timer.stage('track'):
+                results.append({
+                    'lat': lat,
+                    'lng': lng,
+                    'bird': bird,
+                    'epoch': int(age.epoch.timestamp() * 1000.0),
+                    'warning': age.warning,
+                    # seconds AOS and LOS may be off for an observer anywhere in the cell
+                    'quantization_error': timing_error(
+                        predictor.orbit_class(satellite), location.radius
+                    ),
+                    'passes': self.one_passes(
+                        window_pass.diff, window_pass.passes, window_pass.lighting
+                    )
+                })
+
+        return results, []
+
+    def location_json(self, location):
+        '''JSON ready effective location of an observer: the coordinates passes were predicted
+        for, their locator, the resolution they were quantized to and the radius of its cells, km.
+
+        :param location: Location
+        '''
+        return dict(location._asdict(), resolution=self.quantizer.resolution)
+
+    @staticmethod
+    def one_passes(diff, passes, lighting):
+        '''JSON ready passes for handler_one: AOS, TCA and LOS with their azimuths, then the track
+        and lighting at each of the lighting times, every time in epoch milliseconds. Every pass
+        is evaluated in one batch.
+
+        :param diff: Skyfield satellite - observer vector function
+        :param passes: list of Pass
+        :param lighting: list of PassLighting, one per pass
+        '''
+        if not passes:
+            return []
+
+        events = np.array([[_.tai for _ in pass_] for pass_ in passes])
+        track = np.array([_.t for _ in lighting])
+        tai = np.concatenate([events.ravel(), track.ravel()])
+        alt, az, _ = diff.at(predictor.TIMESCALE.tai_jd(tai)).altaz()
+        epoch_ms = predictor.tai_to_epoch_ms(tai)
+
+        split = events.size
+        event_ms, track_ms = epoch_ms[:split].reshape(events.shape), epoch_ms[split:]
+        event_az, track_az = az.degrees[:split].reshape(events.shape), az.degrees[split:]
+        track_alt = alt.degrees[split:]
+        points = track.shape[1]
+
+        return [
+            {
+                **{
+                    k: {'t': t, 'az': event_az[i, j]}
+                    for j, (k, t) in enumerate(zip(pass_._fields, event_ms[i].tolist()))
+                },
+                't': track_ms[i * points:(i + 1) * points].tolist(),
+                'alt': track_alt[i * points:(i + 1) * points].tolist(),
+                'az': track_az[i * points:(i + 1) * points].tolist(),
+                'sunlit': lit.sunlit.tolist(),
+                'dark': lit.dark.tolist()
+            }
+            for i, (pass_, lit) in enumerate(zip(passes, lighting))
+        ]
+
+    def handler_overhead(self, env, start_response):
+        '''Every loaded bird above the horizon at a location, now or at t (epoch milliseconds).
+        '''
+        t0 = default_timer()
+
+        keys = parse.parse_qs(env['QUERY_STRING'])
+        lat = float(keys['lat'][0])
+        lng = float(keys['lng'][0])
+        alt = float(keys.get('alt', [0])[0])
+        when = predictor.TIMESCALE.now() if 't' not in keys else predictor.TIMESCALE.utc(
+            datetime.fromtimestamp(int(keys['t'][0]) / 1000.0, timezone.utc)
+        )
+
+        up = catalog.overhead(self.catalog_batch(), (lat, lng), when, alt)
+
+        start_response('200 OK', [('Content-Type', 'text/json; charset={}'.format(self.encoding))])
+        yield bytes(json.dumps({
+            't': int(predictor.tai_to_epoch_ms(when.tai)),
+            'time': default_timer() - t0,
+            'data': [
+                {'bird': _.bird, 'alt': _.alt, 'az': _.az, 'distance': _.distance} for _ in up
+            ]
+        }), self.encoding)
+
+    def handler_now(self, env, start_response):
+        '''Every loaded bird above the horizon at a location right now, checking only the birds
+        the background sky grid puts near the observer.
+        '''
+        t0 = default_timer()
+
+        keys = parse.parse_qs(env['QUERY_STRING'])
+        lat = float(keys['lat'][0])
+        lng = float(keys['lng'][0])
+        alt = float(keys.get('alt', [0])[0])
+
+        grid = self.sky_refresher().current()
+        now = predictor.TIMESCALE.now().tai
+        up, candidates = grid.overhead((lat, lng), now, alt)
+
+        start_response('200 OK', [('Content-Type', 'text/json; charset={}'.format(self.encoding))])
+        yield bytes(json.dumps({
+            't': int(predictor.tai_to_epoch_ms(now)),
+            'age': (now - grid.tai) * 86400.0,
+            'candidates': candidates,
+            'time': default_timer() - t0,
+            'data': [
+                {'bird': _.bird, 'alt': _.alt, 'az': _.az, 'distance': _.distance} for _ in up
+            ]
+        }), self.encoding)
+
+    def catalog_query(self, env):
+        '''Parse the query shared by the catalog and table routes and look up its PassIndex.
+
+        :return: (tz, window_start, window_stop, when as TAI or None, PassIndex)
+        '''
+        keys = parse.parse_qs(env['QUERY_STRING'])
+        location = self.quantizer(float(keys['lat'][0]), float(keys['lng'][0]))
+        tz = pytz.timezone(keys['tz'][0])
+        window_start = tz.localize(datetime.strptime(keys['window_start'][0], "%Y-%m-%dT%H:%M"))
+        window_stop = window_start + timedelta(days=float(keys.get('days', [1])[0]))
+        alt = float(keys.get('alt', [12])[0])
+        birds = keys.get('bird', self.tle.tle.keys())
+        when = None if 't' not in keys else predictor.TIMESCALE.utc(
+            datetime.fromtimestamp(int(keys['t'][0]) / 1000.0, timezone.utc)
+        ).tai
+
+        return (
+            tz, window_start, window_stop, when
+            , self.pass_index((location.lat, location.lng), window_start, window_stop, alt, birds)
+        )
+
+    @staticmethod
+    def catalog_rows(passes):
+        '''JSON-ready rows of CatalogPasses, times in epoch milliseconds.
+        '''
+        aos, tca, los = (
+            predictor.tai_to_epoch_ms(_) for _ in (passes.aos, passes.tca, passes.los)
+        )
+        return [
+            {'bird': bird, 'AOS': int(a), 'TCA': int(t), 'LOS': int(l), 'alt': float(peak)}
+            for bird, a, t, l, peak in zip(passes.bird, aos, tca, los, passes.alt)
+        ]
+
+    def handler_catalog(self, env, start_response):
+        '''Passes of every loaded bird, or of the bird parameters, over a single location. With t
+        (epoch milliseconds), also the passes in progress and the next pass at t.
+        '''
+        t0 = default_timer()
+
+        tz, window_start, window_stop, when, index = self.catalog_query(env)
+
+        result = {
+            'tz': {
+                'name': str(tz),
+                'changes': tzhelper.make_tzinfo(tz, window_start, window_stop)
+            },
+            'data': self.catalog_rows(index.passes)
+        }
+        if when is not None:
+            following = index.next_pass(when)
+            result['up'] = self.catalog_rows(index.up(when))
+            result['next'] = None if following is None else \
+                self.catalog_rows(index.select([following]))[0]
+        result['time'] = default_timer() - t0
+
+        start_response('200 OK', [('Content-Type', 'text/json; charset={}'.format(self.encoding))])
+        yield bytes(json.dumps(result), self.encoding)
+
+    def handler_table(self, env, start_response):
+        '''The catalog query as an HTML table, passes in progress at t (epoch milliseconds,
+        default the window start) first.
+        '''
+        tz, window_start, _, when, index = self.catalog_query(env)
+        when = predictor.TIMESCALE.utc(window_start).tai if when is None else when
+
+        def local(tai, strftime):
+            '''Format a TAI Julian date in the query timezone.'''
+            return predictor.TIMESCALE.tai_jd(tai).astimezone(tz).strftime(strftime)
+
+        start_response('200 OK', [('Content-Type', 'text/html; charset={}'.format(self.encoding))])
+        yield bytes(
+            '<table border="1"><tr><th>Bird<th>Max El<th>Duration (mm:ss)<th>AOS<th>TCA<th>LOS'
+            , self.encoding
+        )
+        up = index.up(when)
+        later = index.select(index.overlapping(when, np.inf))
+        for passes in (up, catalog.CatalogPasses(*(_[later.aos > when] for _ in later))):
+            yield bytes(''.join(
+                '<tr>' + ''.join('<td>{}'.format(html.escape(_)) for _ in [
+                    bird
+                    , '{:.0f}\u00b0'.format(peak)
+                    , time_delta_minutes_seconds(timedelta(days=los - aos))
+                    , local(aos, '%Y-%m-%d %H:%M %Z')
+                    , local(tca, '%H:%M')
+                    , local(los, '%H:%M')
+                ])
+                for bird, aos, tca, los, peak in zip(*passes)
+            ), self.encoding)
+        yield bytes('</table>', self.encoding)
+
+    def next_pass(self, bird, latlng, when, minimum_altitude=0, accuracy=None):
+        '''The pass of bird in progress at, or next after, when; None if there is none in a day.
+
+        :param bird: bird name
+        :param latlng: observer (latitude, longitude) degrees
+        :param when: tz-aware Python datetime
+        :param minimum_altitude: minimum peak pass altitude
+        :param accuracy: Accuracy or profile name, default DEFAULT_PROFILE
+        '''
+        # a pass already in progress at when started before it
+        window_pass = predictor.pass_estimation_wrapper(
+            self.tle[bird]
+            , latlng
+            , when - timedelta(minutes=30)
+            , when + timedelta(days=1)
+            , minimum_altitude
+            , lighting=False
+            , accuracy=accuracy
+        )
+        now = predictor.TIMESCALE.utc(when).tai
+        return next((_ for _ in window_pass.passes if _.LOS.tai > now), None)
+
+    def handler_doppler(self, env, start_response):
+        '''Doppler corrected uplink and downlink of the next pass of each bird after t (epoch
+        milliseconds, default now), streamed as JSON lines sampled rate times per second.
+        '''
+        keys = parse.parse_qs(env['QUERY_STRING'])
+        lat = float(keys['lat'][0])
+        lng = float(keys['lng'][0])
+        alt = float(keys.get('alt', [0])[0])
+        hz = min(max(float(keys.get('rate', [1])[0]), 0.01), 10.0)
+        when = datetime.now(timezone.utc) if 't' not in keys else \
+            datetime.fromtimestamp(int(keys['t'][0]) / 1000.0, timezone.utc)
+        birds = keys['bird']
+        accuracy = accuracy_profile(keys.get('accuracy', [None])[0])
+
+        start_response('200 OK', [
+            ('Content-Type', 'application/x-ndjson; charset={}'.format(self.encoding))
+        ])
+
         for bird in birds:
-            window_pass = pass_estimation_wrapper(
-                self.tle[bird]
-                , (lat, lng)
-                , window_start
-                , window_stop
-                , alt
+            # tx and rx parameters, MHz, override the schedule
+            frequencies = (
+                doppler.schedule_frequencies(self.tle.tlesrcs.get('birds', {}).get(bird, {}))
+                or doppler.Frequencies(None, None, None)
+            )._replace(**{_: float(keys[_][0]) for _ in ('tx', 'rx') if _ in keys})
+
+            pass_ = self.next_pass(bird, (lat, lng), when, alt, accuracy)
+
+            header = dict(frequencies._asdict(), bird=bird, rate=hz, AOS=None, TCA=None, LOS=None)
+            if pass_ is not None:
+                header.update(zip(
+                    pass_._fields, predictor.tai_to_epoch_ms([_.tai for _ in pass_]).tolist()
+                ))
+            yield bytes(json.dumps(header) + '\n', self.encoding)
+            if pass_ is None:
+                continue
+
+            for chunk in doppler.doppler_curve(
+                    predictor.TIMESCALE, self.tle[bird], (lat, lng), frequencies
+                    , max(pass_.AOS.tai, predictor.TIMESCALE.utc(when).tai), pass_.LOS.tai, hz):
+                none = [None] * len(chunk.tai)
+                yield bytes(''.join(
+                    json.dumps({'t': t, 'range_rate': rate, 'uplink': up, 'downlink': down}) + '\n'
+                    for t, rate, up, down in zip(
+                        predictor.tai_to_epoch_ms(chunk.tai).tolist()
+                        , chunk.range_rate.tolist()
+                        , none if chunk.uplink is None else chunk.uplink.tolist()
+                        , none if chunk.downlink is None else chunk.downlink.tolist()
+                    )
+                ), self.encoding)
+
+    def handler_track(self, env, start_response):
+        '''Azimuth/elevation of the next pass of a bird after t (epoch milliseconds, default now)
+        for rotator control, streamed as JSON lines sampled rate times per second.
+        '''
+        keys = parse.parse_qs(env['QUERY_STRING'])
+        lat = float(keys['lat'][0])
+        lng = float(keys['lng'][0])
+        alt = float(keys.get('alt', [0])[0])
+        hz = min(max(float(keys.get('rate', [1])[0]), 0.01), 10.0)
+        when = datetime.now(timezone.utc) if 't' not in keys else \
+            datetime.fromtimestamp(int(keys['t'][0]) / 1000.0, timezone.utc)
+        bird = keys['bird'][0]
+        accuracy = accuracy_profile(keys.get('accuracy', [None])[0])
+
+        start_response('200 OK', [
+            ('Content-Type', 'application/x-ndjson; charset={}'.format(self.encoding))
+        ])
+
+        pass_ = self.next_pass(bird, (lat, lng), when, alt, accuracy)
+        header = dict(bird=bird, rate=hz, AOS=None, TCA=None, LOS=None, error=None)
+        if pass_ is None:
+            yield bytes(json.dumps(header) + '\n', self.encoding)
+            return
+
+        satellite = self.tle[bird]
+        start = max(pass_.AOS.tai, predictor.TIMESCALE.utc(when).tai)
+        header.update(zip(
+            pass_._fields, predictor.tai_to_epoch_ms([_.tai for _ in pass_]).tolist()
+        ))
+        # degrees between the interpolated and directly propagated direction, worst case
+        header['error'] = tracking.error_bound(
+            satellite, predictor.TIMESCALE, (lat, lng), start, pass_.LOS.tai
+        )
+        yield bytes(json.dumps(header) + '\n', self.encoding)
+
+        for chunk in tracking.track(
+                satellite, predictor.TIMESCALE, (lat, lng), start, pass_.LOS.tai, hz):
+            yield bytes(''.join(
+                '{{"t": {}, "az": {:.3f}, "el": {:.3f}}}\n'.format(t, az, el)
+                for t, az, el in zip(
+                    predictor.tai_to_epoch_ms(chunk.tai).tolist()
+                    , chunk.az.tolist()
+                    , chunk.alt.tolist()
+                )
+            ), self.encoding)
+
+    def handler_mutual(self, env, start_response):
+        '''Windows in which birds are at least alt above the horizon for every observer (one lat
+        and lng parameter pair each), or with pairs=1 for every pair of observers.
+        '''
+        t0 = default_timer()
+
+        keys = parse.parse_qs(env['QUERY_STRING'])
+        lats, lngs = keys.get('lat', []), keys.get('lng', [])
+        error = None
+        if len(lats) != len(lngs):
+            error = 'lat and lng must come in pairs, got {} lat and {} lng'.format(
+                len(lats), len(lngs)
             )
+        elif len(lats) < 2:
+            error = 'at least two observers required, got {}'.format(len(lats))
+        if error is not None:
+            start_response('400 Bad Request', [
+                ('Content-Type', 'text/json; charset={}'.format(self.encoding))
+            ])
+            yield bytes(json.dumps({'error': error}), self.encoding)
+            return
 
-            results.append({
-                'lat': lat,
-                'lng': lng,
-                'bird': bird,
-                'passes': [
-                    {
-                        **{
-                            k: {
-                                't': int(getattr(pass_, k).utc_datetime().timestamp() * 1000),
-                                'az': window_pass.diff.at(getattr(pass_, k)).altaz()[1].degrees
-                            }
-                            for k in pass_._fields
-                        },
-                        **dict(
-                            zip(
-                                ('t', 'alt', 'az'),
-                                list(zip(*list(map(
-                                    lambda x: [ # time
-                                        int(
-                                            window_pass.ts.tai_jd(x)
-                                            .utc_datetime()
-                                            .timestamp() * 1000
-                                        )
-                                    ] + [ # alt, alz
-                                        _.degrees
-                                        for _ in
-                                        window_pass.diff.at(
-                                            window_pass.ts.tai_jd(x)
-                                            ).altaz()[0:2]
-                                    ]
-                                    , np.linspace(pass_.AOS.tai, pass_.LOS.tai, 13)
-                                ))))
-                            )
-                        )
-                    }
-                    for pass_ in window_pass.passes
-                ]
-            })
+        observers = [(float(lat), float(lng)) for lat, lng in zip(lats, lngs)]
+        tz = pytz.timezone(keys['tz'][0])
+        window_start = tz.localize(datetime.strptime(keys['window_start'][0], "%Y-%m-%dT%H:%M"))
+        window_stop = window_start + timedelta(days=float(keys.get('days', [1])[0]))
+        alt = float(keys.get('alt', [0])[0])
+        birds = keys.get('bird', self.tle.tle.keys())
+        pairs = keys.get('pairs', ['0'])[0] not in ('', '0')
+
+        windows = mutual.mutual_windows(
+            {bird: self.tle[bird] for bird in birds}
+            , observers
+            , predictor.TIMESCALE.utc(window_start)
+            , predictor.TIMESCALE.utc(window_stop)
+            , alt
+            , pairs=pairs
+        )
+        start = predictor.tai_to_epoch_ms(windows.start)
+        end = predictor.tai_to_epoch_ms(windows.end)
 
-        yield bytes(
-            json.dumps(
+        start_response('200 OK', [('Content-Type', 'text/json; charset={}'.format(self.encoding))])
+        yield bytes(json.dumps({
+            'tz': {
+                'name': str(tz),
+                'changes': tzhelper.make_tzinfo(tz, window_start, window_stop)
+            },
+            'time': default_timer() - t0,
+            'observers': observers,
+            'data': [
                 {
-                    'tz': {
-                        'name': str(tz),
-                        'changes': tzhelper.make_tzinfo(tz, window_start, window_stop)
-                    },
-                    'time': default_timer() - t0,
-                    'data': results
+                    'bird': bird, 'start': int(s), 'end': int(e), 'observers': list(group)
+                    , 'start_alt': s_alt.tolist(), 'end_alt': e_alt.tolist()
                 }
+                for bird, s, e, s_alt, e_alt, group in zip(
+                    windows.bird, start, end, windows.start_alt, windows.end_alt
+                    , windows.observers
+                )
+            ]
+        }), self.encoding)
+
+    def export_query(self, env):
+        '''Parse the query shared by the export routes: any number of observers, as grid or as
+        lat and lng pairs, and of birds, default every loaded bird.
+
+        :return: (tz, list of Observer, birds, window_start, window_stop, alt, Accuracy)
+        '''
+        keys = parse.parse_qs(env['QUERY_STRING'])
+        observers = [
+            export.Observer(grid, *mh.to_location(grid)) for grid in keys.get('grid', [])
+        ] + [
+            export.Observer(mh.to_maiden(_.lat, _.lng), _.lat, _.lng)
+            for _ in (
+                self.quantizer(float(lat), float(lng))
+                for lat, lng in zip(keys.get('lat', []), keys.get('lng', []))
             )
-            , self.encoding
+        ]
+        if not observers:
+            raise ValueError('grid or lat and lng required')
+        tz = pytz.timezone(keys['tz'][0])
+        window_start = tz.localize(datetime.strptime(keys['window_start'][0], "%Y-%m-%dT%H:%M"))
+        window = timedelta(days=float(keys.get('days', [5])[0]))
+        if not timedelta(0) < window <= timeslice.MAXIMUM_WINDOW:
+            raise ValueError('days must be more than 0 and at most {}'.format(
+                timeslice.MAXIMUM_WINDOW.days
+            ))
+        alt = float(keys.get('alt', [12])[0])
+        birds = keys.get('bird', list(self.tle.tle.keys()))
+        accuracy = accuracy_profile(keys.get('accuracy', [None])[0])
+        return tz, observers, birds, window_start, window_start + window, alt, accuracy
+
+    def export_cost(self, tz, observers, birds, window_start, window_stop, alt, accuracy):
+        '''Estimated Cost of an export, from export_query's results.
+        '''
+        # pylint: disable=unused-argument
+        # exports carry no track or lighting
+        return budget.estimate_cost(
+            [self.tle[bird] for bird in birds], window_start, window_stop, accuracy
+            , len(observers), track_points=0
+        )
+
+    def export_chunks(self, route, tz, observers, birds, window_start, window_stop, alt, accuracy):
+        '''export_passes for an export route, timed once the last chunk is out.
+        '''
+        t0 = default_timer()
+        yield from export.export_passes(
+            self.tle, observers, birds, window_start, window_stop, alt, accuracy
+            , self.pass_store()
         )
+        METRICS.observe('request_seconds', default_timer() - t0, route=route)
+
+    def handler_csv(self, env, start_response):
+        '''Passes over any number of locations as CSV, streamed a day of passes at a time.
+        '''
+        query = self.export_query(env)
+        yield from self.admitted('csv', self.export_cost(*query), start_response, [
+            ('Content-Type', 'text/csv; charset={}'.format(self.encoding))
+            , ('Content-Disposition', 'attachment; filename="birdplans.csv"')
+        ], (
+            bytes(text, self.encoding)
+            for text in export.csv_export(self.export_chunks('csv', *query), query[0])
+        ))
+
+    def handler_ics(self, env, start_response):
+        '''Passes over any number of locations as iCalendar, one event per pass, streamed a day of
+        passes at a time.
+        '''
+        query = self.export_query(env)
+        yield from self.admitted('ics', self.export_cost(*query), start_response, [
+            ('Content-Type', 'text/calendar; charset={}'.format(self.encoding))
+            , ('Content-Disposition', 'attachment; filename="birdplans.ics"')
+        ], (
+            bytes(text, self.encoding)
+            for text in export.ics_export(self.export_chunks('ics', *query))
+        ))
+
+    def handler_ready(self, env, start_response):
+        '''Readiness probe: 200 once this worker has warmed up, or if it never needed to, else
+        503; the body reports the warm-up.
+        '''
+        report = None if self.warmup is None else self.warmup._asdict()
+        start_response('200 OK' if self.ready else '503 Service Unavailable', [
+            ('Content-Type', 'text/json; charset={}'.format(self.encoding))
+        ])
+        yield bytes(json.dumps({'ready': self.ready, 'warmup': report}), self.encoding)
+
+    def handler_metrics(self, env, start_response):
+        '''This worker's stage timing histograms in the prometheus text format.
+        '''
+        start_response('200 OK', [
+            ('Content-Type', 'text/plain; version=0.0.4; charset={}'.format(self.encoding))
+        ])
+        yield bytes(METRICS.render(worker=worker_label()), self.encoding)
 
     def default_handler(self, env, start_response):
         '''Default handler, returns the main application.
         '''
 
-        index = uwsgi.cache_get('./static/index.html')
+        index = self.index_cache_get()
         if index is None:
             with open('static/index.html', 'r') as fin:
                 index = bytes(fin.read(), self.encoding)
-                uwsgi.cache_set('./static/index.html', index)
+                self.index_cache_set(index)
                 print('set cache for index')
         else:
             print('using cached copy')
@@ -471,6 +1230,31 @@ def make_pass_tuples(results):
             for _pass in passquery.passes:
                 yield (bird, passquery, *_pass)
 
+def flight_key(query_string, version, quantizer=None):
+    '''Normalized key of a request for request coalescing: the same parameters in any order,
+    numbers however written, observers in the same cell, computed from the same elements.
+
+    :param query_string: the request's query string
+    :param version: TleManager version
+    :param quantizer: Quantizer the request's observers are moved by
+    '''
+    keys = parse.parse_qs(query_string)
+    for name in ('lat', 'lng', 'days'):
+        try:
+            keys[name] = [repr(float(_)) for _ in keys[name]]
+        except (KeyError, ValueError):
+            pass
+    if quantizer is not None and 'lat' in keys and 'lng' in keys:
+        try:
+            locations = [
+                quantizer(float(lat), float(lng)) for lat, lng in zip(keys['lat'], keys['lng'])
+            ]
+            keys['lat'] = [repr(_.lat) for _ in locations]
+            keys['lng'] = [repr(_.lng) for _ in locations]
+        except ValueError:
+            pass
+    return json.dumps([version, sorted(keys.items())])
+
 def time_delta_minutes_seconds(timedelta):
     '''format a timedelta since python forgot
     '''
@@ -597,8 +1381,24 @@ def simple_page(env, start_response, encoding):
 
 try:
     import uwsgi
+except ImportError:
+    # must be testing or something, or running under the asgi wrapper
+    uwsgi = None
+
+if uwsgi is not None:
     endpoint_server = BirdplansUwsgi()
+    if preloading(uwsgi):
+        # we are being loaded in the master ahead of the fork: build the shared state now and
+        # freeze it so the workers share it copy-on-write
+        print('preloaded in {:.2f}s'.format(
+            preload(endpoint_server, catalog=endpoint_server.tle.full_catalog)
+        ))
+    if warmup_enabled():
+        # in the master every worker forks warm; with lazy-apps each worker warms itself before
+        # uwsgi hands it a request
+        print('warmed up in {:.2f}s: {} birds, {} passes, {} errors'.format(
+            *warmup(endpoint_server)
+        ))
+    if preloading(uwsgi):
+        print('froze {} objects'.format(freeze()))
     application = endpoint_server.get_uwsgi_application()
-except ImportError:
-    # must be testing or something
-    pass
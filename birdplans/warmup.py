@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+'''
+warmup.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+warm a worker up before it takes requests: load the deferred imports, prime the timescale, run a
+short prediction for every configured bird and build the timezone tables, so the first request
+after a reload costs what any other does
+
+    BIRDPLANS_WARMUP=0                  skip the warm-up
+    BIRDPLANS_WARMUP_BIRDS=AO-91,SO-50  birds to predict, default every configured bird
+'''
+
+import os
+
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from timeit import default_timer
+
+import pytz
+
+from birdplans.instrumentation import METRICS
+from birdplans.lazy import lazy_import, load_all
+from birdplans import tzhelper
+
+catalog = lazy_import('birdplans.catalog')
+predictor = lazy_import('birdplans.satellitepasspredictor')
+
+# a window long enough to hold a pass of most LEO birds, short enough to keep the warm-up brief
+WARMUP_WINDOW = timedelta(hours=3)
+
+# observer the warm-up predicts for, EM15
+WARMUP_LOCATION = (35.0, -98.0)
+WARMUP_TZ = 'America/Chicago'
+
+WarmupReport = namedtuple('WarmupReport', ['seconds', 'birds', 'passes', 'errors'])
+
+def warmup_enabled():
+    '''Whether BIRDPLANS_WARMUP asks for a warm-up, the default.'''
+    return os.environ.get('BIRDPLANS_WARMUP', '1') != '0'
+
+def warmup_birds(app):
+    '''Birds to warm up: BIRDPLANS_WARMUP_BIRDS, or every configured bird with loaded elements.
+
+    :param app: BirdplansUwsgi instance
+    '''
+    names = os.environ.get('BIRDPLANS_WARMUP_BIRDS', '')
+    birds = names.split(',') if names else list(app.tle.tlesrcs.get('birds', {}))
+    return [_ for _ in birds if _ in app.tle.tle]
+
+def warmup(app, birds=None, now=None):
+    '''Run the code paths of a typical request once, marking the app ready when done.
+
+    :param app: BirdplansUwsgi instance
+    :param birds: birds to predict, default warmup_birds(app)
+    :param now: tz-aware Python datetime to predict from, default now
+    :return: WarmupReport
+    '''
+    t0 = default_timer()
+    app.ready = False
+    birds = warmup_birds(app) if birds is None else birds
+    now = datetime.now(timezone.utc) if now is None else now
+
+    load_all()
+    predictor.TIMESCALE.utc(now)
+
+    passes = errors = 0
+    for bird in birds:
+        try:
+            passes += len(predictor.pass_estimation_wrapper(
+                app.tle[bird], WARMUP_LOCATION, now, now + WARMUP_WINDOW
+            ).passes)
+        except (ValueError, ZeroDivisionError):
+            # elements too stale to propagate or a pass the refinement cannot bracket; a worker
+            # that cannot warm one bird can still serve the rest
+            errors += 1
+
+    if app.tle.full_catalog:
+        catalog.overhead(app.catalog_batch(), WARMUP_LOCATION, predictor.TIMESCALE.utc(now))
+
+    zone = pytz.timezone(WARMUP_TZ)
+    tzhelper.make_tzinfo(zone, now.astimezone(zone), (now + timedelta(days=5)).astimezone(zone))
+
+    report = WarmupReport(default_timer() - t0, len(birds), passes, errors)
+    METRICS.observe('warmup_seconds', report.seconds)
+    app.warmup = report
+    app.ready = True
+    return report
@@ -0,0 +1,9 @@
+#!/bin/bash
+
+# one event loop process; pass predictions run in a pool of BIRDPLANS_PROCESSES workers
+export BIRDPLANS_PROCESSES=${BIRDPLANS_PROCESSES:-8}
+export BIRDPLANS_PASS_STORE=${BIRDPLANS_PASS_STORE:-passes.sqlite}
+export BIRDPLANS_REQUEST_LOG=${BIRDPLANS_REQUEST_LOG-request_log.jsonl}
+export BIRDPLANS_FLIGHT_DIR=${BIRDPLANS_FLIGHT_DIR-flights}
+export BIRDPLANS_QUANTIZE=${BIRDPLANS_QUANTIZE-grid8}
+uvicorn birdplans.asgi:application --port 9091 --lifespan on --no-access-log
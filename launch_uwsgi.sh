@@ -2,5 +2,17 @@
 
 tip=`git rev-parse HEAD 2>/dev/null || echo none`
 diff=`git diff --quiet && echo 0 || echo 1`
-uwsgi --http :9090 --wsgi-file birdplans/uwsgi.py --master --processes 8 --safe-pidfile ./pidfile.txt --check-static static --add-header "Tip: ${tip}.${diff}" --add-header 'Cache-Control: public, max-age=315360000' --load-file-in-cache ./static/index.html
+
+# computed passes kept across reloads; refresh_loop.sh fills it for the popular observers
+export BIRDPLANS_PASS_STORE=${BIRDPLANS_PASS_STORE:-passes.sqlite}
+# one JSON line per request, for python -m benchmarks.replay; empty to turn it off
+export BIRDPLANS_REQUEST_LOG=${BIRDPLANS_REQUEST_LOG-request_log.jsonl}
+# identical requests in flight across the workers wait on one computation
+export BIRDPLANS_FLIGHT_DIR=${BIRDPLANS_FLIGHT_DIR-flights}
+# every worker starts its own pool for long windows, cpus / --processes by default, so the 8 workers
+# and their pools together stay within the cores; raising it oversubscribes them
+# export BIRDPLANS_SLICE_PROCESSES=1
+# observers share the answer for the centre of their 8 character locator
+export BIRDPLANS_QUANTIZE=${BIRDPLANS_QUANTIZE-grid8}
+uwsgi --http :9090 --wsgi-file birdplans/uwsgi.py --master --processes 8 --enable-threads --safe-pidfile ./pidfile.txt --check-static static --add-header "Tip: ${tip}.${diff}" --add-header 'Cache-Control: public, max-age=315360000' --load-file-in-cache ./static/index.html
 
@@ -4,8 +4,10 @@ while true; do
 	date
 	echo updating ...
 	python update_tles.py
-	echo updated, reloading ...
-	kill -HUP `cat pidfile.txt`
+	# workers pick the new elements up within a minute, without a reload, rebuilding only what
+	# depends on the birds that changed; kill -HUP `cat pidfile.txt` still restarts them all
+	echo updated, filling the pass store ...
+	python -m birdplans.prewarm
 	echo sleeping until next update ...
 	sleep 21600
 done
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+'''
+test_accuracy.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+accuracy profile unit tests
+'''
+
+import datetime
+import unittest
+
+import numpy as np
+import pytz
+
+from skyfield.api import Topos
+
+from birdplans.accuracy import DEFAULT_PROFILE, PROFILES, accuracy_profile
+from birdplans.satellitepasspredictor import (
+    TIMESCALE, altitude_function, pass_estimation_wrapper
+)
+from birdplans.tlemanager import TestTleManager
+
+class TestAccuracy(unittest.TestCase):
+    '''exercise the accuracy profiles'''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tle = TestTleManager()
+        window_start = datetime.datetime(2018, 11, 24, tzinfo=pytz.utc)
+        cls.results = {
+            name: pass_estimation_wrapper(
+                cls.tle['AO-91'], (35.0, -98.0), window_start
+                , window_start + datetime.timedelta(days=5), 10.0, lighting=False, accuracy=name
+            )
+            for name in PROFILES
+        }
+
+    def test_lookup(self):
+        '''names, profiles and None all resolve; unknown names do not'''
+        self.assertEqual(DEFAULT_PROFILE, accuracy_profile().name)
+        self.assertIs(PROFILES['planning'], accuracy_profile('planning'))
+        self.assertIs(PROFILES['precise'], accuracy_profile(PROFILES['precise']))
+        with self.assertRaises(ValueError):
+            accuracy_profile('exact')
+
+    def test_frames_agree(self):
+        '''the GMST frame stays well inside TLE accuracy of Skyfield's full model'''
+        satellite = self.tle['AO-91']
+        t = TIMESCALE.tai_jd(TIMESCALE.utc(2018, 11, 24).tai + np.linspace(0.0, 1.0, 500))
+        location = Topos(35.0, -98.0)
+        self.assertLess(np.max(np.abs(
+            altitude_function(satellite, location, 'gmst')(t)
+            - altitude_function(satellite, location, 'skyfield')(t)
+        )), 0.05)
+        self.assertIsInstance(altitude_function(satellite, location, 'gmst')(t[0]), float)
+
+    def test_profiles_agree(self):
+        '''every profile finds the same passes, within its tolerances of the precise times'''
+        precise = self.results['precise'].passes
+        for name, result in self.results.items():
+            self.assertEqual(len(precise), len(result.passes), name)
+            profile = PROFILES[name]
+            for expected, found in zip(precise, result.passes):
+                for edge in ('AOS', 'LOS'):
+                    self.assertLess(
+                        abs(getattr(found, edge).tai - getattr(expected, edge).tai) * 86400.0
+                        , max(profile.edge_tolerance, 0.01) * 2.0 + 0.1, name
+                    )
+                self.assertLess(
+                    abs(found.TCA.tai - expected.TCA.tai) * 86400.0
+                    , profile.peak_tolerance * 2.0 + 0.1, name
+                )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+
+'''
+test_asgi.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+BirdplansAsgi unit tests
+'''
+
+import asyncio
+import json
+import threading
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from birdplans.asgi import BirdplansAsgi, make_environ
+from birdplans.instrumentation import METRICS
+from birdplans.uwsgi import flight_key
+
+def request(app, path, query_string=b''):
+    '''Drive one http request through an ASGI app, returning (status, headers, body).
+    '''
+    return asyncio.run(send_request(app, path, query_string))
+
+async def send_request(app, path, query_string=b''):
+    '''Drive one http request through an ASGI app in the running loop.
+    '''
+    sent = await send_messages(app, path, query_string)
+    return sent[0]['status'], dict(sent[0]['headers']), b''.join(_['body'] for _ in sent[1:])
+
+async def send_messages(app, path, query_string=b''):
+    '''Drive one http request through an ASGI app in the running loop, returning the messages it
+    sent.
+    '''
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http',
+        'method': 'GET',
+        'path': path,
+        'query_string': query_string,
+        'headers': [(b'host', b'localhost')],
+    }
+    await app(scope, receive, send)
+    return sent
+
+class SlowApp:
+    '''Stand-in application whose every request waits until it is released.'''
+
+    def __init__(self, chunks=(b'slow',)):
+        self.chunks = chunks
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def uwsgi_application(self, env, start_response):
+        '''Answer once released, in chunks.'''
+        self.started.set()
+        self.release.wait(10.0)
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        yield from self.chunks
+
+class TestBirdplansAsgi(unittest.TestCase):
+    '''Exercise the asgi wrapper around the uwsgi handlers.'''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = BirdplansAsgi(processes=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.app.shutdown()
+
+    def test_make_environ(self):
+        '''scope fields land in the WSGI environment'''
+        env = make_environ({
+            'type': 'http', 'path': '/one', 'query_string': b'lat=1&lng=2',
+            'headers': [(b'user-agent', b'test'), (b'content-type', b'text/plain')]
+        })
+        self.assertEqual('/one', env['PATH_INFO'])
+        self.assertEqual('lat=1&lng=2', env['QUERY_STRING'])
+        self.assertEqual('test', env['HTTP_USER_AGENT'])
+        self.assertEqual('text/plain', env['CONTENT_TYPE'])
+
+    def test_inline_route(self):
+        '''cheap routes are answered without the process pool'''
+        # its own app, since the others start the pool
+        app = BirdplansAsgi(app=self.app.get_app())
+        status, _, body = request(app, '/tz')
+        self.assertEqual(200, status)
+        self.assertIn('America/Chicago', json.loads(body))
+        self.assertIsNone(app.executor)
+
+    def test_inline_streamed(self):
+        '''inline routes send each chunk as their handler yields it'''
+        inline = SlowApp([b'a', b'b', b'c'])
+        inline.release.set()
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(BirdplansAsgi(app=inline)(
+            {'type': 'http', 'path': '/birds', 'headers': []}, receive, send
+        ))
+        self.assertEqual([b'a', b'b', b'c'], [_['body'] for _ in sent[1:]])
+        self.assertEqual([True, True, False], [_.get('more_body', False) for _ in sent[1:]])
+
+    def test_slow_route_offloaded(self):
+        '''a slow route runs in the pool and does not hold up the cheap ones'''
+        slow = SlowApp()
+        app = BirdplansAsgi(app=self.app.get_app())
+        app.executor = ThreadPoolExecutor(1)
+
+        async def both():
+            pending = asyncio.ensure_future(send_request(app, '/mutual', b'bird=SO-50'))
+            while not slow.started.is_set():
+                await asyncio.sleep(0.01)
+            ready = await asyncio.wait_for(send_request(app, '/ready'), 5.0)
+            self.assertFalse(pending.done())
+            slow.release.set()
+            return ready, await pending
+
+        try:
+            # the pool's application, run here in a thread
+            with mock.patch('birdplans.asgi.WORKER_APP', slow):
+                ready, response = asyncio.run(both())
+        finally:
+            slow.release.set()
+            app.shutdown()
+        self.assertEqual(200, ready[0])
+        self.assertEqual((200, b'slow'), (response[0], response[2]))
+
+    def test_offloaded_route(self):
+        '''predictions run in the pool and repeats are served from the result cache'''
+        query = b'lat=35&lng=-98&tz=America/Chicago&window_start=2018-12-03T00:00&bird=AO-91&alt=30'
+        key = ('request_seconds', (('route', 'one'),))
+        before = METRICS.histograms[key].count if key in METRICS.histograms else 0
+        status, headers, body = request(self.app, '/one', query)
+        self.assertEqual(200, status)
+        self.assertTrue(headers[b'content-type'].startswith(b'text/json'))
+        self.assertEqual('AO-91', json.loads(body)['data'][0]['bird'])
+        self.assertIsNotNone(self.app.executor)
+        # timed in the pool worker, counted here
+        self.assertEqual(1, METRICS.histograms[key].count - before)
+        self.assertIsNotNone(self.app.cache.get(('/one', flight_key(query.decode(), None))))
+        self.assertEqual(body, request(self.app, '/one', query)[2])
+
+    def test_export_streamed(self):
+        '''exports come back from the pool a day of passes at a time, and their errors with them'''
+        query = (
+            b'lat=35&lng=-98&grid=JO01&tz=America/Chicago&window_start=2022-11-25T00:00'
+            b'&bird=AO-91&alt=30&days=2'
+        )
+        sent = asyncio.run(send_messages(self.app, '/csv', query))
+        self.assertEqual(200, sent[0]['status'])
+        bodies = [_ for _ in sent if _['type'] == 'http.response.body']
+        self.assertGreater(len(bodies), 2)
+        self.assertEqual([True] * (len(bodies) - 1) + [False], [
+            _.get('more_body', False) for _ in bodies
+        ])
+        lines = b''.join(_['body'] for _ in bodies).decode('utf-8').splitlines()
+        self.assertTrue(lines[0].startswith('"Grid","Latitude"'))
+        self.assertEqual({'"EM15aa"', '"JO01"'}, {_.split(',')[0] for _ in lines[1:]})
+        self.assertEqual({}, self.app.streams)
+
+        with self.assertRaises(ValueError):
+            request(self.app, '/csv', b'tz=UTC&window_start=2022-11-25T00:00&bird=AO-91')
+        self.assertEqual({}, self.app.streams)
+
+    def test_doppler_streamed(self):
+        '''doppler curves come back from the pool a header and a chunk of samples at a time'''
+        sent = asyncio.run(send_messages(
+            self.app, '/doppler', b'lat=35&lng=-98&t=1543825968034&bird=SO-50&bird=AO-7&rx=145.95'
+        ))
+        self.assertEqual(200, sent[0]['status'])
+        self.assertTrue(
+            dict(sent[0]['headers'])[b'content-type'].startswith(b'application/x-ndjson')
+        )
+        bodies = [_['body'] for _ in sent[1:-1]]
+        self.assertEqual(b'', sent[-1]['body'])
+        self.assertGreaterEqual(len(bodies), 4)
+        # each bird's header is a message of its own, ahead of its samples
+        headers = [json.loads(_) for _ in bodies if b'"bird"' in _]
+        self.assertEqual(['SO-50', 'AO-7'], [_['bird'] for _ in headers])
+        self.assertIn('range_rate', json.loads(bodies[1].splitlines()[0]))
+
+    def test_track_streamed(self):
+        '''tracks come back from the pool a chunk at a time, a second station on the same pool
+        worker reusing the splines of the first'''
+        key = ('track_spline_builds', ())
+        builds = []
+        for latlng in [b'lat=35&lng=-98', b'lat=35.5&lng=-97.5']:
+            before = METRICS.counters.get(key, 0)
+            sent = asyncio.run(send_messages(
+                self.app, '/track', latlng + b'&t=1543825960000&bird=AO-91&rate=10'
+            ))
+            # counted in the pool worker, merged here
+            builds.append(METRICS.counters.get(key, 0) - before)
+            self.assertEqual(200, sent[0]['status'])
+            bodies = [_['body'] for _ in sent[1:-1]]
+            self.assertGreater(len(bodies), 2)
+            self.assertEqual('AO-91', json.loads(bodies[0])['bird'])
+        self.assertGreater(builds[0], 0)
+        self.assertEqual(0, builds[1])
+
+    def test_partial_not_cached(self):
+        '''responses cut short by their deadline are not kept in the result cache'''
+        query = (
+            b'lat=35&lng=-98&tz=America/Chicago&window_start=2018-12-03T00:00&bird=AO-91&alt=30'
+            b'&deadline=0.000001'
+        )
+        status, headers, body = request(self.app, '/one', query)
+        self.assertEqual((200, b'deadline'), (status, headers[b'partial']))
+        self.assertEqual(['AO-91'], json.loads(body)['partial']['skipped'])
+        self.assertIsNone(self.app.cache.get(('/one', flight_key(query.decode(), None))))
+
+    def test_coalesced(self):
+        '''identical requests under way share one pool call'''
+        query = b'lat=35&lng=-98&tz=America/Chicago&window_start=2018-12-05T00:00&bird=SO-50&alt=30'
+        key = ('coalesced_requests', (('route', 'one'), ('scope', 'loop')))
+        before = METRICS.counters.get(key, 0)
+
+        # its own app, since this one starts the pool
+        app = BirdplansAsgi(processes=1)
+
+        async def together():
+            return await asyncio.gather(*[send_request(app, '/one', query) for _ in range(3)])
+
+        try:
+            responses = asyncio.run(together())
+        finally:
+            app.shutdown()
+        self.assertEqual([200] * 3, [_[0] for _ in responses])
+        self.assertEqual(1, len({_[2] for _ in responses}))
+        self.assertEqual(2, METRICS.counters[key] - before)
+        self.assertEqual({}, app.inflight)
+
+    def test_lifespan(self):
+        '''startup completes only once the pool workers have warmed up'''
+        app = BirdplansAsgi(processes=1)
+        messages = iter([{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+        sent = []
+
+        async def receive():
+            return next(messages)
+
+        async def send(message):
+            if message['type'] == 'lifespan.startup.complete':
+                self.assertTrue(app.app.ready)
+                self.assertIsNotNone(app.app.warmup)
+            sent.append(message['type'])
+
+        asyncio.run(app({'type': 'lifespan'}, receive, send))
+        self.assertEqual(['lifespan.startup.complete', 'lifespan.shutdown.complete'], sent)
+        self.assertIsNone(app.executor)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+'''
+test_budget.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+compute budgeting and admission control tests
+'''
+
+import datetime
+import tempfile
+import threading
+import time
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from birdplans.budget import Admission, Busy, Cost, Deadline, OverBudget, estimate_cost
+from birdplans.tlemanager import TestTleManager
+
+START = datetime.datetime(2018, 11, 24, tzinfo=datetime.timezone.utc)
+
+def cost(seconds):
+    '''A Cost of seconds.'''
+    return Cost(1, 1.0, 0.0, seconds)
+
+class TestBudget(unittest.TestCase):
+    '''exercise the cost estimate and admission control'''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tle = TestTleManager()
+
+    def test_estimate(self):
+        '''cost grows with birds, days, observers, orbits and the accuracy asked for'''
+        ao91, so50 = self.tle['AO-91'], self.tle['SO-50']
+        one = estimate_cost([ao91], START, START + datetime.timedelta(days=1))
+        self.assertEqual(1, one.birds)
+        # a LEO bird comes round about 15 times a day
+        self.assertAlmostEqual(15.0, one.orbits, delta=2.0)
+        five = estimate_cost([ao91], START, START + datetime.timedelta(days=5))
+        self.assertAlmostEqual(5.0 * one.orbits, five.orbits)
+        self.assertGreater(five.seconds, 4.0 * one.seconds)
+        two = estimate_cost([ao91, so50], START, START + datetime.timedelta(days=1), observers=3)
+        self.assertEqual(6, two.birds)
+        self.assertGreater(two.seconds, 5.0 * one.seconds)
+        self.assertLess(
+            estimate_cost([ao91], START, START + datetime.timedelta(days=1), 'planning').seconds
+            , one.seconds
+        )
+        self.assertEqual(
+            0.0, estimate_cost([ao91], START, START + datetime.timedelta(days=1)
+                               , track_points=0).points
+        )
+
+    def test_admit(self):
+        '''cheap requests go straight through, and those over the budget are refused'''
+        admission = Admission(budget=10.0, heavy=1.0)
+        with admission.admit(cost(0.5)):
+            pass
+        with self.assertRaises(OverBudget) as context:
+            with admission.admit(cost(11.0)):
+                self.fail('admitted over the budget')
+        self.assertEqual(10.0, context.exception.budget)
+        with Admission(budget=0).admit(cost(1000.0)):
+            pass
+
+    def check_slots(self, admission):
+        '''No more than one expensive request at a time, and one turned away when waiting too
+        long.'''
+        running = []
+        peak = []
+
+        def expensive():
+            with admission.admit(cost(5.0)):
+                running.append(1)
+                peak.append(len(running))
+                time.sleep(0.2)
+                running.pop()
+
+        with ThreadPoolExecutor(3) as executor:
+            for future in [executor.submit(expensive) for _ in range(3)]:
+                future.result()
+        self.assertEqual([1, 1, 1], peak)
+
+        held = threading.Event()
+        release = threading.Event()
+
+        def hold():
+            with admission.admit(cost(5.0)):
+                held.set()
+                release.wait()
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        held.wait()
+        admission.timeout = 0.1
+        try:
+            with self.assertRaises(Busy):
+                with admission.admit(cost(5.0)):
+                    self.fail('admitted without a slot')
+            # cheap requests do not wait
+            with admission.admit(cost(0.5)):
+                pass
+        finally:
+            release.set()
+            holder.join()
+
+    def test_slots(self):
+        '''expensive requests take turns in this process'''
+        self.check_slots(Admission(heavy=1.0, slots=1))
+
+    def test_shared_slots(self):
+        '''expensive requests take turns through lock files shared by the workers'''
+        with tempfile.TemporaryDirectory() as directory:
+            self.check_slots(Admission(heavy=1.0, slots=1, directory=directory))
+
+    def test_deadline(self):
+        '''a deadline expires once its seconds are up, and must be in the future'''
+        self.assertFalse(Deadline(60.0).expired())
+        deadline = Deadline(0.01)
+        time.sleep(0.02)
+        self.assertTrue(deadline.expired())
+        with self.assertRaises(ValueError):
+            Deadline(0.0)
+
+if __name__ == '__main__':
+    unittest.main()
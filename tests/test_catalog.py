@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+'''
+test_catalog.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+batched catalog propagation unit tests
+'''
+
+import datetime
+import unittest
+
+import numpy as np
+import pytz
+
+from skyfield.api import Topos
+
+from birdplans.catalog import SatelliteBatch, find_passes, overhead, prefilter
+from birdplans.satellitepasspredictor import TIMESCALE, pass_estimation_wrapper
+from birdplans.tlemanager import TestTleManager, TleManager
+
+class TestCatalog(unittest.TestCase):
+    '''exercise the batched propagation paths'''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tle = TestTleManager()
+        cls.catalog = TleManager(
+            None, 'data/test/tledbcurrent.json', 'data/test/tledbhistory.json', full_catalog=True
+        )
+
+    def test_altaz_matches_skyfield(self):
+        '''batched topocentric coordinates agree with skyfield to well under TLE accuracy'''
+        birds = {bird: self.tle[bird] for bird in ['AO-7', 'AO-91', 'SO-50']}
+        t = TIMESCALE.tai_jd(TIMESCALE.utc(2018, 12, 3).tai + np.linspace(0.0, 1.0, 50))
+        alt, az, _ = SatelliteBatch(birds).altaz((35.0, -98.0), t)
+        for i, satellite in enumerate(birds.values()):
+            expected_alt, expected_az, _ = (satellite - Topos(35.0, -98.0)).at(t).altaz()
+            self.assertLess(np.max(np.abs(alt[i] - expected_alt.degrees)), 0.05)
+            visible = expected_alt.degrees > 0
+            self.assertLess(np.max(np.abs(az[i][visible] - expected_az.degrees[visible])), 0.1)
+
+    def test_find_passes(self):
+        '''same passes as pass_estimation_wrapper, to within the requested precision'''
+        window_start = datetime.datetime(2018, 11, 24, tzinfo=pytz.utc)
+        window_stop = window_start + datetime.timedelta(days=5)
+        expected = pass_estimation_wrapper(
+            self.tle['AO-91'], (35.0, -98.0), window_start, window_stop, 30.0
+        ).passes
+
+        passes = find_passes(
+            {'AO-91': self.tle['AO-91']}, (35.0, -98.0), TIMESCALE.utc(window_start)
+            , TIMESCALE.utc(window_stop), 30.0, precision=1.0
+        )
+        self.assertEqual(8, len(passes.bird))
+        for field, times in zip(['AOS', 'TCA', 'LOS'], [passes.aos, passes.tca, passes.los]):
+            np.testing.assert_allclose(
+                [getattr(_, field).tai for _ in expected], times, rtol=0, atol=1.0 / 86400.0
+            )
+        self.assertTrue(np.all(passes.alt >= 30.0))
+
+    def test_full_catalog(self):
+        '''whole catalog passes are sorted and only include reachable birds'''
+        birds = {bird: self.catalog[bird] for bird in self.catalog.tle}
+        self.assertGreater(len(birds), 1800)
+        reachable = prefilter(birds, (80.0, 0.0), 30.0)
+        self.assertNotIn('SO-50', reachable)
+        self.assertIn('ISS', prefilter(birds, (35.0, -98.0), 30.0))
+
+        start = TIMESCALE.utc(2018, 12, 3)
+        passes = find_passes(birds, (35.0, -98.0), start, TIMESCALE.tai_jd(start.tai + 0.25), 45.0)
+        self.assertTrue(len(passes.bird))
+        self.assertTrue(np.all(np.diff(passes.aos) >= 0))
+        self.assertTrue(np.all((passes.aos <= passes.tca) & (passes.tca <= passes.los)))
+
+    def test_overhead(self):
+        '''everything above the horizon, highest first'''
+        batch = SatelliteBatch({bird: self.catalog[bird] for bird in self.catalog.tle})
+        up = overhead(batch, (35.0, -98.0), TIMESCALE.utc(2018, 12, 3), 10.0)
+        self.assertTrue(up)
+        self.assertTrue(all(_.alt >= 10.0 for _ in up))
+        self.assertEqual(sorted(up, key=lambda o: -o.alt), up)
+
+if __name__ == '__main__':
+    unittest.main()
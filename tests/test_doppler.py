@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+'''
+test_doppler.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+doppler curve unit tests
+'''
+
+import unittest
+
+import numpy as np
+
+from skyfield.api import Topos
+
+from birdplans.doppler import (
+    SPEED_OF_LIGHT_KM_S, Frequencies, correct, doppler_curve, range_rate, schedule_frequencies
+)
+from birdplans.satellitepasspredictor import TIMESCALE
+from birdplans.tlemanager import TestTleManager
+
+class TestDoppler(unittest.TestCase):
+    '''exercise the schedule lookup, the range rate and the frequency correction'''
+
+    def test_schedule_frequencies(self):
+        '''simple schedules, weekly defaults and birds without a schedule'''
+        self.assertEqual(
+            Frequencies('FM', 435.25, 145.96)
+            , schedule_frequencies({'schedule': {'simple': {
+                'mode': 'FM', 'rx': 145.96, 'tx': 435.25
+            }}})
+        )
+        self.assertEqual(
+            Frequencies('FM', 435.35, 145.88)
+            , schedule_frequencies({'schedule': {'weekly': {
+                '0200': {'mode': 'FM', 'rx': 145.88, 'tx': 1267.35}
+                , 'default': {'mode': 'FM', 'rx': 145.88, 'tx': 435.35}
+            }}})
+        )
+        self.assertIsNone(schedule_frequencies({'name': 'ESEO'}))
+
+    def test_range_rate(self):
+        '''matches the Skyfield topocentric velocity along a pass'''
+        satellite = TestTleManager()['SO-50']
+        t = TIMESCALE.tai_jd(TIMESCALE.utc(2018, 12, 3, 9, 48).tai + np.arange(0, 600, 7) / 86400.0)
+        position = (satellite - Topos(35.0, -98.0)).at(t)
+        r = position.position.km
+        expected = np.sum(r * position.velocity.km_per_s, axis=0) / np.linalg.norm(r, axis=0)
+        np.testing.assert_allclose(range_rate(satellite, (35.0, -98.0), t), expected, atol=1e-5)
+
+    def test_correct(self):
+        '''approaching raises the downlink and lowers the uplink'''
+        uplink, downlink = correct(Frequencies('FM', 435.25, 145.96), [-7.0, 0.0, 7.0])
+        self.assertGreater(downlink[0], 145.96e6)
+        self.assertLess(uplink[0], 435.25e6)
+        self.assertEqual(145.96e6, downlink[1])
+        # what the satellite hears is the scheduled uplink
+        np.testing.assert_allclose(uplink * (1.0 - np.array([-7.0, 0.0, 7.0]) / SPEED_OF_LIGHT_KM_S)
+                                   , 435.25e6)
+        self.assertEqual((None, None), correct(Frequencies(None, None, None), [0.0]))
+
+    def test_doppler_curve(self):
+        '''chunks cover the window at the requested rate'''
+        tai = TIMESCALE.utc(2018, 12, 3, 9, 48).tai
+        chunks = list(doppler_curve(
+            TIMESCALE, TestTleManager()['SO-50'], (35.0, -98.0), None, tai, tai + 100.0 / 86400.0
+            , hz=2.0, chunk=64
+        ))
+        self.assertEqual([64, 64, 64, 9], [len(_.tai) for _ in chunks])
+        self.assertAlmostEqual(0.5, (chunks[0].tai[1] - chunks[0].tai[0]) * 86400.0, delta=1e-4)
+        self.assertIsNone(chunks[0].uplink)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+'''
+test_export.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+streaming pass export tests
+'''
+
+import csv
+import datetime
+import unittest
+
+import numpy as np
+import pytz
+
+from birdplans.export import (
+    CSV_HEADER, Observer, csv_export, export_passes, ics_export, ics_fold
+)
+from birdplans.satellitepasspredictor import pass_estimation_wrapper, tai_to_epoch_ms
+from birdplans.tlemanager import TestTleManager
+
+# the day after the test elements were fetched, not on a UTC day boundary
+WINDOW_START = datetime.datetime(2018, 12, 3, 3, tzinfo=pytz.utc)
+WINDOW_STOP = WINDOW_START + datetime.timedelta(days=3)
+
+OBSERVERS = [Observer('EM15', 35.0, -98.0), Observer('JO01', 51.0, 0.0)]
+
+class TestExport(unittest.TestCase):
+    '''exercise the streaming exports'''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tle = TestTleManager()
+        cls.chunks = list(export_passes(
+            cls.tle, OBSERVERS, ['AO-91', 'SO-50'], WINDOW_START, WINDOW_STOP, 10
+        ))
+
+    def test_matches_single_window(self):
+        '''every pass of a single window is written once, whichever day it crosses into'''
+        self.assertEqual(2 * 2 * 3, len(self.chunks))
+        for observer in OBSERVERS:
+            for bird in ('AO-91', 'SO-50'):
+                expected = tai_to_epoch_ms([_.TCA.tai for _ in pass_estimation_wrapper(
+                    self.tle[bird], (observer.lat, observer.lng), WINDOW_START, WINDOW_STOP, 10
+                    , lighting=False
+                ).passes])
+                found = [
+                    _.times[1] for chunk in self.chunks for _ in chunk
+                    if (_.observer, _.bird) == (observer, bird)
+                ]
+                self.assertEqual(len(expected), len(found))
+                self.assertLess(np.max(np.abs(np.array(found) - expected)), 1000)
+
+    def test_csv(self):
+        '''one CSV row per pass under the client's header'''
+        text = ''.join(csv_export(self.chunks, pytz.timezone('America/Chicago')))
+        rows = list(csv.reader(text.splitlines()))
+        self.assertEqual(CSV_HEADER, rows[0])
+        self.assertEqual(sum(len(_) for _ in self.chunks), len(rows) - 1)
+        row = dict(zip(CSV_HEADER, rows[1]))
+        self.assertEqual(('EM15', 'AO-91'), (row['Grid'], row['Bird']))
+        self.assertLess(int(row['UTC AOS Timestamp']), int(row['UTC TCA Timestamp']))
+        self.assertGreaterEqual(int(row['Max Elevation']), 10)
+
+    def test_ics(self):
+        '''one event per pass, in folded CRLF lines'''
+        text = ''.join(ics_export(self.chunks))
+        self.assertTrue(text.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(text.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(sum(len(_) for _ in self.chunks), text.count('BEGIN:VEVENT'))
+        lines = text.split('\r\n')
+        self.assertLessEqual(max(len(bytes(_, 'utf-8')) for _ in lines), 75)
+        self.assertIn('SUMMARY:AO-91 pass\\, max elevation', text)
+
+    def test_ics_fold(self):
+        '''long lines are folded without splitting a character'''
+        line = 'DESCRIPTION:' + '°' * 60
+        folded = ics_fold(line)
+        self.assertEqual(line, folded.replace('\r\n ', '')[:-2])
+        for part in folded.split('\r\n'):
+            self.assertLessEqual(len(bytes(part, 'utf-8')), 75)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+'''
+test_illumination.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+sunlit satellite and observer darkness tests
+'''
+
+import datetime
+import unittest
+
+import numpy as np
+import pytz
+
+from skyfield.api import Topos
+
+from birdplans.illumination import (
+    EARTH_RADIUS_KM, SunEphemeris, analytic_sun, sun_altitude, sun_positions, sunlit
+    , window_ephemeris
+)
+from birdplans.satellitepasspredictor import TIMESCALE, TRACK_POINTS, pass_estimation_wrapper
+from birdplans.tlemanager import TestTleManager
+
+class TestIllumination(unittest.TestCase):
+    '''exercise the Sun model, the shadow test and the per-pass lighting'''
+
+    def test_analytic_sun(self):
+        '''the Sun sits at the winter solstice declination one astronomical unit away'''
+        position = analytic_sun(TIMESCALE.utc(2018, 12, 21, 22, 23))
+        declination = np.degrees(np.arcsin(position[2] / np.linalg.norm(position)))
+        self.assertAlmostEqual(-23.44, declination, delta=0.01)
+        self.assertAlmostEqual(0.984, np.linalg.norm(position) / 149597870.7, delta=0.001)
+
+    def test_ephemeris(self):
+        '''the interpolated table matches the model and is shared between queries of a window'''
+        t = TIMESCALE.utc(2018, 12, 3, np.linspace(0.0, 24.0, 97))
+        ephemeris = SunEphemeris(TIMESCALE, t.tai[0], t.tai[-1])
+        direct = analytic_sun(t)
+        error = np.degrees(np.arccos(np.clip(
+            np.sum(ephemeris.at(t.tai) * direct, axis=0)
+            / (np.linalg.norm(ephemeris.at(t.tai), axis=0) * np.linalg.norm(direct, axis=0))
+            , -1.0, 1.0
+        )))
+        self.assertLess(error.max(), 0.001)
+        self.assertIs(
+            window_ephemeris(TIMESCALE, t.tai[0], t.tai[-1])
+            , window_ephemeris(TIMESCALE, t.tai[0] + 1e-6, t.tai[-1] - 1e-6)
+        )
+
+    def test_ephemeris_edges(self):
+        '''window tables reach past their window, and times past the table are computed outright'''
+        t = TIMESCALE.utc(2018, 12, 3, [0.0, 24.0])
+        ephemeris = window_ephemeris(TIMESCALE, t.tai[0], t.tai[1])
+        self.assertLessEqual(ephemeris.tai[0], t.tai[0] - 0.99)
+        self.assertGreaterEqual(ephemeris.tai[-1], t.tai[1] + 0.99)
+
+        ephemeris = SunEphemeris(TIMESCALE, t.tai[0], t.tai[1])
+        past = TIMESCALE.utc(2018, 12, [1, 6], 12)
+        self.assertTrue(np.allclose(sun_positions(past), ephemeris.at(past.tai), rtol=1e-9))
+
+    def test_sunlit(self):
+        '''behind the Earth is in shadow, beside or before it is lit'''
+        sun = np.array([[1.5e8] * 4, [0.0] * 4, [0.0] * 4])
+        height = EARTH_RADIUS_KM + 400.0
+        satellites = np.array([
+            [-height, 0.0, height, -height]
+            , [0.0, height, 0.0, 0.0]
+            , [0.0, 0.0, 0.0, EARTH_RADIUS_KM + 10.0]
+        ])
+        self.assertEqual([False, True, True, True], sunlit(satellites, sun).tolist())
+
+    def test_sun_altitude(self):
+        '''local noon and midnight'''
+        t = TIMESCALE.utc(2018, 12, 3, [6, 18], 22)
+        altitude = sun_altitude(Topos(35.0, -98.0), t, analytic_sun(t))
+        self.assertAlmostEqual(-77.1, altitude[0], delta=0.2)
+        self.assertAlmostEqual(32.9, altitude[1], delta=0.2)
+
+    def test_pass_lighting(self):
+        '''dawn passes are lit over a dark observer, afternoon passes are lit in daylight'''
+        window_start = datetime.datetime(2018, 11, 24, tzinfo=pytz.utc)
+        result = pass_estimation_wrapper(
+            TestTleManager()['AO-91']
+            , (35.0, -98.0)
+            , window_start
+            , window_start + datetime.timedelta(days=2)
+            , 30.0
+        )
+        self.assertEqual(len(result.passes), len(result.lighting))
+        for pass_, lighting in zip(result.passes, result.lighting):
+            self.assertEqual(TRACK_POINTS, len(lighting.t))
+            self.assertAlmostEqual(pass_.AOS.tai, lighting.t[0])
+            hour = pass_.TCA.utc_datetime().hour
+            self.assertEqual(hour > 12, not lighting.dark.any())
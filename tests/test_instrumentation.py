@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+'''
+test_instrumentation.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+stage timer and metrics registry unit tests
+'''
+
+import threading
+import unittest
+
+from birdplans.instrumentation import Histogram, MetricsRegistry, StageTimer
+
+class TestInstrumentation(unittest.TestCase):
+    '''exercise the timing hooks and the metrics text format'''
+
+    def test_stage_timer(self):
+        '''repeated stages accumulate and format as Server-Timing'''
+        timer = StageTimer()
+        with timer.stage('sampling'):
+            pass
+        with timer.stage('refinement'):
+            pass
+        with timer.stage('sampling'):
+            pass
+        self.assertEqual(['sampling', 'refinement'], list(timer.stages))
+        self.assertRegex(timer.server_timing(), r'^sampling;dur=[0-9.]+, refinement;dur=[0-9.]+$')
+
+    def test_histogram(self):
+        '''observations land in cumulative buckets'''
+        histogram = Histogram([0.1, 1.0])
+        for value in [0.05, 0.5, 0.5, 5.0]:
+            histogram.observe(value)
+        self.assertEqual([('0.1', 1), ('1.0', 3), ('+Inf', 4)], list(histogram.cumulative()))
+        self.assertEqual(4, histogram.count)
+        self.assertAlmostEqual(6.05, histogram.sum)
+
+    def test_render(self):
+        '''prometheus text exposition format'''
+        metrics = MetricsRegistry()
+        metrics.observe('stage_seconds', 0.002, stage='tle')
+        metrics.increment('coalesced')
+        text = metrics.render(worker='1')
+        self.assertIn('# TYPE birdplans_stage_seconds histogram', text)
+        self.assertIn('birdplans_stage_seconds_bucket{worker="1",stage="tle",le="0.0025"} 1', text)
+        self.assertIn('birdplans_stage_seconds_count{worker="1",stage="tle"} 1', text)
+        self.assertIn('birdplans_coalesced_total{worker="1"} 1', text)
+
+    def test_drain_merge(self):
+        '''drained metrics add to another registry's and leave the first empty'''
+        worker, loop = MetricsRegistry(), MetricsRegistry()
+        loop.increment('coalesced', 2)
+        worker.increment('coalesced', 3)
+        worker.observe('stage_seconds', 0.002, stage='tle')
+        loop.merge(worker.drain())
+        worker.observe('stage_seconds', 0.2, stage='tle')
+        loop.merge(worker.drain())
+        self.assertEqual({}, worker.counters)
+        self.assertEqual({}, worker.histograms)
+        self.assertEqual(5, loop.counters[('coalesced', ())])
+        histogram = loop.histograms[('stage_seconds', (('stage', 'tle'),))]
+        self.assertEqual(2, histogram.count)
+        self.assertAlmostEqual(0.202, histogram.sum)
+
+    def test_threads(self):
+        '''updates from several threads at once are all counted'''
+        metrics = MetricsRegistry()
+
+        def record():
+            for _ in range(10000):
+                metrics.increment('coalesced')
+                metrics.observe('stage_seconds', 0.001)
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(40000, metrics.counters[('coalesced', ())])
+        self.assertEqual(40000, metrics.histograms[('stage_seconds', ())].count)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+'''
+test_mutual.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+mutual visibility window unit tests
+'''
+
+import unittest
+
+import numpy as np
+
+from birdplans.catalog import find_passes
+from birdplans.mutual import intersect, mutual_windows
+from birdplans.satellitepasspredictor import TIMESCALE
+from birdplans.tlemanager import TestTleManager
+
+class TestMutual(unittest.TestCase):
+    '''exercise the interval merge and the windows built on it'''
+
+    def test_intersect(self):
+        '''overlaps, containment, touching and disjoint intervals'''
+        self.assertEqual(
+            [(2, 3), (4, 6), (7, 8), (9, 10)]
+            , intersect([(1, 3), (4, 8), (9, 12)], [(2, 6), (7, 8), (8.5, 8.7), (9, 10), (12, 13)])
+        )
+        self.assertEqual([], intersect([(1, 2)], []))
+
+    def test_mutual_windows(self):
+        '''every window sits inside both observers' passes above the minimum altitude'''
+        satellites = {bird: TestTleManager()[bird] for bird in ('AO-91', 'SO-50', 'FO-29', 'ISS')}
+        observers = [(35.0, -98.0), (41.7, -72.7), (47.6, -122.3)]
+        start, end = TIMESCALE.utc(2018, 12, 3), TIMESCALE.utc(2018, 12, 4)
+
+        windows = mutual_windows(satellites, observers[:2], start, end, 10.0)
+        self.assertTrue(len(windows.bird))
+        self.assertTrue(np.all(np.diff(windows.start) >= 0.0))
+        # each window opens and closes as one of the two crosses the minimum altitude, unless the
+        # search window cuts it short
+        opens = windows.start > start.tai
+        closes = windows.end < end.tai
+        np.testing.assert_allclose(windows.start_alt[opens].min(axis=1), 10.0, atol=0.1)
+        np.testing.assert_allclose(windows.end_alt[closes].min(axis=1), 10.0, atol=0.1)
+
+        for latlng in observers[:2]:
+            passes = find_passes(satellites, latlng, start, end, 10.0, horizon=10.0)
+            for bird, aos, los in zip(windows.bird, windows.start, windows.end):
+                self.assertTrue(np.any(
+                    (passes.bird == bird) & (passes.aos <= aos + 1e-5) & (passes.los >= los - 1e-5)
+                ))
+
+        pairs = mutual_windows(satellites, observers, start, end, 10.0, pairs=True)
+        self.assertLessEqual(set(pairs.observers), {(0, 1), (0, 2), (1, 2)})
+        self.assertEqual(
+            len(windows.bird), sum(1 for _ in pairs.observers if _ == (0, 1))
+        )
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+'''
+test_passindex.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+pass index unit tests
+'''
+
+import datetime
+import unittest
+
+import numpy as np
+import pytz
+
+from birdplans.catalog import CatalogPasses
+from birdplans.passindex import PassIndex
+from birdplans.satellitepasspredictor import pass_estimation_wrapper
+from birdplans.tlemanager import TestTleManager
+
+class TestPassIndex(unittest.TestCase):
+    '''the index answers as a scan of every pass would'''
+
+    @classmethod
+    def setUpClass(cls):
+        random = np.random.RandomState(91)
+        aos = np.sort(random.uniform(0.0, 10.0, 400))
+        los = aos + random.uniform(0.001, 0.02, 400)
+        birds = np.array(random.choice(['AO-91', 'SO-50', 'AO-7', 'FO-29'], 400), dtype=object)
+        cls.passes = CatalogPasses(birds, aos, (aos + los) / 2.0, los, random.uniform(0, 90, 400))
+        # shuffled, the index sorts them itself
+        order = random.permutation(400)
+        cls.index = PassIndex(CatalogPasses(*(_[order] for _ in cls.passes)))
+        cls.times = random.uniform(-0.1, 10.1, 200)
+
+    def test_up(self):
+        '''passes in progress at t'''
+        for t in self.times:
+            expected = (self.passes.aos <= t) & (self.passes.los >= t)
+            np.testing.assert_array_equal(self.passes.aos[expected], self.index.up(t).aos)
+
+    def test_between(self):
+        '''passes overlapping [t0, t1]'''
+        for t in self.times:
+            expected = (self.passes.aos <= t + 0.1) & (self.passes.los >= t)
+            np.testing.assert_array_equal(
+                self.passes.aos[expected], self.index.between(t, t + 0.1).aos
+            )
+
+    def test_next_pass(self):
+        '''the first pass rising after t, of any bird or of one'''
+        for t in self.times:
+            later = np.flatnonzero(self.passes.aos > t)
+            found = self.index.next_pass(t)
+            self.assertEqual(
+                None if not len(later) else self.passes.aos[later[0]]
+                , None if found is None else self.index.passes.aos[found]
+            )
+            later = np.flatnonzero((self.passes.aos > t) & (self.passes.bird == 'AO-7'))
+            found = self.index.next_pass(t, 'AO-7')
+            self.assertEqual(
+                None if not len(later) else self.passes.aos[later[0]]
+                , None if found is None else self.index.passes.aos[found]
+            )
+        self.assertIsNone(self.index.next_pass(0.0, 'ISS'))
+
+    def test_long_passes(self):
+        '''passes clamped to the whole window do not widen the scan of the others'''
+        random = np.random.RandomState(36)
+        aos = np.concatenate([random.uniform(0.0, 10.0, 400), [0.0, 0.0, 2.0]])
+        los = np.concatenate([aos[:400] + random.uniform(0.001, 0.02, 400), [10.0, 10.0, 2.5]])
+        birds = np.array(['AO-91'] * 400 + ['GEO-1', 'GEO-2', 'MEO-1'], dtype=object)
+        passes = CatalogPasses(birds, aos, (aos + los) / 2.0, los, random.uniform(0, 90, 403))
+        index = PassIndex(passes)
+        self.assertLessEqual(index.longest, 0.02)
+        self.assertEqual(3, len(index.long))
+        for t in random.uniform(-0.1, 10.1, 200):
+            expected = (passes.aos <= t + 0.1) & (passes.los >= t)
+            np.testing.assert_array_equal(
+                np.sort(passes.aos[expected]), index.between(t, t + 0.1).aos
+            )
+            self.assertEqual(
+                sorted(passes.bird[(passes.aos <= t) & (passes.los >= t)])
+                , sorted(index.up(t).bird)
+            )
+
+    def test_from_window_passes(self):
+        '''pass_estimation_wrapper results index too'''
+        window_start = datetime.datetime(2018, 11, 24, tzinfo=pytz.utc)
+        tle = TestTleManager()
+        index = PassIndex.from_window_passes({
+            bird: pass_estimation_wrapper(
+                tle[bird], (35.0, -98.0), window_start, window_start + datetime.timedelta(days=1)
+                , 30.0, lighting=False
+            )
+            for bird in ('AO-91', 'SO-50')
+        })
+        self.assertTrue(len(index))
+        self.assertTrue(np.all(np.diff(index.passes.aos) >= 0.0))
+        self.assertTrue(np.all(index.passes.alt >= 30.0))
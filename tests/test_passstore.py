@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+'''
+test_passstore.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+on-disk pass store and prewarm tests
+'''
+
+import datetime
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pytz
+
+from birdplans.passstore import PassStore, StoreKey
+from birdplans.prewarm import prewarm
+from birdplans.tlemanager import TestTleManager
+
+KEY = StoreKey('AO-91', 'abcdef', 35.0, -98.0, 737000, 'standard')
+
+class TestPassStore(unittest.TestCase):
+    '''exercise the pass store'''
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'passes.sqlite')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_roundtrip(self):
+        '''passes come back as stored, under their own key only'''
+        store = PassStore(self.path)
+        events = np.array([[1.0, 1.01, 1.02, 45.0], [2.0, 2.01, 2.02, 12.5]])
+        self.assertIsNone(store.get(KEY))
+        store.put(KEY, events)
+        np.testing.assert_array_equal(events, store.get(KEY))
+        self.assertIsNone(store.get(KEY._replace(elements='fedcba')))
+        store.put(KEY._replace(day=737001), np.zeros((0, 4)))
+        self.assertEqual((0, 4), store.get(KEY._replace(day=737001)).shape)
+        # a second store on the same file, as after a restart
+        np.testing.assert_array_equal(events, PassStore(self.path).get(KEY))
+
+    def test_expiry(self):
+        '''expired passes are neither returned nor kept by purge'''
+        store = PassStore(self.path)
+        store.put(KEY, np.zeros((1, 4)))
+        store.record((35.0, -98.0), 'America/Chicago', ['AO-91'], 'standard')
+        store.ttl = -1.0
+        self.assertIsNone(store.get(KEY))
+        self.assertEqual([], store.popular())
+        self.assertEqual(2, store.purge())
+        store.ttl = 3600.0
+        self.assertIsNone(store.get(KEY))
+
+    def test_popular(self):
+        '''observers are ranked by how often they asked'''
+        store = PassStore(self.path)
+        store.record((35.0, -98.0), 'America/Chicago', ['AO-91', 'SO-50'], 'standard')
+        store.record((35.0, -98.0), 'America/Chicago', ['AO-91'], 'standard')
+        store.record((51.5, 0.0), 'Europe/London', ['AO-91'], 'fast')
+        popular = store.popular()
+        self.assertEqual(3, len(popular))
+        self.assertEqual(('AO-91', 2), (popular[0].bird, popular[0].hits))
+        self.assertEqual(1, len(store.popular(limit=1)))
+
+    def test_flush(self):
+        '''request counts reach the file in a batch, adding to those already there'''
+        store, other = PassStore(self.path), PassStore(self.path)
+        store.record((35.0, -98.0), 'America/Chicago', ['AO-91', 'SO-50'], 'standard')
+        store.record((35.0, -98.0), 'America/Chicago', ['AO-91'], 'standard')
+        # nothing written yet, as another worker sees it
+        self.assertEqual([], other.popular())
+        self.assertEqual(2, store.flush())
+        self.assertEqual(0, store.flush())
+        self.assertEqual([('AO-91', 2), ('SO-50', 1)], [(_.bird, _.hits) for _ in other.popular()])
+
+        store.record((35.0, -98.0), 'UTC', ['AO-91'], 'standard')
+        store.flush()
+        popular = other.popular()
+        self.assertEqual(('AO-91', 3, 'UTC'), (popular[0].bird, popular[0].hits, popular[0].tz))
+
+    def test_from_environment(self):
+        '''the store is only used when configured'''
+        previous = os.environ.pop('BIRDPLANS_PASS_STORE', None)
+        try:
+            self.assertIsNone(PassStore.from_environment())
+            os.environ['BIRDPLANS_PASS_STORE'] = self.path
+            self.assertEqual(self.path, PassStore.from_environment().path)
+        finally:
+            os.environ.pop('BIRDPLANS_PASS_STORE', None)
+            if previous is not None:
+                os.environ['BIRDPLANS_PASS_STORE'] = previous
+
+    def test_prewarm(self):
+        '''the popular observers' next days are filled'''
+        store = PassStore(self.path)
+        tle = TestTleManager()
+        store.record((35.0, -98.0), 'America/Chicago', ['AO-91', 'nonesuch'], 'standard')
+        now = datetime.datetime(2018, 12, 3, 6, tzinfo=pytz.utc)
+        report = prewarm(store, tle, days=2, now=now)
+        self.assertEqual((1, 0), (report.pairs, report.errors))
+        self.assertGreater(report.passes, 0)
+        key = StoreKey('AO-91', tle.fingerprint('AO-91'), 35.0, -98.0, None, 'standard')
+        for day in range(now.toordinal(), now.toordinal() + 3):
+            self.assertIsNotNone(store.get(key._replace(day=day)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+'''
+test_preload.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+pre-fork preload and freeze tests
+'''
+
+import gc
+import os
+import unittest
+
+from types import SimpleNamespace
+from unittest import mock
+
+from birdplans.preload import freeze, preload, preloading
+from birdplans.uwsgi import BirdplansUwsgi
+
+class TestPreload(unittest.TestCase):
+    '''exercise the state built in the uwsgi master'''
+
+    def test_preload(self):
+        '''every lazy satellite and the catalog batch are built ahead of the first request'''
+        app = BirdplansUwsgi()
+        self.assertEqual({}, app.tle.bird.satellites)
+        self.assertGreaterEqual(preload(app, catalog=True), 0.0)
+        self.assertEqual(len(app.tle.tle), len(app.tle.bird.satellites))
+        self.assertIsNotNone(app.batch)
+
+    def test_freeze(self):
+        '''frozen objects leave the collected generations'''
+        try:
+            self.assertGreater(freeze(), 0)
+        finally:
+            gc.unfreeze()
+
+    def test_preloading(self):
+        '''state is only frozen in a uwsgi master loading the application before the fork'''
+        with mock.patch.dict(os.environ, {'BIRDPLANS_PRELOAD': '1'}):
+            self.assertFalse(preloading(None))
+            self.assertTrue(preloading(SimpleNamespace(opt={})))
+            self.assertFalse(preloading(SimpleNamespace(opt={'lazy-apps': True})))
+        with mock.patch.dict(os.environ, {'BIRDPLANS_PRELOAD': '0'}):
+            self.assertFalse(preloading(SimpleNamespace(opt={})))
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+'''
+test_quantize.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+observer position quantization tests
+'''
+
+import random
+import unittest
+
+from birdplans.quantize import Quantizer, arc_km, timing_error
+
+class TestQuantize(unittest.TestCase):
+    '''exercise observer quantization'''
+
+    def test_grid(self):
+        '''observers move to the centre of their Maidenhead square'''
+        location = Quantizer('grid6')(35.01, -97.99)
+        self.assertEqual('EM15aa', location.grid)
+        self.assertAlmostEqual(35.0 + 1.0 / 48.0, location.lat)
+        self.assertAlmostEqual(-98.0 + 1.0 / 24.0, location.lng)
+        self.assertEqual(location, Quantizer('grid6')(35.04, -97.92))
+        self.assertNotEqual(location, Quantizer('grid6')(35.05, -97.99))
+
+        location = Quantizer('grid8')(35.01, -97.99)
+        self.assertEqual(8, len(location.grid))
+        # 30 by 15 arc seconds
+        self.assertAlmostEqual(0.44, location.radius, delta=0.05)
+
+    def test_arc(self):
+        '''arc cells are about the distance across wherever they are'''
+        for km in (1.0, 5.0):
+            quantizer = Quantizer('{:g}km'.format(km))
+            for lat in (-80.0, -35.0, 0.0, 35.0, 60.0, 89.99):
+                location = quantizer(lat, 12.3)
+                self.assertLess(location.radius, km, (km, lat))
+                self.assertGreater(location.radius, km * 0.5, (km, lat))
+
+    def test_within_radius(self):
+        '''every observer is within its cell's radius of the centre'''
+        rng = random.Random(0)
+        for resolution in ('grid6', 'grid8', '1km', '5km'):
+            quantizer = Quantizer(resolution)
+            for _ in range(200):
+                lat, lng = rng.uniform(-89.0, 89.0), rng.uniform(-180.0, 180.0)
+                location = quantizer(lat, lng)
+                self.assertLessEqual(
+                    arc_km(lat, lng, location.lat, location.lng), location.radius + 1e-9
+                    , (resolution, lat, lng)
+                )
+
+    def test_exact(self):
+        '''without a resolution the coordinates are left as they are'''
+        location = Quantizer()(35.123, -98.456)
+        self.assertEqual((35.123, -98.456, 0.0), (location.lat, location.lng, location.radius))
+        self.assertEqual(0.0, timing_error('LEO', location.radius))
+        self.assertIsNone(Quantizer('').resolution)
+
+    def test_resolution(self):
+        '''unknown resolutions are refused'''
+        for resolution in ('grid5', 'grid10', '0km', 'km', '2 km', 'fine'):
+            with self.assertRaises(ValueError):
+                Quantizer(resolution)
+
+    def test_timing_error(self):
+        '''the timing error bound grows with the radius and is widest for slow birds'''
+        self.assertGreater(timing_error('LEO', 1.0), 0.0)
+        self.assertAlmostEqual(2.0 * timing_error('LEO', 1.0), timing_error('LEO', 2.0))
+        self.assertGreater(timing_error('MEO', 1.0), timing_error('LEO', 1.0))
+
+if __name__ == '__main__':
+    unittest.main()
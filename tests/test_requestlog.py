@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+'''
+test_requestlog.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+request log and replay tests
+'''
+
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks.replay import WsgiSender, load_log, replay, route_results
+from birdplans.passstore import PassStore
+from birdplans.requestlog import RequestLog
+from birdplans.uwsgi import BirdplansUwsgi
+
+ONE_QUERY = 'lat=35&lng=-98&tz=America/Chicago&window_start=2022-11-25T00:00&bird=AO-91&alt=30'
+
+def request(app, path, query_string=''):
+    '''Call the WSGI application in-process, returning the status.'''
+    response = {}
+
+    def start_response(status, headers): # pylint: disable=unused-argument
+        response['status'] = status
+
+    b''.join(app.uwsgi_application(
+        {'PATH_INFO': path, 'QUERY_STRING': query_string}, start_response
+    ))
+    return response['status']
+
+class TestRequestLog(unittest.TestCase):
+    '''exercise the request log and its replay'''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = BirdplansUwsgi()
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'request_log.jsonl')
+        self.app.request_log = RequestLog(self.path)
+
+    def tearDown(self):
+        self.app.request_log = None
+        self.app.store = None
+        self.directory.cleanup()
+
+    def records(self):
+        '''The log's records.'''
+        with open(self.path, 'r') as fin:
+            return [json.loads(_) for _ in fin]
+
+    def test_log(self):
+        '''every request is logged with its status, size, timing and cache outcomes'''
+        self.app.store = PassStore(os.path.join(self.directory.name, 'passes.sqlite'))
+        self.assertEqual('200 OK', request(self.app, '/birds'))
+        for _ in range(2):
+            self.assertEqual('200 OK', request(self.app, '/one', ONE_QUERY))
+        with self.assertRaises(KeyError):
+            request(self.app, '/one', 'lat=35')
+
+        records = self.records()
+        self.assertEqual(['/birds', '/one', '/one', '/one'], [_['path'] for _ in records])
+        self.assertEqual([200, 200, 200, 500], [_['status'] for _ in records])
+        self.assertEqual(ONE_QUERY, records[1]['query'])
+        self.assertGreater(records[1]['bytes'], 0)
+        self.assertGreater(records[1]['seconds'], records[0]['seconds'])
+        self.assertEqual({}, records[0]['cache'])
+        self.assertEqual(['store_misses'], list(records[1]['cache']))
+        self.assertEqual(['store_hits'], list(records[2]['cache']))
+
+    def test_replay(self):
+        '''a log is replayed in order and reported per route'''
+        for path, query in [('/birds', ''), ('/tz', ''), ('/birds', '')]:
+            request(self.app, path, query)
+        with open(self.path, 'a') as fout:
+            fout.write('not json\n')
+        self.app.request_log = None
+
+        entries = load_log(self.path)
+        self.assertEqual(['/birds', '/tz', '/birds'], [_.path for _ in entries])
+        self.assertEqual(['/tz'], [_.path for _ in load_log(self.path, routes=['tz'])])
+
+        timings, errors, _ = replay(entries, self.app, 2, speed=100.0)
+        self.assertEqual((3, 0), (len(timings), errors))
+        results = route_results('test', timings, errors, 1.0)
+        self.assertEqual(['test', 'test/birds', 'test/tz'], [_.name for _ in results])
+        self.assertEqual([3, 2, 1], [_.requests for _ in results])
+        self.assertFalse(WsgiSender(self.app)('/one?lat=35'))
+
+if __name__ == '__main__':
+    unittest.main()
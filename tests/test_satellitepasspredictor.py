@@ -11,12 +11,34 @@ estimate_window_passes unit tests
 import unittest
 
 import datetime
+import numpy as np
 import pytz
 
-from birdplans.satellitepasspredictor import pass_estimation_wrapper
+from skyfield.api import Topos
+
+from birdplans.satellitepasspredictor import (
+    TIMESCALE, orbit_class, pass_estimation_wrapper, sky_period, tai_to_epoch_ms, time_grid
+)
+from birdplans.testdata import WINDOW_START, load_satellites, pick
 
 from birdplans.tlemanager import TestTleManager
 
+# seconds between the samples of the brute force reference
+DENSE_STEP = 15.0
+
+def dense_passes(satellite, latlng, window_start, window_stop):
+    '''Passes found by brute force, sampling every DENSE_STEP seconds; those up at either edge
+    of the window are cut short there.
+
+    :return: list of (AOS, LOS) TAI Julian dates
+    '''
+    start = TIMESCALE.utc(window_start)
+    count = int((window_stop - window_start).total_seconds() / DENSE_STEP) + 1
+    grid = time_grid(start, DENSE_STEP / 86400.0, count)
+    up = (satellite - Topos(*latlng)).at(grid).altaz()[0].degrees > 0.0
+    edges = np.diff(np.pad(up.astype(np.int8), 1))
+    return list(zip(grid.tai[edges[:-1] == 1], grid.tai[np.nonzero(edges == -1)[0] - 1]))
+
 class TestSatellitePassPredictor(unittest.TestCase):
     '''exercise the various functions in SatellitePassPredictor
     '''
@@ -38,3 +60,62 @@ class TestSatellitePassPredictor(unittest.TestCase):
         self.assertEqual(result.passes[0][0].utc_iso(), '2018-11-24T07:53:12Z')
         self.assertEqual(result.passes[7][1].utc_iso(), '2018-11-28T18:43:25Z')
         self.assertEqual(result.passes[7][2].utc_iso(), '2018-11-28T18:49:05Z')
+
+    def test_orbit_classes(self):
+        '''every pass the brute force reference finds is found, in every orbit class'''
+        satellites = load_satellites()
+        window_stop = WINDOW_START + datetime.timedelta(days=1)
+        tolerance = 2.0 * DENSE_STEP / 86400.0
+        start, stop = TIMESCALE.utc(WINDOW_START).tai, TIMESCALE.utc(window_stop).tai
+        for klass in ('LEO', 'MEO', 'GEO', 'HEO'):
+            for satellite in pick([_ for _ in satellites if orbit_class(_) == klass], 3):
+                for latlng in ((35.0, -98.0), (64.8, -147.7)):
+                    expected = dense_passes(satellite, latlng, WINDOW_START, window_stop)
+                    found = pass_estimation_wrapper(
+                        satellite, latlng, WINDOW_START, window_stop, lighting=False
+                    ).passes
+                    with self.subTest(klass=klass, bird=satellite.name, latlng=latlng):
+                        self.assertEqual(len(expected), len(found))
+                        for (aos, los), (aos_found, tca, los_found) in zip(expected, found):
+                            # passes up at the window's edges rise or set beyond it
+                            self.assertLess(abs(aos - max(aos_found.tai, start)), tolerance)
+                            self.assertLess(abs(los - min(los_found.tai, stop)), tolerance)
+                            self.assertTrue(aos_found.tai <= tca.tai <= los_found.tai)
+
+    def test_always_up(self):
+        '''a geostationary bird up all window long makes one pass spanning the window'''
+        satellite = [_ for _ in load_satellites() if _.name == 'GOES 15'][0]
+        window_stop = WINDOW_START + datetime.timedelta(days=3)
+        passes = pass_estimation_wrapper(
+            satellite, (35.0, -98.0), WINDOW_START, window_stop, lighting=False
+        ).passes
+        self.assertEqual(1, len(passes))
+        self.assertEqual(TIMESCALE.utc(WINDOW_START).tai, passes[0].AOS.tai)
+        self.assertEqual(TIMESCALE.utc(window_stop).tai, passes[0].LOS.tai)
+
+    def test_sky_period(self):
+        '''eccentric orbits are sampled as fast as they move at perigee, slow ones as fast as the
+        Earth turns'''
+        satellites = load_satellites()
+        for klass, shortest, longest in (
+                ('LEO', 80.0, 120.0), ('GEO', 700.0, 730.0), ('HEO', 1.0, 1436.0)):
+            for satellite in pick([_ for _ in satellites if orbit_class(_) == klass], 5):
+                period = 2.0 * np.pi / satellite.model.no
+                with self.subTest(bird=satellite.name):
+                    self.assertTrue(shortest < sky_period(satellite) * 1440.0 < longest)
+                    self.assertLess(sky_period(satellite) * 1440.0, period)
+
+    def test_time_grid(self):
+        '''the array built grid matches sample by sample construction'''
+        start = TIMESCALE.utc(2018, 11, 24)
+        step = 0.0123
+        grid = time_grid(start, step, 1000)
+        self.assertEqual(1000, len(grid.tai))
+        expected = TIMESCALE.tai_jd([start.tai + _ * step for _ in range(1000)])
+        self.assertLess(np.max(np.abs(grid.tai - expected.tai)) * 86400.0, 1e-4)
+
+    def test_tai_to_epoch_ms(self):
+        '''bulk conversion agrees with converting one time at a time, across a leap second'''
+        grid = time_grid(TIMESCALE.utc(2016, 12, 31, 23, 59), 7.3 / 86400.0, 50)
+        expected = [int(round(t.utc_datetime().timestamp() * 1000.0)) for t in grid]
+        self.assertLessEqual(np.max(np.abs(tai_to_epoch_ms(grid.tai) - expected)), 1)
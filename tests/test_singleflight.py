@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+'''
+test_singleflight.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+request coalescing tests
+'''
+
+import fcntl
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from birdplans.singleflight import SingleFlight
+
+def slow_computation(directory):
+    '''Process pool entry point: compute under a shared key, noting each computation.'''
+
+    def compute():
+        with open(os.path.join(directory, 'computed'), 'a') as fout:
+            fout.write('{}\n'.format(os.getpid()))
+        time.sleep(0.5)
+        return 'answer'
+
+    return tuple(SingleFlight(os.path.join(directory, 'flights')).do('key', compute))
+
+class TestSingleFlight(unittest.TestCase):
+    '''exercise request coalescing'''
+
+    def test_threads(self):
+        '''threads asking together share one computation'''
+        flights = SingleFlight()
+        calls = []
+        started = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return len(calls)
+
+        with ThreadPoolExecutor(8) as executor:
+            leader = executor.submit(flights.do, 'key', compute)
+            started.wait()
+            followers = [executor.submit(flights.do, 'key', compute) for _ in range(7)]
+            results = [leader.result()] + [_.result() for _ in followers]
+
+        self.assertEqual([1], calls)
+        self.assertEqual([1] * 8, [_.result for _ in results])
+        self.assertEqual([None] + ['thread'] * 7, [_.shared for _ in results])
+        # not a cache: once done, the next request computes again
+        self.assertEqual((2, None), tuple(flights.do('key', compute)))
+
+    def test_errors(self):
+        '''a failed computation fails every request waiting on it'''
+        flights = SingleFlight()
+        started = threading.Event()
+
+        def compute():
+            started.set()
+            time.sleep(0.2)
+            raise ValueError('bad query')
+
+        with ThreadPoolExecutor(2) as executor:
+            leader = executor.submit(flights.do, 'key', compute)
+            started.wait()
+            follower = executor.submit(flights.do, 'key', compute)
+            for future in (leader, follower):
+                with self.assertRaises(ValueError):
+                    future.result()
+        self.assertEqual({}, flights.flights)
+
+    def test_processes(self):
+        '''processes sharing a flight directory share one computation'''
+        with tempfile.TemporaryDirectory() as directory:
+            with ProcessPoolExecutor(4, multiprocessing.get_context('fork')) as executor:
+                results = list(executor.map(slow_computation, [directory] * 4))
+            with open(os.path.join(directory, 'computed'), 'r') as fin:
+                computed = fin.read().split()
+
+        self.assertEqual(1, len(computed))
+        self.assertEqual(['answer'] * 4, [_[0] for _ in results])
+        self.assertEqual(3, sum(_[1] == 'process' for _ in results))
+
+    def test_unshared(self):
+        '''a computation nobody else waited on leaves no result file'''
+        with tempfile.TemporaryDirectory() as directory:
+            flights = SingleFlight(directory)
+            self.assertEqual(('answer', None), tuple(flights.do('key', lambda: 'answer')))
+            self.assertEqual([], [_ for _ in os.listdir(directory) if not _.endswith('.lock')])
+
+    def test_sweep(self):
+        '''old files are swept, but not the lock of a computation still under way'''
+        with tempfile.TemporaryDirectory() as directory:
+            flights = SingleFlight(directory, ttl=60.0)
+            held, free = flights.paths('held')[0], flights.paths('free')[0]
+            result = flights.paths('free')[1]
+            for path in (held, free, result):
+                with open(path, 'w'):
+                    pass
+                os.utime(path, (0, 0))
+
+            fd = os.open(held, os.O_RDWR)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                flights.swept = 0.0
+                flights.sweep()
+                self.assertEqual([os.path.basename(held)], os.listdir(directory))
+            finally:
+                os.close(fd)
+
+if __name__ == '__main__':
+    unittest.main()
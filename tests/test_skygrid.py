@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+'''
+test_skygrid.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+sky grid unit tests
+'''
+
+import unittest
+
+import numpy as np
+
+from birdplans.catalog import SatelliteBatch, overhead
+from birdplans.satellitepasspredictor import TIMESCALE
+from birdplans.skygrid import SkyGrid, SkyRefresher
+from birdplans.tlemanager import TleManager
+
+class TestSkyGrid(unittest.TestCase):
+    '''check the grid finds what a full scan finds'''
+
+    @classmethod
+    def setUpClass(cls):
+        catalog = TleManager(
+            None, 'data/test/tledbcurrent.json', 'data/test/tledbhistory.json', full_catalog=True
+        )
+        cls.batch = SatelliteBatch({bird: catalog[bird] for bird in catalog.tle})
+        cls.tai = TIMESCALE.utc(2018, 12, 3, 12).tai
+        cls.grid = SkyGrid(cls.batch, cls.tai)
+
+    def test_matches_full_scan(self):
+        '''same birds, in the same order, as checking every bird, anywhere on Earth, including
+        the poles and the antimeridian, a few seconds after the grid was built'''
+        rng = np.random.RandomState(37)
+        observers = [(90.0, 0.0), (-90.0, 0.0), (0.0, 180.0), (0.0, -180.0), (60.0, 179.9)] + [
+            (lat, lng) for lat, lng in zip(rng.uniform(-90, 90, 200), rng.uniform(-180, 180, 200))
+        ]
+        for latlng in observers:
+            for minimum_altitude in (0.0, 20.0):
+                tai = self.tai + rng.uniform(0.0, 10.0) / 86400.0
+                up, _ = self.grid.overhead(latlng, tai, minimum_altitude)
+                expected = overhead(self.batch, latlng, TIMESCALE.tai_jd(tai), minimum_altitude)
+                self.assertEqual([_.bird for _ in expected], [_.bird for _ in up], latlng)
+
+    def test_candidates(self):
+        '''a query only looks at the birds near the observer'''
+        _, candidates = self.grid.overhead((35.0, -98.0), self.tai)
+        self.assertLess(candidates, len(self.batch) / 4)
+
+    def test_refresher(self):
+        '''a stale grid is rebuilt for now'''
+        refresher = SkyRefresher(self.batch, period=3600.0)
+        grid = refresher.current()
+        self.assertLess(abs(grid.tai - TIMESCALE.now().tai) * 86400.0, 60.0)
+        self.assertIs(grid, refresher.current())
+        grid.built -= 7200.0
+        self.assertIsNot(grid, refresher.current())
+
+    def test_refresher_idle(self):
+        '''the thread stops once nobody reads the grid, and the next reader starts it again'''
+        refresher = SkyRefresher(self.batch, period=0.01, idle=0.05)
+        refresher.current()
+        thread = refresher.thread
+        thread.join(5.0)
+        self.assertFalse(thread.is_alive())
+        self.assertIsNone(refresher.thread)
+        refresher.current()
+        self.assertTrue(refresher.thread.is_alive())
+        refresher.stop.set()
+        refresher.thread.join(5.0)
+
+if __name__ == '__main__':
+    unittest.main()
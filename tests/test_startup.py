@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+
+'''
+test_startup.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+startup budget test, in a fresh interpreter
+'''
+
+import os
+import unittest
+
+from benchmarks.startup import BUDGET, measure, over_budget
+
+class TestStartup(unittest.TestCase):
+    '''keep worker startup cheap'''
+
+    @unittest.skipUnless(
+        os.environ.get('BIRDPLANS_BENCHMARKS'), 'wall clock budget; set BIRDPLANS_BENCHMARKS=1'
+    )
+    def test_budget(self):
+        '''import, app construction and first requests stay inside BUDGET, best of two runs'''
+        results = [measure(), measure()]
+        for result in results:
+            self.assertEqual(['200 OK', '200 OK'], result['statuses'])
+        best = {key: min(_[key] for _ in results) for key in BUDGET}
+        self.assertEqual([], over_budget(best), best)
+
+    def test_cheap_routes_stay_light(self):
+        '''answering /tz loads none of numpy, scipy.optimize or the skyfield time machinery'''
+        self.assertEqual([], measure()['heavy_after_cheap'])
+
+if __name__ == '__main__':
+    unittest.main()
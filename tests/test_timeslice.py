@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+'''
+test_timeslice.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+long-horizon time slicing tests
+'''
+
+import datetime
+import os
+import tempfile
+import unittest
+
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+import numpy as np
+import pytz
+
+from birdplans.instrumentation import METRICS
+from birdplans.passstore import PassStore, StoreKey
+from birdplans.satellitepasspredictor import pass_estimation_wrapper
+from birdplans.timeslice import (
+    MAXIMUM_AGE, day_slices, element_age, long_horizon_passes, merge_passes, slice_executor
+    , time_slices
+)
+from birdplans.tlemanager import TestTleManager
+
+# the day after the test elements were fetched
+WINDOW_START = datetime.datetime(2018, 12, 3, tzinfo=pytz.utc)
+
+def tca(window_passes):
+    '''TCAs of WindowPasses, TAI Julian dates.'''
+    return np.array([_.TCA.tai for _ in window_passes.passes])
+
+class TestTimeSlice(unittest.TestCase):
+    '''exercise the long-horizon slicing'''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tle = TestTleManager()
+
+    def test_time_slices(self):
+        '''slices reach into their neighbours but not past the window'''
+        stop = WINDOW_START + datetime.timedelta(days=12)
+        overlap = datetime.timedelta(hours=2)
+        slices = time_slices(WINDOW_START, stop, overlap)
+        self.assertEqual(3, len(slices))
+        self.assertEqual(WINDOW_START, slices[0].start)
+        self.assertEqual(stop, slices[-1].stop)
+        for before, after in zip(slices, slices[1:]):
+            self.assertEqual(before.stop - after.start, 2 * overlap)
+
+    def test_matches_single_window(self):
+        '''slicing finds the passes a single window does, each once, with or without a pool'''
+        stop = WINDOW_START + datetime.timedelta(days=12)
+        for bird in ('AO-91', 'SO-50'):
+            satellite = self.tle[bird]
+            expected = tca(pass_estimation_wrapper(
+                satellite, (35.0, -98.0), WINDOW_START, stop, lighting=False
+            ))
+            found = long_horizon_passes(
+                satellite, self.tle.lines(bird), (35.0, -98.0), WINDOW_START, stop
+            )
+            self.assertEqual(len(expected), len(found.passes))
+            self.assertLess(np.max(np.abs(tca(found) - expected)) * 86400.0, 1.0)
+            self.assertEqual(len(found.passes), len(found.lighting))
+
+        with ProcessPoolExecutor(2) as executor:
+            pooled = long_horizon_passes(
+                satellite, self.tle.lines(bird), (35.0, -98.0), WINDOW_START, stop
+                , lighting=False, executor=executor
+            )
+        np.testing.assert_array_equal(tca(found), tca(pooled))
+
+    def test_merge_passes(self):
+        '''a pass reported by two slices is kept once, spanning both, at the higher TCA'''
+        first = np.array([[10.0, 10.01, 10.02, 40.0], [11.0, 11.01, 11.015, 20.0]])
+        second = np.array([[11.005, 11.012, 11.02, 30.0], [9.0, 9.01, 9.02, 10.0]])
+        np.testing.assert_array_equal([
+            [9.0, 9.01, 9.02, 10.0], [10.0, 10.01, 10.02, 40.0], [11.0, 11.012, 11.02, 30.0]
+        ], merge_passes([first, second]))
+        self.assertEqual((0, 4), merge_passes([np.zeros((0, 4))]).shape)
+
+    def test_day_slices(self):
+        '''day slices cover whole UTC days, past the window's edges'''
+        start = WINDOW_START + datetime.timedelta(hours=6)
+        slices = day_slices(start, start + datetime.timedelta(days=2), datetime.timedelta(hours=2))
+        self.assertEqual([WINDOW_START.toordinal() + _ for _ in range(3)], [_[0] for _ in slices])
+        self.assertEqual(WINDOW_START - datetime.timedelta(hours=2), slices[0][1].start)
+
+    def test_store(self):
+        '''passes read back from the store are the ones computed without it'''
+        stop = WINDOW_START + datetime.timedelta(days=3, hours=5)
+        lines = self.tle.lines('AO-91')
+        key = StoreKey('AO-91', self.tle.fingerprint('AO-91'), 35.0, -98.0, None, 'standard')
+        expected = long_horizon_passes(
+            self.tle['AO-91'], lines, (35.0, -98.0), WINDOW_START, stop, 10.0, lighting=False
+        )
+
+        def hits():
+            return METRICS.counters.get(('pass_store_hits', ()), 0)
+
+        with tempfile.TemporaryDirectory() as directory:
+            store = PassStore(os.path.join(directory, 'passes.sqlite'))
+            for stored in (0, 4):
+                before = hits()
+                found = long_horizon_passes(
+                    self.tle['AO-91'], lines, (35.0, -98.0), WINDOW_START, stop, 10.0
+                    , lighting=False, store=store, key=key
+                )
+                self.assertEqual(stored, hits() - before)
+                np.testing.assert_allclose(tca(expected), tca(found), atol=1.0 / 86400.0)
+
+    def test_element_age(self):
+        '''windows reaching past MAXIMUM_AGE are cut short, ones getting close are flagged'''
+        satellite = self.tle['AO-91']
+        epoch = satellite.epoch.utc_datetime()
+
+        age = element_age(satellite, WINDOW_START, WINDOW_START + datetime.timedelta(days=5))
+        self.assertEqual(WINDOW_START + datetime.timedelta(days=5), age.stop)
+        self.assertIsNone(age.warning)
+
+        age = element_age(satellite, WINDOW_START, WINDOW_START + datetime.timedelta(days=20))
+        self.assertEqual(WINDOW_START + datetime.timedelta(days=20), age.stop)
+        self.assertIn('days old', age.warning)
+
+        age = element_age(satellite, WINDOW_START, WINDOW_START + datetime.timedelta(days=60))
+        self.assertEqual(epoch + MAXIMUM_AGE, age.stop)
+        self.assertIn('too old', age.warning)
+
+    def test_slice_executor(self):
+        '''pools share the cpus between the workers starting them'''
+        with mock.patch.dict(os.environ), mock.patch('os.cpu_count', return_value=8):
+            os.environ.pop('BIRDPLANS_SLICE_PROCESSES', None)
+            self.assertIsNone(slice_executor(workers=8))
+            executor = slice_executor(workers=4)
+            try:
+                self.assertEqual(2, executor._max_workers) # pylint: disable=protected-access
+            finally:
+                executor.shutdown()
+            os.environ['BIRDPLANS_SLICE_PROCESSES'] = '1'
+            self.assertIsNone(slice_executor(workers=1))
+
+if __name__ == '__main__':
+    unittest.main()
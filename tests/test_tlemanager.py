@@ -8,9 +8,16 @@ jonathanwesleystone+KI5BEX@gmail.com
 TleManager unit tests
 '''
 
+import json
+import os
+import shutil
+import tempfile
 import unittest
 
-from birdplans.tlemanager import TleManager
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from birdplans.tlemanager import LazyBirds, TleManager, tle_epoch, write_json
 
 class TestTleManager(unittest.TestCase):
     '''Make sure our tlemanager does good.'''
@@ -56,5 +63,131 @@ class TestTleManager(unittest.TestCase):
             , 'AO-92'
             }.issubset(tleman.bird))
 
+    def test_full_catalog(self):
+        '''every object is indexed by NORAD number, catalog name and alias'''
+        tleman = TleManager(
+            None, 'data/test/tledbcurrent.json', 'data/test/tledbhistory.json', full_catalog=True
+        )
+        self.assertGreater(len(tleman.tle), 1800)
+        self.assertIs(tleman['SO-50'], tleman['SAUDISAT 1C (SO-50)'])
+        self.assertIs(tleman['SO-50'], tleman[27607])
+        self.assertIs(tleman['SO-50'], tleman['27607'])
+        self.assertEqual('ISS', tleman['ISS (ZARYA)'].name)
+        self.assertIn('CALSPHERE 1', tleman.tle)
+
+    def test_lazy_satellites(self):
+        '''satellites are parsed on first lookup and shared by all their keys'''
+        tleman = TleManager(None, 'data/test/tledbcurrent.json', 'data/test/tledbhistory.json')
+        self.assertIn('AO-91', tleman.bird)
+        self.assertFalse(tleman.bird.satellites)
+
+        satellite = tleman['AO-91']
+        self.assertEqual(['AO-91'], list(tleman.bird.satellites))
+        self.assertIs(satellite, tleman[43017])
+        self.assertIs(satellite, tleman['RADFXSAT (FOX-1B)'])
+        self.assertEqual('AO-91', satellite.name)
+        self.assertIn('AO-91', tleman.tlestring)
+
+    def test_reload(self):
+        '''only the birds whose elements changed are reported and parsed again'''
+        with tempfile.TemporaryDirectory() as directory:
+            current = os.path.join(directory, 'tledbcurrent.json')
+            shutil.copy('data/test/tledbcurrent.json', current)
+            tleman = TleManager(None, current, os.path.join(directory, 'tledbhistory.json'))
+            heard = []
+            tleman.subscribe(heard.append)
+            so50, ao91 = tleman['SO-50'], tleman['AO-91']
+            fingerprint = tleman.fingerprint('SO-50')
+            self.assertEqual([], tleman.refresh())
+
+            line1, _ = tleman.lines('AO-91')
+            newer = line1[:20] + '{:012.8f}'.format(float(line1[20:32]) + 0.5) + line1[32:]
+            with open(current, 'r') as fin:
+                tledbcurrent = json.load(fin)
+            for source in tledbcurrent.values():
+                source['body'] = source['body'].replace(line1, newer)
+            with open(current, 'w') as fout:
+                json.dump(tledbcurrent, fout)
+            # the rewrite may land within the file system's timestamp resolution
+            os.utime(current, ns=(0, 0))
+
+            changes = tleman.refresh()
+            self.assertEqual(['AO-91'], [_.bird for _ in changes])
+            self.assertEqual(timedelta(hours=12), changes[0].new_epoch - changes[0].old_epoch)
+            self.assertEqual(newer, changes[0].new[0])
+            self.assertEqual([changes], heard)
+            self.assertIs(so50, tleman['SO-50'])
+            self.assertEqual(fingerprint, tleman.fingerprint('SO-50'))
+            self.assertIsNot(ao91, tleman['AO-91'])
+            self.assertAlmostEqual(
+                changes[0].new_epoch, tleman['AO-91'].epoch.utc_datetime()
+                , delta=timedelta(milliseconds=1)
+            )
+            self.assertEqual([], tleman.reload())
+            self.assertEqual([changes], heard)
+
+    def test_reload_atomic(self):
+        '''a reload publishes its elements, version, fingerprints and satellites together, and only
+        once they are all built'''
+        with tempfile.TemporaryDirectory() as directory:
+            current = os.path.join(directory, 'tledbcurrent.json')
+            shutil.copy('data/test/tledbcurrent.json', current)
+            tleman = TleManager(None, current, os.path.join(directory, 'tledbhistory.json'))
+            before = tleman.state
+
+            line1, _ = tleman.lines('AO-91')
+            newer = line1[:20] + '{:012.8f}'.format(float(line1[20:32]) + 0.5) + line1[32:]
+            with open(current, 'r') as fin:
+                tledbcurrent = json.load(fin)
+            for source in tledbcurrent.values():
+                source['body'] = source['body'].replace(line1, newer)
+            write_json(current, tledbcurrent)
+
+            published = []
+            with mock.patch.object(
+                    TleManager, 'parse'
+                    , lambda self, elements: published.append(self.state) or LazyBirds(elements)):
+                tleman.reload()
+            # the old state was still the one readers saw while the new one was being built
+            self.assertEqual([before], published)
+            self.assertIsNot(before, tleman.state)
+            self.assertEqual(line1, before.bird.lines('AO-91')[0])
+            self.assertEqual(newer, tleman.state.bird.lines('AO-91')[0])
+            self.assertNotEqual(before.version, tleman.version)
+            self.assertNotEqual(before.fingerprints['AO-91'], tleman.fingerprint('AO-91'))
+            self.assertIs(tleman.state.elements, tleman.bird.elements)
+
+    def test_reload_partial(self):
+        '''a file caught half written is read again later, the elements kept until then'''
+        with tempfile.TemporaryDirectory() as directory:
+            current = os.path.join(directory, 'tledbcurrent.json')
+            with open('data/test/tledbcurrent.json', 'r') as fin:
+                whole = fin.read()
+            with open(current, 'w') as fout:
+                fout.write(whole)
+            tleman = TleManager(None, current, os.path.join(directory, 'tledbhistory.json'))
+            version, loaded = tleman.version, tleman.loaded
+
+            with open(current, 'w') as fout:
+                fout.write(whole[:len(whole) // 2])
+            os.utime(current, ns=(0, 0))
+            self.assertEqual([], tleman.refresh())
+            self.assertEqual((version, loaded), (tleman.version, tleman.loaded))
+            self.assertIn('AO-91', tleman.tle)
+
+            write_json(current, json.loads(whole))
+            self.assertEqual(['tledbcurrent.json'], os.listdir(directory))
+            self.assertEqual([], tleman.refresh())
+            self.assertNotEqual(loaded, tleman.loaded)
+            self.assertEqual(version, tleman.version)
+
+    def test_tle_epoch(self):
+        '''epochs are read straight from line 1'''
+        self.assertEqual(
+            datetime(2018, 11, 29, 1, 3, 49, 216032, tzinfo=timezone.utc)
+            , tle_epoch('1 43017U 17073E   18333.04431963  .00000487  00000-0  43024-4 0  9997')
+        )
+        self.assertEqual(1999, tle_epoch('1 00001U 00000A   99001.00000000').year)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+'''
+test_tracking.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+interpolated tracking feed unit tests
+'''
+
+import multiprocessing
+import unittest
+
+import numpy as np
+
+from birdplans import tracking
+from birdplans.catalog import topocentric
+from birdplans.satellitepasspredictor import TIMESCALE
+from birdplans.tlemanager import TestTleManager
+
+def child_misses(block):
+    '''In a child process, spline the block given and the one after; the misses this made.'''
+    # inherited over the fork, as the pool workers inherit theirs
+    satellite = TestTracking.satellite
+    before = tracking.block_spline.cache_info().misses
+    tracking.block_spline(satellite, TIMESCALE, block)
+    tracking.block_spline(satellite, TIMESCALE, block + 1)
+    return tracking.block_spline.cache_info().misses - before
+
+class TestTracking(unittest.TestCase):
+    '''exercise the shared splines and the track they produce'''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.satellite = TestTleManager()['SO-50']
+        cls.tai = TIMESCALE.utc(2018, 12, 3, 9, 48).tai
+
+    def test_interpolated(self):
+        '''the spline stays with direct propagation, across block boundaries too'''
+        tai = self.tai + np.arange(0.0, 7200.0, 0.5) / 86400.0
+        alt, az, _ = topocentric(
+            tracking.interpolated(self.satellite, TIMESCALE, tai), (35.0, -98.0)
+        )
+        direct_alt, direct_az, _ = topocentric(
+            tracking.earth_fixed(self.satellite, TIMESCALE, tai), (35.0, -98.0)
+        )
+        self.assertLess(np.abs(alt - direct_alt).max(), 0.001)
+        self.assertLess(np.abs((az - direct_az + 180.0) % 360.0 - 180.0).max(), 0.001)
+        self.assertLess(
+            tracking.error_bound(self.satellite, TIMESCALE, (35.0, -98.0), tai[0], tai[-1]), 0.001
+        )
+
+    def test_shared(self):
+        '''stations tracking the same bird reuse its splines'''
+        tracking.block_spline.cache_clear()
+        for latlng in [(35.0, -98.0), (36.0, -97.0), (34.0, -99.5)]:
+            chunks = list(tracking.track(
+                self.satellite, TIMESCALE, latlng, self.tai, self.tai + 600.0 / 86400.0, hz=10.0
+            ))
+            self.assertEqual(6001, sum(len(_.tai) for _ in chunks))
+        # 09:48 to 09:58 falls in a single half hour block, propagated once for all three
+        self.assertEqual(1, tracking.block_spline.cache_info().misses)
+
+    def test_process_boundary(self):
+        '''a process builds its own splines, and the ones it builds stay with it'''
+        tracking.block_spline.cache_clear()
+        block = int(np.floor(self.tai * 86400.0 / tracking.BLOCK))
+        tracking.block_spline(self.satellite, TIMESCALE, block)
+
+        context = multiprocessing.get_context('fork')
+        with context.Pool(1) as pool:
+            # the block built before the fork is inherited, the next one is built in the child
+            misses = pool.apply(child_misses, (block,))
+        self.assertEqual(1, misses)
+        self.assertEqual(1, tracking.block_spline.cache_info().misses)
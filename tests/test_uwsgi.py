@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+
+'''
+test_uwsgi.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+BirdplansUwsgi handler unit tests
+'''
+
+import datetime
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from unittest import mock
+
+from birdplans.budget import Admission
+from birdplans.passstore import PassStore
+from birdplans.quantize import Quantizer
+from birdplans.tlemanager import ElementChange
+from birdplans.uwsgi import BirdplansUwsgi, flight_key
+
+ONE_QUERY = 'lat=35&lng=-98&tz=America/Chicago&window_start=2018-11-24T00:00&bird=AO-91&alt=30'
+
+def request(app, path, query_string=''):
+    '''Call the WSGI application in-process, returning (status, headers, body).
+    '''
+    response = {}
+
+    def start_response(status, headers):
+        response['status'] = status
+        response['headers'] = dict(headers)
+
+    body = b''.join(app.uwsgi_application(
+        {'PATH_INFO': path, 'QUERY_STRING': query_string}, start_response
+    ))
+
+    return response['status'], response['headers'], body
+
+class TestBirdplansUwsgi(unittest.TestCase):
+    '''exercise the uwsgi request handlers'''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = BirdplansUwsgi()
+
+    def test_one(self):
+        '''passes over a location, with per-stage timings'''
+        status, headers, body = request(self.app, '/one', ONE_QUERY)
+        self.assertEqual('200 OK', status)
+        result = json.loads(body)
+        self.assertEqual('AO-91', result['data'][0]['bird'])
+        self.assertTrue(result['data'][0]['passes'])
+        first = result['data'][0]['passes'][0]
+        self.assertEqual(len(first['t']), len(first['sunlit']))
+        self.assertEqual(len(first['t']), len(first['dark']))
+        self.assertEqual(
+            [
+                'parse', 'budget', 'tle', 'sampling', 'refinement', 'lighting', 'track', 'tz'
+                , 'serialize'
+            ],
+            [_.split(';')[0] for _ in headers['Server-Timing'].split(', ')]
+        )
+
+    def test_one_accuracy(self):
+        '''the accuracy profile is chosen per request'''
+        _, _, standard = request(self.app, '/one', ONE_QUERY)
+        _, _, planning = request(self.app, '/one', ONE_QUERY + '&accuracy=planning')
+        standard, planning = json.loads(standard), json.loads(planning)
+        self.assertEqual('standard', standard['accuracy'])
+        self.assertEqual('planning', planning['accuracy'])
+        self.assertEqual(
+            len(standard['data'][0]['passes']), len(planning['data'][0]['passes'])
+        )
+        with self.assertRaises(ValueError):
+            request(self.app, '/one', ONE_QUERY + '&accuracy=exact')
+
+    def test_catalog(self):
+        '''passes of every loaded bird, sorted by AOS'''
+        status, _, body = request(
+            self.app, '/catalog'
+            , 'lat=35&lng=-98&tz=America/Chicago&window_start=2018-11-24T00:00&days=1&alt=30'
+        )
+        self.assertEqual('200 OK', status)
+        passes = json.loads(body)['data']
+        self.assertIn('AO-91', {_['bird'] for _ in passes})
+        self.assertEqual(sorted(_['AOS'] for _ in passes), [_['AOS'] for _ in passes])
+
+    def test_catalog_at(self):
+        '''passes in progress and the next pass at t, from the cached pass index'''
+        query = 'lat=35&lng=-98&tz=America/Chicago&window_start=2018-11-24T00:00&days=1&alt=30'
+        _, _, body = request(self.app, '/catalog', query)
+        passes = json.loads(body)['data']
+        middle = (passes[1]['AOS'] + passes[1]['LOS']) // 2
+        indexes = len(self.app.pass_indexes)
+
+        _, _, body = request(self.app, '/catalog', query + '&t={}'.format(middle))
+        result = json.loads(body)
+        self.assertIn(passes[1], result['up'])
+        self.assertEqual(min(_['AOS'] for _ in passes if _['AOS'] > middle), result['next']['AOS'])
+        self.assertEqual(indexes, len(self.app.pass_indexes))
+
+    def test_table(self):
+        '''the catalog query as HTML'''
+        status, headers, body = request(
+            self.app, '/table'
+            , 'lat=35&lng=-98&tz=America/Chicago&window_start=2018-11-24T00:00&days=1&alt=30'
+        )
+        self.assertEqual('200 OK', status)
+        self.assertTrue(headers['Content-Type'].startswith('text/html'))
+        self.assertIn(b'<td>AO-91<td>', body)
+
+    def test_overhead(self):
+        '''birds above the horizon at a given time'''
+        status, _, body = request(self.app, '/overhead', 'lat=35&lng=-98&t=1543825968034')
+        self.assertEqual('200 OK', status)
+        result = json.loads(body)
+        self.assertEqual(1543825968034, result['t'])
+        self.assertTrue(all(_['alt'] >= 0 for _ in result['data']))
+
+    def test_now(self):
+        '''birds above the horizon right now, from the sky grid'''
+        status, _, body = request(self.app, '/now', 'lat=35&lng=-98')
+        self.assertEqual('200 OK', status)
+        result = json.loads(body)
+        self.assertLessEqual(len(result['data']), result['candidates'])
+        self.assertTrue(all(_['alt'] >= 0 for _ in result['data']))
+
+    def test_doppler(self):
+        '''a header line per bird, then one line per second of its next pass'''
+        status, response_headers, body = request(
+            self.app, '/doppler', 'lat=35&lng=-98&t=1543825968034&bird=SO-50&bird=AO-7&rx=145.95'
+        )
+        self.assertEqual('200 OK', status)
+        self.assertTrue(response_headers['Content-Type'].startswith('application/x-ndjson'))
+        lines = [json.loads(_) for _ in body.decode().splitlines()]
+        headers = [_ for _ in lines if 'bird' in _]
+        self.assertEqual(['SO-50', 'AO-7'], [_['bird'] for _ in headers])
+        self.assertEqual((146.85, 145.95), (headers[0]['tx'], headers[0]['rx']))
+        self.assertEqual((None, 145.95), (headers[1]['tx'], headers[1]['rx']))
+        samples = lines[1:lines.index(headers[1])]
+        self.assertEqual(headers[0]['AOS'], samples[0]['t'])
+        self.assertEqual(1000, samples[1]['t'] - samples[0]['t'])
+        self.assertLess(samples[0]['range_rate'], 0.0)
+        self.assertGreater(samples[0]['downlink'], 145.95e6)
+        self.assertIsNone(lines[-1]['uplink'])
+
+    def test_track(self):
+        '''a header with the error bound, then az/el at the requested rate'''
+        status, _, body = request(
+            self.app, '/track', 'lat=35&lng=-98&t=1543825960000&bird=AO-91&rate=10'
+        )
+        self.assertEqual('200 OK', status)
+        lines = [json.loads(_) for _ in body.decode().splitlines()]
+        self.assertEqual('AO-91', lines[0]['bird'])
+        self.assertLess(lines[0]['error'], 0.01)
+        self.assertEqual(lines[0]['AOS'], lines[1]['t'])
+        self.assertEqual(100, lines[2]['t'] - lines[1]['t'])
+        self.assertLess(abs(lines[1]['el']), 0.1)
+        self.assertGreater(max(_['el'] for _ in lines[1:]), 30.0)
+
+    def test_mutual(self):
+        '''windows common to two observers, with the altitude of each at both ends'''
+        status, _, body = request(
+            self.app, '/mutual', 'lat=35&lng=-98&lat=41.7&lng=-72.7&tz=America/Chicago'
+            '&window_start=2018-11-24T00:00&alt=10'
+        )
+        self.assertEqual('200 OK', status)
+        result = json.loads(body)
+        self.assertEqual([[35.0, -98.0], [41.7, -72.7]], result['observers'])
+        self.assertTrue(result['data'])
+        for window in result['data']:
+            self.assertLess(window['start'], window['end'])
+            self.assertEqual([0, 1], window['observers'])
+            self.assertEqual(2, len(window['start_alt']))
+
+    def test_mutual_observers(self):
+        '''unpaired coordinates and fewer than two observers are refused with a message'''
+        window = '&tz=America/Chicago&window_start=2018-11-24T00:00&alt=10'
+        status, headers, body = request(
+            self.app, '/mutual', 'lat=35&lng=-98&lat=41.7' + window
+        )
+        self.assertEqual('400 Bad Request', status)
+        self.assertTrue(headers['Content-Type'].startswith('text/json'))
+        self.assertIn('pairs', json.loads(body)['error'])
+
+        for query in ['', 'lat=35&lng=-98', 'lat=35&lng=-98&pairs=1']:
+            with self.subTest(query=query):
+                status, _, body = request(self.app, '/mutual', query + window)
+                self.assertEqual('400 Bad Request', status)
+                self.assertIn('two observers', json.loads(body)['error'])
+
+    def test_one_days(self):
+        '''long windows are sliced and cut short where the elements get too old'''
+        query = 'lat=35&lng=-98&tz=America/Chicago&window_start=2022-11-25T00:00&bird=AO-91&alt=30'
+        status, _, body = request(self.app, '/one', query + '&days=40')
+        self.assertEqual('200 OK', status)
+        result = json.loads(body)['data'][0]
+        self.assertIn('too old', result['warning'])
+        self.assertTrue(result['passes'])
+        self.assertLess(result['passes'][-1]['LOS']['t'], result['epoch'] + 30 * 86400000)
+        self.assertGreater(result['passes'][-1]['LOS']['t'], result['epoch'] + 28 * 86400000)
+        with self.assertRaises(ValueError):
+            request(self.app, '/one', query + '&days=61')
+
+    def test_one_store(self):
+        '''with a pass store, requests are counted and answered the same from it'''
+        expected = json.loads(request(self.app, '/one', ONE_QUERY)[2])['data'][0]['passes']
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'passes.sqlite')
+            self.app.store = PassStore(path)
+            try:
+                for _ in range(2):
+                    status, headers, body = request(self.app, '/one', ONE_QUERY)
+                    self.assertEqual('200 OK', status)
+                    self.assertIn('store;dur=', headers['Server-Timing'])
+                    passes = json.loads(body)['data'][0]['passes']
+                    # day slices refine from other starting points, to well within a second
+                    self.assertEqual(len(expected), len(passes))
+                    for before, after in zip(expected, passes):
+                        self.assertAlmostEqual(before['TCA']['t'], after['TCA']['t'], delta=1000)
+                # counted in memory, written on the next element check
+                self.assertEqual([], PassStore(path).popular())
+                self.app.elements_checked = float('-inf')
+                request(self.app, '/birds')
+                popular = PassStore(path).popular()
+                self.assertEqual(('AO-91', 2), (popular[0].bird, popular[0].hits))
+            finally:
+                self.app.store = None
+
+    def test_one_store_edges(self):
+        '''a default window is answered the same with a store, passes crossing its edges too, and
+        without the slice pool'''
+        # AO-7 is up and past culminating at the start
+        query = (
+            'lat=35&lng=-98&tz=America/Chicago&window_start=2018-11-24T02:35&bird=AO-7&bird=AO-73'
+            '&alt=0'
+        )
+        expected = json.loads(request(self.app, '/one', query)[2])['data']
+        with tempfile.TemporaryDirectory() as directory:
+            self.app.store = PassStore(os.path.join(directory, 'passes.sqlite'))
+            try:
+                with mock.patch.object(self.app, 'slice_executor') as slice_executor:
+                    found = json.loads(request(self.app, '/one', query)[2])['data']
+                slice_executor.assert_not_called()
+            finally:
+                self.app.store = None
+
+        for before, after in zip(expected, found):
+            self.assertEqual(len(before['passes']), len(after['passes']), before['bird'])
+            for before_pass, after_pass in zip(before['passes'], after['passes']):
+                for event in ('AOS', 'TCA', 'LOS'):
+                    self.assertAlmostEqual(
+                        before_pass[event]['t'], after_pass[event]['t'], delta=1000
+                    )
+
+    def test_elements_changed(self):
+        '''new elements drop the pass indexes and catalog satellites of their birds only'''
+        app = BirdplansUwsgi()
+        start = datetime.datetime(2022, 11, 25, tzinfo=datetime.timezone.utc)
+        for birds in (['AO-91', 'SO-50'], ['SO-50']):
+            app.pass_index((35.0, -98.0), start, start + datetime.timedelta(hours=6), 30, birds)
+        batch = app.catalog_batch()
+        so50 = batch.satellites[batch.birds.index('SO-50')]
+
+        app.elements_changed([ElementChange('AO-91', ('1', '2'), None, None, None)])
+        self.assertEqual(
+            [(('SO-50', app.tle.fingerprint('SO-50')),)], [_[4] for _ in app.pass_indexes]
+        )
+        self.assertNotIn('AO-91', app.batch.birds)
+        self.assertEqual(len(batch) - 1, len(app.batch))
+        self.assertIs(so50, app.batch.satellites[app.batch.birds.index('SO-50')])
+
+    def test_export(self):
+        '''CSV and iCalendar exports for several observers, and an error without any'''
+        query = (
+            'lat=35&lng=-98&grid=JO01&tz=America/Chicago&window_start=2022-11-25T00:00'
+            '&bird=AO-91&alt=30&days=2'
+        )
+        status, headers, body = request(self.app, '/csv', query)
+        self.assertEqual('200 OK', status)
+        self.assertTrue(headers['Content-Type'].startswith('text/csv'))
+        lines = body.decode('utf-8').splitlines()
+        self.assertTrue(lines[0].startswith('"Grid","Latitude"'))
+        self.assertEqual({'"EM15aa"', '"JO01"'}, {_.split(',')[0] for _ in lines[1:]})
+
+        status, headers, body = request(self.app, '/ics', query)
+        self.assertEqual('200 OK', status)
+        self.assertTrue(headers['Content-Type'].startswith('text/calendar'))
+        self.assertEqual(len(lines) - 1, body.count(b'BEGIN:VEVENT'))
+
+        with self.assertRaises(ValueError):
+            request(self.app, '/csv', 'tz=UTC&window_start=2022-11-25T00:00&bird=AO-91')
+
+    def test_one_budget(self):
+        '''requests estimated over the budget are refused before anything is computed'''
+        status, _, body = request(self.app, '/one', ONE_QUERY + '&days=1')
+        estimate = json.loads(body)['estimate']
+        self.assertGreater(estimate, 0.0)
+        self.app.gate = Admission(budget=estimate * 2)
+        try:
+            self.assertEqual('200 OK', request(self.app, '/one', ONE_QUERY + '&days=1')[0])
+            status, headers, body = request(self.app, '/one', ONE_QUERY + '&days=5')
+            self.assertEqual('422 Unprocessable Entity', status)
+            result = json.loads(body)
+            self.assertIn('over the budget', result['error'])
+            self.assertAlmostEqual(estimate * 5, result['cost']['seconds'], delta=estimate * 0.5)
+            status, headers, body = request(
+                self.app, '/csv'
+                , ONE_QUERY.replace('lat=35&lng=-98', 'grid=EM15&grid=JO01') + '&days=10'
+            )
+            self.assertEqual('422 Unprocessable Entity', status)
+            self.assertTrue(headers['Content-Type'].startswith('text/json'))
+        finally:
+            self.app.gate = None
+
+    def test_one_deadline(self):
+        '''birds not started by the deadline are left out, with a notice'''
+        query = ONE_QUERY + '&bird=SO-50&days=1'
+        status, headers, body = request(self.app, '/one', query + '&deadline=60')
+        self.assertEqual('200 OK', status)
+        self.assertNotIn('Partial', headers)
+        result = json.loads(body)
+        self.assertIsNone(result['partial'])
+        self.assertEqual(['AO-91', 'SO-50'], [_['bird'] for _ in result['data']])
+
+        status, headers, body = request(self.app, '/one', query + '&deadline=0.000001')
+        self.assertEqual(('200 OK', 'deadline'), (status, headers['Partial']))
+        result = json.loads(body)
+        self.assertEqual([], result['data'])
+        self.assertEqual(['AO-91', 'SO-50'], result['partial']['skipped'])
+        self.assertIn('after 0 of 2 birds', result['partial']['notice'])
+        with self.assertRaises(ValueError):
+            request(self.app, '/one', query + '&deadline=0')
+
+    def test_one_quantized(self):
+        '''observers in the same cell get the same answer, for its centre'''
+        status, _, body = request(self.app, '/one', ONE_QUERY)
+        result = json.loads(body)
+        self.assertEqual(
+            {'lat': 35.0, 'lng': -98.0, 'grid': 'EM15aa00', 'radius': 0.0, 'resolution': None}
+            , result['location']
+        )
+        self.assertEqual(0.0, result['data'][0]['quantization_error'])
+
+        self.app.quantizer = Quantizer('grid6')
+        try:
+            bodies = [
+                request(self.app, '/one', ONE_QUERY.replace('lat=35&lng=-98', _))[2]
+                for _ in ('lat=35.01&lng=-97.99', 'lat=35.03&lng=-97.93')
+            ]
+            results = [json.loads(_) for _ in bodies]
+            for result in results:
+                del result['time']
+            self.assertEqual(results[0], results[1])
+            location = results[0]['location']
+            self.assertEqual(('EM15aa', 'grid6'), (location['grid'], location['resolution']))
+            self.assertAlmostEqual(35.0 + 1.0 / 48.0, location['lat'])
+            self.assertEqual(location['lat'], results[0]['data'][0]['lat'])
+            self.assertGreater(results[0]['data'][0]['quantization_error'], 0.0)
+            self.assertEqual(
+                flight_key('lat=35.01&lng=-97.99', 'v1', self.app.quantizer)
+                , flight_key('lat=35.03&lng=-97.93', 'v1', self.app.quantizer)
+            )
+        finally:
+            self.app.quantizer = Quantizer()
+
+    def test_one_coalesced(self):
+        '''identical /one requests arriving together share one computation'''
+        computed = []
+        one_response = self.app.one_response
+
+        def slow_response(env):
+            computed.append(env['QUERY_STRING'])
+            threading.Event().wait(0.3)
+            return one_response(env)
+
+        self.app.one_response = slow_response
+        try:
+            responses = [None] * 3
+            def run(i, query):
+                responses[i] = request(self.app, '/one', query)
+            threads = [threading.Thread(target=run, args=(0, ONE_QUERY))]
+            threads[0].start()
+            threading.Event().wait(0.1)
+            # the same parameters in another order, and numbers written differently
+            reordered = '&'.join(reversed(ONE_QUERY.replace('lat=35', 'lat=35.0').split('&')))
+            threads += [
+                threading.Thread(target=run, args=(1, ONE_QUERY))
+                , threading.Thread(target=run, args=(2, reordered))
+            ]
+            for thread in threads[1:]:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            del self.app.one_response
+
+        self.assertEqual(1, len(computed))
+        self.assertEqual(1, len({_[2] for _ in responses}))
+        self.assertEqual(
+            [None, 'thread', 'thread'], [_[1].get('Coalesced') for _ in responses]
+        )
+
+    def test_flight_key(self):
+        '''only requests for the same thing share a key'''
+        key = flight_key(ONE_QUERY, 'v1')
+        self.assertEqual(key, flight_key('alt=30&' + ONE_QUERY.replace('&alt=30', ''), 'v1'))
+        self.assertNotEqual(key, flight_key(ONE_QUERY, 'v2'))
+        self.assertNotEqual(key, flight_key(ONE_QUERY.replace('lat=35', 'lat=36'), 'v1'))
+        self.assertNotEqual(
+            flight_key('bird=AO-91&bird=SO-50', 'v1'), flight_key('bird=SO-50&bird=AO-91', 'v1')
+        )
+
+    def test_ready(self):
+        '''the readiness probe fails while the worker warms up'''
+        status, _, body = request(self.app, '/ready')
+        self.assertEqual('200 OK', status)
+        self.assertTrue(json.loads(body)['ready'])
+        self.app.ready = False
+        try:
+            self.assertEqual('503 Service Unavailable', request(self.app, '/ready')[0])
+        finally:
+            self.app.ready = True
+
+    def test_metrics(self):
+        '''stage histograms are exposed after a request'''
+        request(self.app, '/one', ONE_QUERY)
+        status, headers, body = request(self.app, '/metrics')
+        self.assertEqual('200 OK', status)
+        self.assertTrue(headers['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'birdplans_stage_seconds_bucket{worker="', body)
+        self.assertIn(b'stage="sampling"', body)
+
+if __name__ == '__main__':
+    unittest.main()
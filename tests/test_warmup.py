@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+'''
+test_warmup.py
+2026-10-19
+jonathanwesleystone+KI5BEX@gmail.com
+
+worker warm-up tests
+'''
+
+import os
+import unittest
+
+from datetime import datetime, timezone
+from unittest import mock
+
+from birdplans.instrumentation import METRICS
+from birdplans.uwsgi import BirdplansUwsgi
+from birdplans.warmup import warmup, warmup_birds, warmup_enabled
+
+# close to the epochs of the bundled elements
+NOW = datetime(2022, 11, 25, tzinfo=timezone.utc)
+
+class TestWarmup(unittest.TestCase):
+    '''exercise the worker warm-up'''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = BirdplansUwsgi()
+
+    def test_warmup(self):
+        '''the warm-up predicts for every bird asked for and marks the app ready'''
+        report = warmup(self.app, birds=['AO-91', 'SO-50'], now=NOW)
+        self.assertEqual(2, report.birds)
+        self.assertEqual(0, report.errors)
+        self.assertGreater(report.passes, 0)
+        self.assertGreater(report.seconds, 0.0)
+        self.assertIs(report, self.app.warmup)
+        self.assertTrue(self.app.ready)
+        self.assertIn(b'birdplans_warmup_seconds_count', bytes(METRICS.render(), 'utf-8'))
+
+    def test_warmup_birds(self):
+        '''birds come from the environment or the configuration, less those without elements'''
+        with mock.patch.dict(os.environ, {'BIRDPLANS_WARMUP_BIRDS': 'AO-91,NO-SUCH-BIRD'}):
+            self.assertEqual(['AO-91'], warmup_birds(self.app))
+        with mock.patch.dict(os.environ, {'BIRDPLANS_WARMUP_BIRDS': ''}):
+            birds = warmup_birds(self.app)
+        self.assertIn('AO-91', birds)
+        self.assertTrue(all(_ in self.app.tle.tle for _ in birds))
+
+    def test_warmup_enabled(self):
+        '''the warm-up runs unless switched off'''
+        with mock.patch.dict(os.environ, {'BIRDPLANS_WARMUP': '0'}):
+            self.assertFalse(warmup_enabled())
+        with mock.patch.dict(os.environ, {'BIRDPLANS_WARMUP': '1'}):
+            self.assertTrue(warmup_enabled())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,5 +3,5 @@
 from birdplans.tlemanager import TleManager
 
 tm = TleManager()
-tm.update()
-
+for change in tm.update():
+    print('{}: {} -> {}'.format(change.bird, change.old_epoch, change.new_epoch))